@@ -0,0 +1,455 @@
+"""
+Modul s průběžnými souhrnnými statistikami hodnot veličin
+
+Statistiky (tzv. agregáty) se počítají průběžně po dávkách řádků, které
+vrací hromadný výpočet (viz solver.solve_batch, parametr sinks), takže
+není třeba uchovávat hodnoty všech řádků ani instance UŽIVATELSKÝCH
+útvarů. Každý agregát zabírá konstantní množství paměti nezávislé na počtu
+řádků a používá numericky stabilní jednoprůchodový algoritmus:
+- Sum - součet s kompenzací zaokrouhlovací chyby (Kahanův-Neumaierův
+  součet),
+- Moments - počet, průměr a rozptyl (Welfordův algoritmus, dávky se
+  slučují Chanovým vzorcem),
+- MinMax - nejmenší a největší hodnota,
+- Histogram - počty hodnot v intervalech pevné šířky,
+- QuantileSketch - přibližné kvantily s omezenou relativní chybou
+  (hodnoty se počítají v intervalech, jejichž meze tvoří geometrickou
+  posloupnost).
+
+Agregáty téhož druhu a téže veličiny lze slučovat metodou merge, takže je
+lze počítat nezávisle v několika pracovních procesech a výsledky poté
+sloučit (viz merge_sinks). Do agregátů se započítávají pouze platné řádky
+a hodnoty, které nejsou NaN. Úhly se ukládají v obloukové míře, pokud
+agregát nevytvoříme s parametrem degrees=True.
+
+Modul lze spustit i samostatně příkazem:
+
+python aggregates.py {název útvaru} {počet řádků} [seed]
+
+který vygeneruje zadaný počet náhodných konstruovatelných útvarů (viz
+modul generator) a vypíše souhrnné statistiky hodnot všech jejich veličin.
+"""
+
+import abc
+import math
+import sys
+import solver
+
+
+class Aggregate(abc.ABC):
+    """
+    Společný základ agregátů hodnot jedné veličiny
+
+    Odvozené třídy musí implementovat metody add, merge a result, jinak
+    nelze vytvořit jejich instanci.
+    """
+
+    def __init__(self, symbol, degrees=False):
+        """
+        Konstruktor agregátu
+
+        :param symbol: značka veličiny: str
+        :param degrees: zda se hodnoty (úhly) mají před započítáním převést
+        na stupně: bool
+        """
+        self.symbol = symbol
+        self.degrees = degrees
+
+    def update(self, values, valid=None):
+        """
+        Započítá do agregátu jednu dávku řádků
+
+        :param values: sloupce hodnot veličin: dict
+        :param valid: sloupec s platností řádků (None, pokud jsou platné
+        všechny řádky): list
+        :return: None
+        """
+        column = values[self.symbol]
+        if valid is not None:
+            column = [value for value, ok in zip(column, valid) if ok]
+        column = [value for value in column if not math.isnan(value)]
+        if self.degrees:
+            column = [math.degrees(value) for value in column]
+        if column:
+            self.add(column)
+
+    @abc.abstractmethod
+    def add(self, column):
+        """
+        Započítá do agregátu sloupec hodnot
+
+        :param column: hodnoty bez NaN: list
+        :return: None
+        """
+        pass
+
+    @abc.abstractmethod
+    def merge(self, other):
+        """
+        Sloučí do agregátu jiný agregát téhož druhu a téže veličiny
+
+        :param other: slučovaný agregát: Aggregate
+        :return: None
+        """
+        pass
+
+    @abc.abstractmethod
+    def result(self):
+        """
+        Vrátí výsledek agregátu
+
+        :return: slovník s výsledky: dict
+        """
+        pass
+
+    def _check_mergeable(self, other):
+        """
+        Ověří, zda lze jiný agregát sloučit s tímto agregátem
+
+        :param other: slučovaný agregát: Aggregate
+        :return: None
+        """
+        if type(other) is not type(self) or other.symbol != self.symbol \
+                or other.degrees != self.degrees:
+            raise ValueError(f'Agregát {other!r} nelze sloučit s agregátem '
+                             f'{self!r}.')
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.symbol!r})'
+
+
+class Sum(Aggregate):
+    """
+    Součet hodnot s kompenzací zaokrouhlovací chyby
+    """
+
+    def __init__(self, symbol, degrees=False):
+        super().__init__(symbol, degrees)
+        self.total = 0.0
+        self.compensation = 0.0
+
+    def add(self, column):
+        total = self.total
+        compensation = self.compensation
+        for value in column:
+            new_total = total + value
+            if abs(total) >= abs(value):
+                compensation += (total - new_total) + value
+            else:
+                compensation += (value - new_total) + total
+            total = new_total
+        self.total = total
+        self.compensation = compensation
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        self.add([other.total, other.compensation])
+
+    def result(self):
+        return {'sum': self.total + self.compensation}
+
+
+class Moments(Aggregate):
+    """
+    Počet, průměr a rozptyl hodnot
+    """
+
+    def __init__(self, symbol, degrees=False):
+        super().__init__(symbol, degrees)
+        self.count = 0
+        self.mean = 0.0
+        # součet čtverců odchylek od průměru
+        self.m2 = 0.0
+
+    def add(self, column):
+        # dávku nejprve zpracujeme Welfordovým algoritmem samostatně
+        # a výsledek poté sloučíme s dosavadními hodnotami
+        chunk = Moments(self.symbol, self.degrees)
+        count, mean, m2 = 0, 0.0, 0.0
+        for value in column:
+            count += 1
+            delta = value - mean
+            mean += delta / count
+            m2 += delta * (value - mean)
+        chunk.count, chunk.mean, chunk.m2 = count, mean, m2
+        self.merge(chunk)
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def result(self):
+        variance = self.m2 / self.count if self.count else math.nan
+        sample_variance = self.m2 / (self.count - 1) \
+            if self.count > 1 else math.nan
+        return {
+            'count': self.count,
+            'mean': self.mean if self.count else math.nan,
+            'variance': variance,
+            'sample_variance': sample_variance,
+            'std': math.sqrt(variance) if self.count else math.nan,
+        }
+
+
+class MinMax(Aggregate):
+    """
+    Nejmenší a největší hodnota
+    """
+
+    def __init__(self, symbol, degrees=False):
+        super().__init__(symbol, degrees)
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def add(self, column):
+        self.minimum = min(self.minimum, min(column))
+        self.maximum = max(self.maximum, max(column))
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    def result(self):
+        return {'min': self.minimum, 'max': self.maximum}
+
+
+class Histogram(Aggregate):
+    """
+    Počty hodnot v intervalech pevné šířky
+
+    Hodnoty mimo interval [low, high) se počítají zvlášť jako podtečení
+    a přetečení.
+    """
+
+    def __init__(self, symbol, low, high, bins=10, degrees=False):
+        """
+        Konstruktor histogramu
+
+        :param symbol: značka veličiny: str
+        :param low: dolní mez prvního intervalu: float
+        :param high: horní mez posledního intervalu: float
+        :param bins: počet intervalů: int
+        :param degrees: zda se hodnoty (úhly) mají před započítáním převést
+        na stupně: bool
+        """
+        super().__init__(symbol, degrees)
+        if not low < high or bins < 1:
+            raise ValueError('Neplatné meze nebo počet intervalů histogramu.')
+        self.low = low
+        self.high = high
+        self.counts = [0] * bins
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, column):
+        bins = len(self.counts)
+        width = (self.high - self.low) / bins
+        for value in column:
+            if value < self.low:
+                self.underflow += 1
+            elif value >= self.high:
+                self.overflow += 1
+            else:
+                self.counts[min(int((value - self.low) / width),
+                                bins - 1)] += 1
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        if (other.low, other.high, len(other.counts)) \
+                != (self.low, self.high, len(self.counts)):
+            raise ValueError('Histogramy s různými intervaly nelze sloučit.')
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def result(self):
+        bins = len(self.counts)
+        width = (self.high - self.low) / bins
+        return {
+            'edges': [self.low + width * i for i in range(bins + 1)],
+            'counts': list(self.counts),
+            'underflow': self.underflow,
+            'overflow': self.overflow,
+        }
+
+
+class QuantileSketch(Aggregate):
+    """
+    Přibližné kvantily kladných hodnot s omezenou relativní chybou
+
+    Hodnoty se počítají v intervalech (gamma^(k-1), gamma^k], kde
+    gamma = (1 + accuracy) / (1 - accuracy), a za kvantil se považuje
+    střed intervalu, takže relativní chyba kvantilu nepřekročí accuracy.
+    Počet intervalů je úměrný logaritmu poměru největší a nejmenší
+    hodnoty, nikoli počtu hodnot. Nekladné hodnoty se počítají zvlášť
+    a za jejich kvantil se považuje nula.
+    """
+
+    def __init__(self, symbol, accuracy=0.01, degrees=False):
+        """
+        Konstruktor odhadu kvantilů
+
+        :param symbol: značka veličiny: str
+        :param accuracy: maximální relativní chyba kvantilů: float
+        :param degrees: zda se hodnoty (úhly) mají před započítáním převést
+        na stupně: bool
+        """
+        super().__init__(symbol, degrees)
+        if not 0.0 < accuracy < 1.0:
+            raise ValueError('Přesnost musí ležet v intervalu (0, 1).')
+        self.accuracy = accuracy
+        self.log_gamma = math.log((1 + accuracy) / (1 - accuracy))
+        self.buckets = dict()
+        self.non_positive = 0
+        self.count = 0
+
+    def add(self, column):
+        buckets = self.buckets
+        log_gamma = self.log_gamma
+        for value in column:
+            if value > 0.0:
+                key = math.ceil(math.log(value) / log_gamma)
+                buckets[key] = buckets.get(key, 0) + 1
+            else:
+                self.non_positive += 1
+        self.count += len(column)
+
+    def merge(self, other):
+        self._check_mergeable(other)
+        if other.accuracy != self.accuracy:
+            raise ValueError('Odhady kvantilů s různou přesností nelze '
+                             'sloučit.')
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.non_positive += other.non_positive
+        self.count += other.count
+
+    def quantile(self, q):
+        """
+        Vrátí přibližný kvantil hodnot
+
+        :param q: pořadí kvantilu v intervalu [0, 1] (např. 0.5 pro
+        medián): float
+        :return: kvantil nebo NaN, pokud agregát neobsahuje žádné hodnoty:
+        float
+        """
+        if not self.count:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        seen = self.non_positive
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if rank < seen:
+                return 2 * math.exp(key * self.log_gamma) \
+                    / (1 + math.exp(self.log_gamma))
+
+        return 2 * math.exp(max(self.buckets) * self.log_gamma) \
+            / (1 + math.exp(self.log_gamma))
+
+    def result(self):
+        return {f'q{round(q * 100)}': self.quantile(q)
+                for q in (0.01, 0.25, 0.5, 0.75, 0.99)}
+
+
+def update_sinks(sinks, values, valid=None):
+    """
+    Započítá dávku řádků do všech agregátů
+
+    :param sinks: agregáty: list
+    :param values: sloupce hodnot veličin: dict
+    :param valid: sloupec s platností řádků: list
+    :return: None
+    """
+    for sink in sinks:
+        sink.update(values, valid)
+
+
+def aggregate_batches(geom_shape, batches, sinks, check_conditions=True):
+    """
+    Hromadně spočítá postupně zadávané dávky řádků a započítá je do agregátů
+
+    Spočítané hodnoty se po započítání zahodí, takže v paměti je vždy
+    pouze jedna dávka řádků. Funkci lze volat v pracovních procesech
+    (agregáty lze předávat mezi procesy modulem pickle) a jejich výsledky
+    poté sloučit funkcí merge_sinks.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param batches: iterovatelný objekt se slovníky sloupců zadaných
+    hodnot (viz solver.solve_batch): iterable
+    :param sinks: agregáty: list
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :return: agregáty: list
+    """
+    for columns in batches:
+        solver.solve_batch(geom_shape, columns, check_conditions, sinks)
+
+    return sinks
+
+
+def merge_sinks(results):
+    """
+    Sloučí agregáty spočítané v několika pracovních procesech
+
+    Každý proces musí vrátit seznam agregátů stejných druhů a veličin ve
+    stejném pořadí.
+
+    :param results: seznamy agregátů jednotlivých procesů: list of lists
+    :return: sloučené agregáty: list
+    """
+    results = list(results)
+    merged = results[0]
+    for sinks in results[1:]:
+        for sink, other in zip(merged, sinks):
+            sink.merge(other)
+
+    return merged
+
+
+def default_sinks(geom_shape):
+    """
+    Vrátí základní agregáty všech veličin GEOMETRICKÉHO útvaru
+
+    Pro každou veličinu vrátí součet, momenty, minimum a maximum a odhad
+    kvantilů; úhly se převádějí na stupně a pro úhly se navíc vrátí
+    histogram po deseti stupních.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :return: agregáty: list
+    """
+    sinks = []
+    for symbol, properties in geom_shape.general_properties.items():
+        degrees = properties['is_angle']
+        sinks.extend([Sum(symbol, degrees), Moments(symbol, degrees),
+                      MinMax(symbol, degrees),
+                      QuantileSketch(symbol, degrees=degrees)])
+        if degrees:
+            sinks.append(Histogram(symbol, 0.0, 180.0, 18, degrees))
+
+    return sinks
+
+
+if __name__ == '__main__':
+    import catalog
+    import generator
+
+    shapes = catalog.load_catalog()
+    shape_generator = generator.ShapeGenerator(
+        shapes[sys.argv[1]], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    aggregate_sinks = default_sinks(shapes[sys.argv[1]])
+
+    for generated_chunk in shape_generator.chunks(int(sys.argv[2])):
+        update_sinks(aggregate_sinks, generated_chunk)
+
+    for aggregate_sink in aggregate_sinks:
+        print(f'{aggregate_sink!r}: {aggregate_sink.result()}')
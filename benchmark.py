@@ -0,0 +1,171 @@
+"""
+Modul pro měření propustnosti vícevláknového hromadného výpočtu
+
+Modul změří, kolik řádků za sekundu spočítá funkce
+solver.solve_batch_threaded při různém počtu vláken, a ověří, že výsledky
+nezávisí na počtu vláken. Vstupní data se náhodně vygenerují modulem
+generator.
+
+Škálování s počtem vláken lze očekávat pouze v CPythonu bez globálního
+zámku interpretu (tzv. free-threaded build, např. python3.13t), jinak se
+vlákna při vyhodnocování vzorců střídají a propustnost zůstane přibližně
+stejná jako s jediným vláknem.
+
+Modul lze spustit i samostatně příkazem:
+
+python benchmark.py {název útvaru} [počet řádků] [nejvyšší počet vláken]
+
+který vypíše propustnost pro 1, 2, 4, ... vláken až po zadaný nejvyšší
+počet (výchozí je počet procesorů).
+"""
+
+import concurrent.futures
+import math
+import os
+import sys
+import time
+import catalog
+import generator
+import solver
+
+
+# Výchozí počet řádků, nad kterými se propustnost měří
+DEFAULT_ROWS = 200000
+
+# Počet opakování měření pro každý počet vláken (použije se nejkratší čas)
+DEFAULT_REPEATS = 3
+
+
+def gil_enabled():
+    """
+    Zjistí, zda běžící interpret používá globální zámek interpretu (GIL)
+
+    :return: True, pokud je GIL zapnutý: bool
+    """
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def thread_counts(max_threads):
+    """
+    Vrátí počty vláken, pro které se propustnost měří (mocniny dvou
+    a nejvyšší počet)
+
+    :param max_threads: nejvyšší počet vláken: int
+    :return: vzestupně seřazené počty vláken: list
+    """
+    counts = []
+    threads = 1
+    while threads < max_threads:
+        counts.append(threads)
+        threads *= 2
+
+    return counts + [max_threads]
+
+
+def generate_inputs(geom_shape, rows, seed=0):
+    """
+    Vygeneruje sloupce hodnot veličin první minimální množiny útvaru
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param rows: počet řádků: int
+    :param seed: počáteční hodnota generátoru náhodných čísel: int
+    :return: sloupce hodnot zadaných veličin: dict
+    """
+    input_symbols = geom_shape.minimal_determining_sets[0]
+    shape_generator = generator.ShapeGenerator(geom_shape, seed,
+                                               input_symbols)
+
+    columns = {symbol: [] for symbol in input_symbols}
+    for chunk in shape_generator.chunks(rows):
+        for symbol, column in columns.items():
+            column.extend(chunk[symbol])
+
+    return columns
+
+
+def same_results(first, second):
+    """
+    Ověří, zda jsou výsledky dvou hromadných výpočtů shodné
+
+    :param first: sloupce hodnot a sloupec platnosti: tuple
+    :param second: sloupce hodnot a sloupec platnosti: tuple
+    :return: True, pokud se výsledky shodují (NaN se považuje za shodné
+    s NaN): bool
+    """
+    if first[1] != second[1] or first[0].keys() != second[0].keys():
+        return False
+
+    return all(a == b or (math.isnan(a) and math.isnan(b))
+               for symbol, column in first[0].items()
+               for a, b in zip(column, second[0][symbol]))
+
+
+def benchmark_threads(geom_shape, columns, counts,
+                      chunk_rows=solver.THREAD_CHUNK_ROWS,
+                      repeats=DEFAULT_REPEATS):
+    """
+    Změří propustnost vícevláknového hromadného výpočtu
+
+    Vlákna se vytvoří před měřením, takže se do času nezapočítává jejich
+    spuštění.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param columns: sloupce hodnot zadaných veličin: dict
+    :param counts: počty vláken: list
+    :param chunk_rows: počet řádků jedné dávky: int
+    :param repeats: počet opakování měření: int
+    :return: slovníky s položkami 'threads', 'seconds', 'rows_per_second',
+    'speedup' a 'same_results' pro jednotlivé počty vláken: list
+    """
+    rows = len(next(iter(columns.values())))
+    report = []
+    reference = None
+
+    for threads in counts:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            # zahřátí vláken a mezipamětí přeložených vzorců a plánů
+            solver.solve_batch_threaded(
+                geom_shape, {symbol: column[:chunk_rows * threads]
+                             for symbol, column in columns.items()},
+                chunk_rows=chunk_rows, executor=executor)
+
+            seconds = math.inf
+            for _ in range(repeats):
+                start = time.perf_counter()
+                result = solver.solve_batch_threaded(
+                    geom_shape, columns, chunk_rows=chunk_rows,
+                    executor=executor)
+                seconds = min(seconds, time.perf_counter() - start)
+
+        if reference is None:
+            reference = result, seconds
+        report.append({
+            'threads': threads,
+            'seconds': seconds,
+            'rows_per_second': rows / seconds,
+            'speedup': reference[1] / seconds,
+            'same_results': same_results(reference[0], result),
+        })
+
+    return report
+
+
+if __name__ == '__main__':
+    shapes = catalog.load_catalog()
+    benchmarked_shape = shapes[sys.argv[1]]
+    benchmark_rows = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_ROWS
+    max_thread_count = int(sys.argv[3]) if len(sys.argv) > 3 \
+        else os.cpu_count() or 1
+
+    print(f'{sys.version.split()[0]}, GIL '
+          f'{"zapnutý" if gil_enabled() else "vypnutý"}, '
+          f'{benchmark_rows} řádků')
+    for measurement in benchmark_threads(
+            benchmarked_shape,
+            generate_inputs(benchmarked_shape, benchmark_rows),
+            thread_counts(max_thread_count)):
+        print(f'počet vláken {measurement["threads"]:>3}: '
+              f'{measurement["rows_per_second"]:>12,.0f} řádků/s, '
+              f'zrychlení {measurement["speedup"]:.2f}x'
+              f'{"" if measurement["same_results"] else ", ROZDÍLNÉ VÝSLEDKY"}')
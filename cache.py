@@ -0,0 +1,325 @@
+"""
+Modul s mezipamětí výsledků výpočtů hodnot veličin
+
+Výsledek výpočtu hodnot veličin útvaru je jednoznačně určen definicí
+GEOMETRICKÉHO útvaru a hodnotami zadaných veličin, takže opakované výpočty
+se stejnými vstupy (např. stále stejné rozměry kvádru) lze nahradit
+vyhledáním dříve spočítaného výsledku. Klíčem výsledku je název
+GEOMETRICKÉHO útvaru, otisk jeho vzorců a podmínek (viz
+shape_fingerprint), seřazené značky zadaných veličin a přesné bitové
+vyjádření jejich hodnot.
+
+Mezipaměť má dvě úrovně:
+- paměť procesu, ze které se při překročení zadaného počtu bajtů vyřazují
+  nejdéle nepoužité výsledky (LRU),
+- volitelně databázi SQLite v souboru, kterou může sdílet více procesů na
+  jednom počítači a do které se zapisují všechny výsledky.
+
+Mezipaměť zaznamenává počty úspěšných a neúspěšných vyhledání a počet
+vyřazených výsledků (viz ResultCache.statistics).
+"""
+
+import collections
+import hashlib
+import math
+import sqlite3
+import struct
+import sys
+import solver
+
+
+# Výchozí maximální velikost výsledků uložených v paměti procesu v bajtech
+DEFAULT_BYTE_BUDGET = 16 * 1024 * 1024
+
+# Počet bajtů, který se k velikosti klíče a výsledku připočítává za
+# položku slovníku a objekty klíče a výsledku
+ENTRY_OVERHEAD = 2 * sys.getsizeof(b'') + 100
+
+
+def shape_fingerprint(geom_shape):
+    """
+    Vrátí otisk definice GEOMETRICKÉHO útvaru
+
+    Otisk je SHA-256 hash značek veličin, příznaků úhlů, vzorců
+    a podmínek konstruovatelnosti, tzn. všeho, co ovlivňuje výsledek
+    výpočtu. Změna popisů veličin proto otisk nezmění.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :return: otisk v šestnáctkovém zápisu: str
+    """
+    definition = [(symbol, properties['is_angle'],
+                   [way['expression'] for way in properties['countable_by']],
+                   [condition['expression']
+                    for condition in properties['conditions']])
+                  for symbol, properties
+                  in geom_shape.general_properties.items()]
+
+    return hashlib.sha256(repr(definition).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Třída reprezentující dvouúrovňovou mezipaměť výsledků výpočtů
+
+    Výsledkem je n-tice hodnot všech veličin útvaru v pořadí slovníku
+    general_properties (neznámé hodnoty jsou NaN) a informace, zda jsou
+    hodnoty platné (viz solver.solve_batch).
+    """
+
+    def __init__(self, byte_budget=DEFAULT_BYTE_BUDGET, path=None):
+        """
+        Konstruktor mezipaměti
+
+        :param byte_budget: maximální velikost výsledků uložených v paměti
+        procesu v bajtech: int
+        :param path: cesta k souboru databáze SQLite sdílené procesy (None
+        znamená pouze mezipaměť v paměti procesu): str
+        """
+        self.byte_budget = byte_budget
+        self.entries = collections.OrderedDict()
+        self.size = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # otisky GEOMETRICKÝCH útvarů podle identifikátorů jejich instancí;
+        # instance se uchovávají spolu s otisky, aby jejich identifikátory
+        # nemohly být přiděleny jiným objektům
+        self.fingerprints = dict()
+
+        self.connection = None
+        if path is not None:
+            self.connection = sqlite3.connect(path, timeout=30.0)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results '
+                                    '(key BLOB PRIMARY KEY, value BLOB)')
+            self.connection.commit()
+
+    def key_prefix(self, geom_shape, symbols):
+        """
+        Vrátí společný začátek klíčů výsledků útvaru se zadanými veličinami
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param symbols: seřazené značky zadaných veličin: list of strings
+        :return: začátek klíče: bytes
+        """
+        cached = self.fingerprints.get(id(geom_shape))
+        if cached is None or cached[0] is not geom_shape:
+            cached = geom_shape, shape_fingerprint(geom_shape)
+            self.fingerprints[id(geom_shape)] = cached
+
+        return f'{geom_shape.geom_shape_name}\0{cached[1]}\0' \
+               f'{",".join(symbols)}\0'.encode('utf-8')
+
+    def key(self, geom_shape, inputs):
+        """
+        Vrátí klíč výsledku výpočtu ze zadaných hodnot veličin
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param inputs: hodnoty zadaných veličin ve tvaru {značka: hodnota}:
+        dict
+        :return: klíč: bytes
+        """
+        symbols = sorted(inputs)
+        return self.key_prefix(geom_shape, symbols) + struct.pack(
+            f'<{len(symbols)}d', *[inputs[symbol] for symbol in symbols])
+
+    def get(self, key):
+        """
+        Vyhledá výsledek v paměti procesu a poté v databázi
+
+        Výsledek nalezený v databázi se uloží i do paměti procesu.
+
+        :param key: klíč výsledku: bytes
+        :return: hodnoty všech veličin a platnost nebo None, pokud výsledek
+        nebyl nalezen: tuple
+        """
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+            return self._unpack(value)
+
+        if self.connection is not None:
+            row = self.connection.execute(
+                'SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self._remember(key, row[0])
+                return self._unpack(row[0])
+
+        self.misses += 1
+        return None
+
+    def put(self, key, values, valid=True):
+        """
+        Uloží výsledek do paměti procesu i do databáze
+
+        :param key: klíč výsledku: bytes
+        :param values: hodnoty všech veličin útvaru: tuple
+        :param valid: zda jsou hodnoty platné: bool
+        :return: None
+        """
+        self.put_many([(key, values, valid)])
+
+    def put_many(self, results):
+        """
+        Uloží více výsledků najednou (do databáze v jediné transakci)
+
+        :param results: trojice (klíč, hodnoty, platnost): list
+        :return: None
+        """
+        packed = [(key, struct.pack(f'<?{len(values)}d', valid, *values))
+                  for key, values, valid in results]
+        for key, value in packed:
+            self._remember(key, value)
+
+        if self.connection is not None and packed:
+            with self.connection:
+                self.connection.executemany(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?)', packed)
+
+    def get_values(self, geom_shape, inputs):
+        """
+        Vyhledá hodnoty veličin útvaru spočítané ze zadaných hodnot
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param inputs: hodnoty zadaných veličin ve tvaru {značka: hodnota}:
+        dict
+        :return: známé hodnoty veličin ve tvaru {značka: hodnota} nebo
+        None, pokud výsledek nebyl nalezen nebo není platný: dict
+        """
+        result = self.get(self.key(geom_shape, inputs))
+        if result is None or not result[1]:
+            return None
+
+        return {symbol: value for symbol, value
+                in zip(geom_shape.general_properties, result[0])
+                if not math.isnan(value)}
+
+    def put_values(self, geom_shape, inputs, values):
+        """
+        Uloží hodnoty veličin útvaru spočítané ze zadaných hodnot
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param inputs: hodnoty zadaných veličin ve tvaru {značka: hodnota}:
+        dict
+        :param values: známé hodnoty veličin ve tvaru {značka: hodnota}:
+        dict
+        :return: None
+        """
+        self.put(self.key(geom_shape, inputs),
+                 tuple(values.get(symbol, math.nan)
+                       for symbol in geom_shape.general_properties))
+
+    def solve_batch(self, geom_shape, columns, sinks=()):
+        """
+        Hromadně spočítá hodnoty veličin s využitím mezipaměti
+
+        Výsledek se pro stejné řádky vyhledává pouze jednou. Řádky, jejichž
+        výsledky v mezipaměti nejsou, se spočítají najednou funkcí
+        solver.solve_batch a jejich výsledky se do mezipaměti uloží.
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param columns: sloupce hodnot zadaných veličin: dict
+        :param sinks: agregáty, do kterých se započítají platné řádky (viz
+        modul aggregates): list
+        :return: sloupce hodnot všech veličin a sloupec s platností řádků:
+        tuple
+        """
+        symbols = sorted(columns)
+        prefix = self.key_prefix(geom_shape, symbols)
+        row_format = f'<{len(symbols)}d'
+        keys = [prefix + struct.pack(row_format, *row)
+                for row in zip(*[columns[symbol] for symbol in symbols])]
+
+        # pořadí prvního řádku s daným klíčem
+        first_rows = dict()
+        for i, key in enumerate(keys):
+            first_rows.setdefault(key, i)
+        found = {key: self.get(key) for key in first_rows}
+
+        missing = [key for key, result in found.items() if result is None]
+        if missing:
+            indices = [first_rows[key] for key in missing]
+            values, valid = solver.solve_batch(
+                geom_shape, {symbol: [column[i] for i in indices]
+                             for symbol, column in columns.items()})
+            computed = []
+            for j, key in enumerate(missing):
+                found[key] = tuple(values[symbol][j] for symbol
+                                   in geom_shape.general_properties), valid[j]
+                computed.append((key, *found[key]))
+            self.put_many(computed)
+
+        results = [found[key] for key in keys]
+        values = {symbol: [result[0][k] for result in results]
+                  for k, symbol in enumerate(geom_shape.general_properties)}
+        valid = [result[1] for result in results]
+        for sink in sinks:
+            sink.update(values, valid)
+
+        return values, valid
+
+    def statistics(self):
+        """
+        Vrátí počty vyhledání, vyřazení a velikost mezipaměti
+
+        :return: slovník se statistikami: dict
+        """
+        hits = self.memory_hits + self.disk_hits
+        lookups = hits + self.misses
+
+        return {
+            'hits': hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_ratio': hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.size,
+        }
+
+    def close(self):
+        """
+        Uzavře databázi sdílenou procesy
+
+        :return: None
+        """
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _remember(self, key, value):
+        """
+        Uloží výsledek do paměti procesu a vyřadí nejdéle nepoužité
+        výsledky, které se do zadaného počtu bajtů nevejdou
+
+        :param key: klíč výsledku: bytes
+        :param value: zakódovaný výsledek: bytes
+        :return: None
+        """
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(key) + len(previous) + ENTRY_OVERHEAD
+
+        self.entries[key] = value
+        self.size += len(key) + len(value) + ENTRY_OVERHEAD
+        while self.size > self.byte_budget and self.entries:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.size -= len(old_key) + len(old_value) + ENTRY_OVERHEAD
+            self.evictions += 1
+
+    @staticmethod
+    def _unpack(value):
+        """
+        Dekóduje výsledek uložený v mezipaměti
+
+        :param value: zakódovaný výsledek: bytes
+        :return: hodnoty všech veličin a platnost: tuple
+        """
+        unpacked = struct.unpack(f'<?{(len(value) - 1) // 8}d', value)
+        return unpacked[1:], unpacked[0]
@@ -0,0 +1,512 @@
+"""
+Modul s nástroji pro práci s katalogem GEOMETRICKÝCH útvarů
+
+Katalogem se rozumí textový soubor list_of_shapes.txt spolu s textovými
+soubory jednotlivých GEOMETRICKÝCH útvarů, na které odkazuje.
+
+Modul také umožňuje zpracovaný katalog serializovat do jediného bloku
+bajtů a ten umístit do sdílené paměti (multiprocessing.shared_memory).
+Pracovní procesy se k tomuto bloku pouze připojí a jednotlivé GEOMETRICKÉ
+útvary z něj deserializují až ve chvíli, kdy je skutečně potřebují, takže
+nemusí znovu číst a zpracovávat textové soubory.
+
+Serializovaný katalog lze také uložit do souboru (tzv. balíčku katalogu,
+viz build_bundle), ze kterého program při spuštění načte GEOMETRICKÉ útvary
+místo zpracování jejich textových souborů. Balíček se při načtení pouze
+namapuje do paměti (modul mmap) a útvary se z něj deserializují, až když
+jsou potřeba. Útvary, jejichž textové soubory se od sestavení balíčku
+změnily, se načtou z textových souborů.
+
+Formát serializovaného katalogu:
+- 4 bajty s identifikátorem formátu CATALOG_MAGIC,
+- 4 bajty s verzí formátu CATALOG_FORMAT_VERSION,
+- 4 bajty s délkou hlavičky,
+- hlavička ve formátu JSON - slovník s položkami:
+  - 'shapes' - slovník, jehož klíči jsou názvy GEOMETRICKÝCH útvarů
+    a hodnotami trojice [posun, délka, SHA-256 hash] serializované instance
+    útvaru (posun je počítán od začátku dat za hlavičkou),
+  - 'list_of_shapes' - položky souboru list_of_shapes.txt ve tvaru
+    [název útvaru, popisný název, cesta],
+  - 'sources' - slovník, jehož klíči jsou cesty k textovým souborům,
+    ze kterých byl katalog sestaven, a hodnotami jejich signatury (viz
+    textfiles.file_signature),
+- za sebou uložené instance třídy GeometricShape serializované modulem
+  pickle.
+
+Modul lze spustit i samostatně příkazem:
+
+python catalog.py check
+
+který zkontroluje celý katalog a vypíše nalezené nedostatky, ještě než
+se změněné nebo nové textové soubory útvarů začnou používat, nebo příkazem:
+
+python catalog.py build
+
+který sestaví balíček katalogu CATALOG_BUNDLE.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+from multiprocessing import shared_memory
+import families
+import textfiles
+from shape import GeometricShape
+
+
+# Textový soubor s výčtem dostupných geometrických útvarů
+LIST_OF_SHAPES = 'list_of_shapes.txt'
+
+# Soubor s balíčkem katalogu (viz build_bundle)
+CATALOG_BUNDLE = 'catalog.bundle'
+
+# Identifikátor a verze formátu serializovaného katalogu
+CATALOG_MAGIC = b'GSCT'
+CATALOG_FORMAT_VERSION = 5
+
+# Struktura úvodní části serializovaného katalogu (identifikátor formátu,
+# verze formátu, délka hlavičky)
+_PREAMBLE = struct.Struct('<4sII')
+
+
+def load_catalog(list_of_shapes=LIST_OF_SHAPES, lazy_descriptions=False):
+    """
+    Vytvoří instance všech GEOMETRICKÝCH útvarů z katalogu
+
+    Procesy, které pouze počítají hodnoty veličin a nic nevypisují, mohou
+    útvary vytvořit s líně načítanými popisy veličin (viz
+    QuantityProperties), které pak v jejich paměti nezabírají místo.
+
+    :param list_of_shapes: cesta k výčtu GEOMETRICKÝCH útvarů: str
+    :param lazy_descriptions: zda se popisy veličin mají načítat až při
+    prvním přístupu k nim: bool
+    :return: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    """
+    geom_shapes = dict()
+    for geom_shape_name, full_name, path \
+            in textfiles.shape_list_from_text_file(list_of_shapes):
+        description_index = None
+        if lazy_descriptions:
+            description_index = textfiles.quantity_text_index(
+                path + geom_shape_name + '.txt')
+        geom_shapes[geom_shape_name] = GeometricShape(
+            geom_shape_name,
+            *textfiles.shape_init_list_from_text_file(path, geom_shape_name),
+            description_index=description_index)
+
+    return geom_shapes
+
+
+def serialize_catalog(geom_shapes, list_of_shapes=(), sources=None):
+    """
+    Serializuje instance GEOMETRICKÝCH útvarů do jediného bloku bajtů
+
+    Serializují se kompletně zpracované instance včetně výsledků statické
+    analýzy vzorců a předem sestavených plánů výpočtu, takže po jejich
+    deserializaci již není třeba nic znovu počítat. Minimální množiny
+    veličin určujících útvar, které se jinak hledají až při prvním použití,
+    se proto před serializací vyhledají.
+
+    :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    :param list_of_shapes: položky výčtu GEOMETRICKÝCH útvarů ve tvaru
+    (název útvaru, popisný název, cesta): list
+    :param sources: signatury textových souborů, ze kterých byly útvary
+    vytvořeny, ve tvaru {cesta: signatura}: dict
+    :return: serializovaný katalog: bytes
+    """
+    index = dict()
+    blobs = []
+    offset = 0
+    for geom_shape_name, geom_shape in geom_shapes.items():
+        geom_shape.minimal_determining_sets
+        blob = pickle.dumps(geom_shape, pickle.HIGHEST_PROTOCOL)
+        index[geom_shape_name] = [offset, len(blob),
+                                  hashlib.sha256(blob).hexdigest()]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        'shapes': index,
+        'list_of_shapes': [list(item) for item in list_of_shapes],
+        'sources': sources or {},
+    }).encode('utf8')
+    preamble = _PREAMBLE.pack(CATALOG_MAGIC, CATALOG_FORMAT_VERSION,
+                              len(header))
+
+    return b''.join([preamble, header] + blobs)
+
+
+class CatalogView:
+    """
+    Třída zpřístupňující serializovaný katalog GEOMETRICKÝCH útvarů
+
+    Instance třídy pracuje přímo nad předaným blokem bajtů (např. nad
+    sdílenou pamětí nebo namapovaným souborem), který nekopíruje. Při
+    vytvoření instance se zpracuje pouze hlavička katalogu. Jednotlivé
+    GEOMETRICKÉ útvary se deserializují až při prvním přístupu k nim
+    a poté se uchovávají pro další použití.
+    """
+
+    def __init__(self, buffer):
+        """
+        Konstruktor pohledu na serializovaný katalog
+
+        :param buffer: serializovaný katalog: bytes / memoryview / mmap
+        """
+        self.buffer = memoryview(buffer)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(self.buffer)
+        if magic != CATALOG_MAGIC or version != CATALOG_FORMAT_VERSION:
+            raise ValueError('Neplatný formát serializovaného katalogu.')
+
+        header_start = _PREAMBLE.size
+        self.data_start = header_start + header_length
+
+        header = json.loads(
+            bytes(self.buffer[header_start:self.data_start]).decode('utf8'))
+
+        # slovník s posuny, délkami a hashi serializovaných instancí útvarů
+        self.index = header['shapes']
+
+        # položky výčtu GEOMETRICKÝCH útvarů a signatury textových souborů,
+        # ze kterých byl katalog sestaven
+        self.list_of_shapes = [tuple(item)
+                               for item in header['list_of_shapes']]
+        self.sources = {path: tuple(signature)
+                        for path, signature in header['sources'].items()}
+
+        # již deserializované instance GEOMETRICKÝCH útvarů
+        self.geom_shapes = dict()
+
+    def __contains__(self, geom_shape_name):
+        return geom_shape_name in self.index
+
+    def __getitem__(self, geom_shape_name):
+        return self.get(geom_shape_name)
+
+    def names(self):
+        """
+        Vrátí názvy GEOMETRICKÝCH útvarů v katalogu
+
+        :return: názvy útvarů: list
+        """
+        return list(self.index)
+
+    def get(self, geom_shape_name):
+        """
+        Vrátí instanci GEOMETRICKÉHO útvaru z katalogu
+
+        Před deserializací se ověří hash serializované instance, a pokud
+        nesouhlasí, vyvolá se výjimka ValueError.
+
+        :param geom_shape_name: geometrický název útvaru bez diakritiky: str
+        :return: instance GEOMETRICKÉHO útvaru: GeometricShape
+        """
+        geom_shape = self.geom_shapes.get(geom_shape_name)
+        if geom_shape is None:
+            offset, length, content_hash = self.index[geom_shape_name]
+            start = self.data_start + offset
+            blob = self.buffer[start:start + length]
+            if hashlib.sha256(blob).hexdigest() != content_hash:
+                raise ValueError(f'Serializovaný útvar {geom_shape_name} je '
+                                 f'poškozený.')
+            geom_shape = pickle.loads(blob)
+            self.geom_shapes[geom_shape_name] = geom_shape
+
+        return geom_shape
+
+    def release(self):
+        """
+        Uvolní odkaz na blok bajtů s katalogem
+
+        Metodu je třeba zavolat před uzavřením sdílené paměti nebo
+        namapovaného souboru, nad kterým pohled pracuje. Již deserializované
+        instance GEOMETRICKÝCH útvarů zůstanou dostupné.
+
+        :return: None
+        """
+        self.buffer.release()
+
+
+class CatalogBundle(CatalogView):
+    """
+    Třída zpřístupňující balíček katalogu uložený v souboru
+
+    Soubor se namapuje do paměti, takže se při vytvoření instance přečte
+    pouze jeho hlavička a serializované útvary se čtou až při prvním
+    přístupu k nim.
+    """
+
+    def __init__(self, path=CATALOG_BUNDLE):
+        """
+        Konstruktor balíčku katalogu
+
+        :param path: cesta k souboru s balíčkem: str
+        """
+        with open(path, 'rb') as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            super().__init__(self.mapping)
+        except (ValueError, KeyError, struct.error):
+            self.mapping.close()
+            raise ValueError(f'Soubor {path} neobsahuje platný balíček '
+                             f'katalogu.')
+
+    def is_current(self, full_path):
+        """
+        Ověří, zda se textový soubor od sestavení balíčku nezměnil
+
+        Pokud se čas poslední změny a velikost souboru shodují s jeho
+        signaturou uloženou v balíčku, soubor se vůbec nečte (viz
+        textfiles.file_signature).
+
+        :param full_path: relativní cesta k textovému souboru: str
+        :return: aktuální signatura souboru, pokud se jeho obsah nezměnil,
+        jinak None: tuple
+        """
+        stored_signature = self.sources.get(full_path)
+        if stored_signature is None:
+            return None
+
+        signature = textfiles.file_signature(full_path, stored_signature)
+        if signature is None or signature[2] != stored_signature[2]:
+            return None
+
+        return signature
+
+    def close(self):
+        """
+        Uvolní pohled na balíček a uzavře namapovaný soubor
+
+        :return: None
+        """
+        self.release()
+        self.mapping.close()
+
+
+def build_bundle(path=CATALOG_BUNDLE, list_of_shapes=LIST_OF_SHAPES):
+    """
+    Sestaví balíček katalogu a uloží ho do souboru
+
+    Balíček obsahuje všechny GEOMETRICKÉ útvary z katalogu včetně popisů
+    jejich veličin a signatury všech textových souborů, ze kterých byl
+    sestaven. Soubor se zapíše nejprve pod dočasným názvem a teprve poté se
+    přejmenuje, takže běžící program nikdy nenačte napůl zapsaný balíček.
+
+    :param path: cesta k souboru s balíčkem: str
+    :param list_of_shapes: cesta k výčtu GEOMETRICKÝCH útvarů: str
+    :return: počet útvarů v balíčku: int
+    """
+    shapes = textfiles.shape_list_from_text_file(list_of_shapes)
+
+    sources = {list_of_shapes: textfiles.file_signature(list_of_shapes)}
+    geom_shapes = dict()
+    for geom_shape_name, full_name, shape_path in shapes:
+        full_path = shape_path + geom_shape_name + '.txt'
+        sources[full_path] = textfiles.file_signature(full_path)
+        geom_shapes[geom_shape_name] = GeometricShape(
+            geom_shape_name,
+            *textfiles.shape_init_list_from_text_file(shape_path,
+                                                      geom_shape_name))
+
+    data = serialize_catalog(geom_shapes, shapes, sources)
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+    return len(geom_shapes)
+
+
+def open_bundle(path=CATALOG_BUNDLE):
+    """
+    Otevře balíček katalogu, pokud existuje a je platný
+
+    :param path: cesta k souboru s balíčkem: str
+    :return: balíček katalogu nebo None: CatalogBundle
+    """
+    try:
+        return CatalogBundle(path)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_catalog(geom_shapes, name=None):
+    """
+    Umístí serializovaný katalog do nového bloku sdílené paměti
+
+    Vrácený blok sdílené paměti je třeba po ukončení všech pracovních
+    procesů uzavřít a odstranit voláním jeho metod close() a unlink().
+    Jeho název (atribut name) se předává pracovním procesům, které se
+    k němu připojí funkcí attach_catalog.
+
+    :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    :param name: název bloku sdílené paměti (None pro náhodný název): str
+    :return: blok sdílené paměti s katalogem: SharedMemory
+    """
+    data = serialize_catalog(geom_shapes)
+
+    shared_block = shared_memory.SharedMemory(name=name, create=True,
+                                              size=len(data))
+    shared_block.buf[:len(data)] = data
+
+    return shared_block
+
+
+def attach_catalog(name):
+    """
+    Připojí se k bloku sdílené paměti s katalogem
+
+    Funkci volá pracovní proces. Vrácený blok sdílené paměti je třeba
+    před ukončením procesu uzavřít (po uvolnění pohledu jeho metodou
+    release) metodou close(), nikoli však odstranit.
+
+    :param name: název bloku sdílené paměti: str
+    :return: blok sdílené paměti a pohled na katalog v něm: tuple
+    """
+    shared_block = shared_memory.SharedMemory(name=name)
+    return shared_block, CatalogView(shared_block.buf)
+
+
+def check_catalog(list_of_shapes=LIST_OF_SHAPES,
+                  list_of_families=families.LIST_OF_FAMILIES):
+    """
+    Zkontroluje katalog GEOMETRICKÝCH útvarů a vrátí seznam zjištění
+
+    Funkce ověří, zda všechny útvary uvedené v souboru list_of_shapes.txt
+    mají svůj textový soubor a zda všechny textové soubory v adresářích,
+    na které tento výčet odkazuje, jsou ve výčtu uvedeny. Každý útvar
+    dále zpracuje a ze statické analýzy jeho vzorců (viz
+    GeometricShape._analyze_formulas) doplní informace o veličinách, které
+    nelze spočítat z jiných veličin, a o vzorcích, které se nikdy
+    nepoužijí. Parametrické rodiny uvedené v souboru list_of_families.txt
+    se zkontrolují s nejmenší hodnotou svého parametru.
+
+    :param list_of_shapes: cesta k výčtu GEOMETRICKÝCH útvarů: str
+    :param list_of_families: cesta k výčtu parametrických rodin (None,
+    pokud se rodiny nemají kontrolovat): str
+    :return: zjištění ve formě textových zpráv: list
+    """
+    findings = []
+
+    shapes = textfiles.shape_list_from_text_file(list_of_shapes)
+    listed_files = set()
+    directories = set()
+
+    for geom_shape_name, full_name, path in shapes:
+        full_path = path + geom_shape_name + '.txt'
+        listed_files.add(os.path.normpath(full_path))
+        directories.add(path)
+
+        if not os.path.isfile(full_path):
+            findings.append(f'{geom_shape_name}: textový soubor {full_path} '
+                            f'neexistuje.')
+            continue
+
+        findings.extend(check_shape_file(path, geom_shape_name))
+
+    if list_of_families is not None and os.path.isfile(list_of_families):
+        for family_name, full_name, path \
+                in textfiles.shape_list_from_text_file(list_of_families):
+            listed_files.add(os.path.normpath(path + family_name + '.txt'))
+            findings.extend(check_family_file(path, family_name))
+
+    # textové soubory, které ve výčtu chybí, zkontrolujeme také, aby bylo
+    # zřejmé, zda je lze do výčtu bez úprav doplnit
+    for path in sorted(directories):
+        for filename in sorted(os.listdir(path or '.')):
+            full_path = os.path.normpath(os.path.join(path, filename))
+            if filename.endswith('.txt') and full_path not in listed_files:
+                findings.append(f'{filename[:-4]}: textový soubor '
+                                f'{full_path} není uveden v souboru '
+                                f'{list_of_shapes}.')
+                findings.extend(check_shape_file(path, filename[:-4]))
+
+    return findings
+
+
+def check_shape_file(path, geom_shape_name):
+    """
+    Zpracuje textový soubor GEOMETRICKÉHO útvaru a vrátí seznam zjištění
+
+    :param path: relativní cesta k textovému souboru útvaru bez jeho
+    názvu: str
+    :param geom_shape_name: geometrický název útvaru bez diakritiky: str
+    :return: zjištění ve formě textových zpráv: list
+    """
+    try:
+        geom_shape = GeometricShape(
+            geom_shape_name,
+            *textfiles.shape_init_list_from_text_file(path, geom_shape_name))
+    except (ValueError, IndexError, KeyError, TypeError) as error:
+        return [f'{geom_shape_name}: textový soubor '
+                f'{path + geom_shape_name}.txt nelze zpracovat ({error!r}).']
+
+    return check_geometric_shape(geom_shape)
+
+
+def check_family_file(path, family_name):
+    """
+    Zpracuje textový soubor parametrické rodiny a vrátí seznam zjištění
+
+    Rodina se zkontroluje jako GEOMETRICKÝ útvar s nejmenší hodnotou
+    parametru.
+
+    :param path: relativní cesta k textovému souboru rodiny bez jeho
+    názvu: str
+    :param family_name: název rodiny bez diakritiky: str
+    :return: zjištění ve formě textových zpráv: list
+    """
+    try:
+        family = families.ShapeFamily(family_name, path)
+        geom_shape = family.instantiate(family.minimum)
+    except (OSError, ValueError, IndexError, KeyError, TypeError) as error:
+        return [f'{family_name}: textový soubor {path + family_name}.txt '
+                f'nelze zpracovat ({error!r}).']
+
+    return check_geometric_shape(geom_shape)
+
+
+def check_geometric_shape(geom_shape):
+    """
+    Vrátí zjištění ze statické analýzy vzorců GEOMETRICKÉHO útvaru
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :return: zjištění ve formě textových zpráv: list
+    """
+    findings = []
+    name = geom_shape.geom_shape_name
+
+    if geom_shape.underivable_quantities:
+        symbols = ', '.join(sorted(geom_shape.underivable_quantities))
+        findings.append(f'{name}: hodnoty veličin {symbols} nelze spočítat '
+                        f'z hodnot jiných veličin.')
+
+    for symbol, expression in geom_shape.unused_formulas:
+        formula = expression.replace('{', '').replace('}', '')
+        findings.append(f'{name}: vzorec {symbol} = {formula} se nikdy '
+                        f'nepoužije.')
+
+    return findings
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['check']:
+        catalog_findings = check_catalog()
+        for finding in catalog_findings:
+            print(finding)
+        sys.exit(1 if catalog_findings else 0)
+
+    if sys.argv[1:] == ['build']:
+        shape_count = build_bundle()
+        print(f'Balíček {CATALOG_BUNDLE} obsahuje {shape_count} útvarů.')
+        sys.exit(0)
+
+    print('Použití: python catalog.py check | build')
+    sys.exit(2)
@@ -0,0 +1,584 @@
+"""
+Modul s indexem výčtu GEOMETRICKÝCH útvarů
+
+Index umožňuje pracovat i s katalogem o desítkách tisíc GEOMETRICKÝCH
+útvarů, aniž by se při spuštění programu musel zpracovat celý soubor
+list_of_shapes.txt a aniž by se při vytváření útvaru musel vypsat celý
+výčet. Index se sestaví předem (viz build_index) a uloží do souboru
+CATALOG_INDEX, který se při spuštění programu pouze namapuje do paměti
+(modul mmap), takže doba spuštění nezávisí na velikosti katalogu. Položky
+výčtu se z indexu čtou až ve chvíli, kdy jsou potřeba.
+
+Index umožňuje:
+- vyhledat položku podle názvu útvaru (binárním vyhledáváním),
+- vyhledat útvary, jejichž název nebo popisný název začíná zadaným textem,
+- vyhledat útvary, jejichž název nebo popisný název obsahuje zadaný text
+  (pomocí seznamů útvarů pro každý znak a každou dvojici a trojici po sobě
+  jdoucích znaků, tzv. n-gramů),
+- vypsat výsledky vyhledávání nebo celý výčet po stránkách.
+
+Při vyhledávání se nerozlišují malá a velká písmena ani diakritika (viz
+normalize), takže např. text 'valec' nalezne útvar s popisným názvem
+'rotační válec'.
+
+Pokud soubor s indexem neexistuje nebo se soubor list_of_shapes.txt od
+sestavení indexu změnil, program index sestaví v paměti ze souboru
+list_of_shapes.txt.
+
+Formát serializovaného indexu (všechna čísla jsou bez znaménka a uložena
+v pořadí little-endian):
+- 4 bajty s identifikátorem formátu INDEX_MAGIC,
+- 4 bajty s verzí formátu INDEX_FORMAT_VERSION,
+- 4 bajty s počtem položek výčtu,
+- 4 bajty s počtem různých n-gramů,
+- 4 bajty s délkou hlavičky,
+- hlavička ve formátu JSON - slovník s položkou 'sources' obsahující
+  signatury textových souborů, ze kterých byl index sestaven (viz
+  textfiles.file_signature),
+- tabulka položek seřazených podle normalizovaného názvu útvaru; pro
+  každou položku posun a délka jejího textu (4 + 4 bajty),
+- pořadová čísla položek seřazených podle normalizovaného popisného názvu
+  (4 bajty na položku),
+- tabulka n-gramů seřazených podle jejich kódu (viz _gram_code); pro
+  každý n-gram kód, posun a počet pořadových čísel položek, které ho
+  obsahují (8 + 4 + 4 bajty),
+- vzestupně seřazená pořadová čísla položek pro jednotlivé n-gramy
+  (4 bajty na číslo),
+- texty položek ve tvaru {název}|{popisný název}|{cesta} v kódování UTF-8.
+
+Modul lze spustit i samostatně příkazem:
+
+python catalog_index.py build
+
+který sestaví index CATALOG_INDEX, nebo příkazem:
+
+python catalog_index.py {hledaný text} [stránka]
+
+který vypíše stránku útvarů, jejichž název nebo popisný název obsahuje
+hledaný text.
+"""
+
+import bisect
+import collections
+import json
+import mmap
+import os
+import struct
+import sys
+import unicodedata
+import textfiles
+
+
+# Textový soubor s výčtem dostupných geometrických útvarů
+LIST_OF_SHAPES = 'list_of_shapes.txt'
+
+# Soubor s indexem výčtu (viz build_index)
+CATALOG_INDEX = 'catalog.index'
+
+# Identifikátor a verze formátu serializovaného indexu
+INDEX_MAGIC = b'GSCI'
+INDEX_FORMAT_VERSION = 2
+
+# Největší délka n-gramů, pro které index obsahuje seznamy položek
+MAX_GRAM_LENGTH = 3
+
+# Výchozí počet útvarů na jedné stránce výsledků
+DEFAULT_PAGE_SIZE = 20
+
+# Struktury částí serializovaného indexu
+_PREAMBLE = struct.Struct('<4sIIII')
+_ENTRY = struct.Struct('<II')
+_ORDER = struct.Struct('<I')
+_GRAM = struct.Struct('<QII')
+
+
+class IndexEntry(collections.namedtuple('IndexEntry',
+                                        'name full_name path')):
+    """
+    Položka výčtu GEOMETRICKÝCH útvarů (název útvaru, popisný název
+    a relativní cesta k textovému souboru útvaru)
+    """
+
+    __slots__ = ()
+
+
+def normalize(text):
+    """
+    Převede text na malá písmena bez diakritiky
+
+    :param text: název nebo popisný název útvaru: str
+    :return: normalizovaný text: str
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed
+                   if not unicodedata.combining(char))
+
+
+def _gram_code(gram):
+    """
+    Převede n-gram (jeden až tři znaky) na číselný kód
+
+    Každý znak zabírá 21 bitů kódu a je v něm uložen jako svůj kód
+    zvětšený o jedna, takže chybějící znaky kratších n-gramů (s hodnotou
+    nula) nelze zaměnit s žádným znakem a pořadí kódů odpovídá
+    abecednímu pořadí n-gramů.
+
+    :param gram: n-gram: str
+    :return: kód n-gramu: int
+    """
+    code = 0
+    for i, char in enumerate(gram):
+        code |= ord(char) + 1 << 21 * (MAX_GRAM_LENGTH - 1 - i)
+    return code
+
+
+def _grams(text, length=MAX_GRAM_LENGTH):
+    """
+    Vrátí množinu všech n-gramů dané délky, tzn. po sobě jdoucích znaků
+    textu
+
+    :param text: normalizovaný text: str
+    :param length: délka n-gramů: int
+    :return: n-gramy: set
+    """
+    return {text[i:i + length] for i in range(len(text) - length + 1)}
+
+
+def serialize_index(list_of_shapes, sources=None):
+    """
+    Serializuje index výčtu GEOMETRICKÝCH útvarů do jediného bloku bajtů
+
+    :param list_of_shapes: položky výčtu ve tvaru (název útvaru, popisný
+    název, cesta): list
+    :param sources: signatury textových souborů, ze kterých byl výčet
+    načten, ve tvaru {cesta: signatura}: dict
+    :return: serializovaný index: bytes
+    """
+    entries = sorted({item[0]: IndexEntry(*item)
+                      for item in list_of_shapes}.values(),
+                     key=lambda entry: (normalize(entry.name), entry.name))
+
+    texts = []
+    table = []
+    offset = 0
+    postings = dict()
+    for number, entry in enumerate(entries):
+        text = '|'.join(entry).encode('utf8')
+        table.append(_ENTRY.pack(offset, len(text)))
+        texts.append(text)
+        offset += len(text)
+
+        for length in range(1, MAX_GRAM_LENGTH + 1):
+            for gram in _grams(normalize(entry.name), length) \
+                    | _grams(normalize(entry.full_name), length):
+                postings.setdefault(_gram_code(gram), []).append(number)
+
+    order = sorted(range(len(entries)),
+                   key=lambda number: (normalize(entries[number].full_name),
+                                       number))
+
+    gram_table = []
+    numbers = []
+    for code in sorted(postings):
+        gram_table.append(_GRAM.pack(code, len(numbers),
+                                     len(postings[code])))
+        numbers.extend(postings[code])
+
+    header = json.dumps({'sources': sources or {}}).encode('utf8')
+    preamble = _PREAMBLE.pack(INDEX_MAGIC, INDEX_FORMAT_VERSION,
+                              len(entries), len(postings), len(header))
+
+    return b''.join([preamble, header] + table
+                    + [_ORDER.pack(number) for number in order]
+                    + gram_table
+                    + [struct.pack(f'<{len(numbers)}I', *numbers)]
+                    + texts)
+
+
+class CatalogIndex:
+    """
+    Třída zpřístupňující serializovaný index výčtu GEOMETRICKÝCH útvarů
+
+    Instance třídy pracuje přímo nad předaným blokem bajtů (např. nad
+    namapovaným souborem), který nekopíruje. Při vytvoření instance se
+    zpracuje pouze hlavička indexu, položky se čtou až při vyhledávání.
+    """
+
+    def __init__(self, buffer):
+        """
+        Konstruktor pohledu na serializovaný index
+
+        :param buffer: serializovaný index: bytes / memoryview / mmap
+        """
+        self.buffer = memoryview(buffer)
+
+        magic, version, self.count, self.gram_count, header_length \
+            = _PREAMBLE.unpack_from(self.buffer)
+        if magic != INDEX_MAGIC or version != INDEX_FORMAT_VERSION:
+            raise ValueError('Neplatný formát serializovaného indexu.')
+
+        header_start = _PREAMBLE.size
+        self.table_start = header_start + header_length
+        header = json.loads(
+            bytes(self.buffer[header_start:self.table_start]).decode('utf8'))
+
+        # signatury textových souborů, ze kterých byl index sestaven
+        self.sources = {path: tuple(signature)
+                        for path, signature in header['sources'].items()}
+
+        # začátky jednotlivých částí indexu
+        self.order_start = self.table_start + self.count * _ENTRY.size
+        self.grams_start = self.order_start + self.count * _ORDER.size
+        self.postings_start = self.grams_start \
+            + self.gram_count * _GRAM.size
+        posting_count = 0
+        if self.gram_count:
+            _, offset, length = _GRAM.unpack_from(
+                self.buffer, self.postings_start - _GRAM.size)
+            posting_count = offset + length
+        self.texts_start = self.postings_start + posting_count * _ORDER.size
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def entry(self, number):
+        """
+        Vrátí položku výčtu s daným pořadovým číslem
+
+        :param number: pořadové číslo položky: int
+        :return: položka výčtu: IndexEntry
+        """
+        offset, length = _ENTRY.unpack_from(
+            self.buffer, self.table_start + number * _ENTRY.size)
+        start = self.texts_start + offset
+        text = bytes(self.buffer[start:start + length]).decode('utf8')
+        return IndexEntry(*text.split('|', 2))
+
+    def name(self, number):
+        """
+        Vrátí název útvaru položky s daným pořadovým číslem
+
+        :param number: pořadové číslo položky: int
+        :return: název útvaru: str
+        """
+        return self.entry(number).name
+
+    def names(self):
+        """
+        Vrátí abecedně seřazené názvy všech útvarů
+
+        :return: názvy útvarů: list
+        """
+        return [self.name(number) for number in range(self.count)]
+
+    def get(self, name):
+        """
+        Vyhledá položku výčtu podle názvu útvaru
+
+        :param name: geometrický název útvaru bez diakritiky: str
+        :return: položka výčtu nebo None, pokud útvar v indexu není:
+        IndexEntry
+        """
+        number = self._bisect((normalize(name), name), self._name_key)
+        if number < self.count:
+            entry = self.entry(number)
+            if entry.name == name:
+                return entry
+        return None
+
+    def prefix(self, query):
+        """
+        Vyhledá útvary, jejichž název nebo popisný název začíná textem
+
+        :param query: hledaný text: str
+        :return: vzestupně seřazená pořadová čísla nalezených položek: list
+        """
+        query = normalize(query)
+
+        start = self._bisect((query,), self._name_key)
+        numbers = set()
+        for number in range(start, self.count):
+            if not self._name_key(number)[0].startswith(query):
+                break
+            numbers.add(number)
+
+        def full_name(position):
+            return normalize(self.entry(self._ordered(position)).full_name)
+
+        for position in range(self._bisect(query, full_name), self.count):
+            if not full_name(position).startswith(query):
+                break
+            numbers.add(self._ordered(position))
+
+        return sorted(numbers)
+
+    def search(self, query):
+        """
+        Vyhledá útvary, jejichž název nebo popisný název obsahuje text
+
+        Text o nejvýše MAX_GRAM_LENGTH znacích je sám n-gramem, a proto
+        je výsledkem přímo seznam položek pro tento n-gram. U delšího textu
+        se kandidáti vyberou jako průnik seznamů položek pro všechny
+        n-gramy délky MAX_GRAM_LENGTH hledaného textu a poté se ověří.
+
+        :param query: hledaný text: str
+        :return: vzestupně seřazená pořadová čísla nalezených položek: list
+        """
+        query = normalize(query)
+        if not query:
+            return list(range(self.count))
+        if len(query) <= MAX_GRAM_LENGTH:
+            return list(self._postings(_gram_code(query)))
+
+        postings = []
+        for gram in _grams(query):
+            numbers = self._postings(_gram_code(gram))
+            if not numbers:
+                return []
+            postings.append(numbers)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for numbers in postings[1:]:
+            candidates.intersection_update(numbers)
+
+        result = []
+        for number in sorted(candidates):
+            entry = self.entry(number)
+            if query in normalize(entry.name) \
+                    or query in normalize(entry.full_name):
+                result.append(number)
+
+        return result
+
+    def page(self, query='', page=0, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Vrátí jednu stránku útvarů vyhledaných podle textu
+
+        Bez hledaného textu se stránka přečte přímo z tabulky položek, takže
+        doba výpisu nezávisí na velikosti katalogu.
+
+        :param query: hledaný text (prázdný text znamená celý výčet): str
+        :param page: pořadové číslo stránky počínaje nulou: int
+        :param page_size: počet útvarů na stránce: int
+        :return: položky výčtu na stránce a celkový počet nalezených útvarů:
+        tuple
+        """
+        start = page * page_size
+        if not normalize(query):
+            numbers = range(start, min(start + page_size, self.count))
+            return [self.entry(number) for number in numbers], self.count
+
+        numbers = self.search(query)
+        return [self.entry(number)
+                for number in numbers[start:start + page_size]], len(numbers)
+
+    def is_current(self, full_path=LIST_OF_SHAPES):
+        """
+        Ověří, zda se textový soubor od sestavení indexu nezměnil
+
+        :param full_path: relativní cesta k textovému souboru: str
+        :return: aktuální signatura souboru, pokud se jeho obsah nezměnil,
+        jinak None: tuple
+        """
+        stored_signature = self.sources.get(full_path)
+        if stored_signature is None:
+            return None
+
+        signature = textfiles.file_signature(full_path, stored_signature)
+        if signature is None or signature[2] != stored_signature[2]:
+            return None
+
+        return signature
+
+    def close(self):
+        """
+        Uvolní odkaz na blok bajtů s indexem
+
+        :return: None
+        """
+        self.buffer.release()
+
+    def _name_key(self, number):
+        """
+        Vrátí klíč, podle kterého jsou seřazeny položky v tabulce
+
+        :param number: pořadové číslo položky: int
+        :return: normalizovaný a původní název útvaru: tuple
+        """
+        name = self.name(number)
+        return normalize(name), name
+
+    def _ordered(self, position):
+        """
+        Vrátí pořadové číslo položky na dané pozici v pořadí podle
+        popisného názvu
+
+        :param position: pozice v pořadí podle popisného názvu: int
+        :return: pořadové číslo položky: int
+        """
+        return _ORDER.unpack_from(
+            self.buffer, self.order_start + position * _ORDER.size)[0]
+
+    def _bisect(self, value, key):
+        """
+        Vyhledá první pozici, na které není klíč menší než hodnota
+
+        :param value: hledaná hodnota: str
+        :param key: funkce vracející klíč pro danou pozici: function
+        :return: pozice: int
+        """
+        return bisect.bisect_left(range(self.count), value, key=key)
+
+    def _postings(self, code):
+        """
+        Vrátí pořadová čísla položek obsahujících n-gram s daným kódem
+
+        :param code: kód n-gramu: int
+        :return: vzestupně seřazená pořadová čísla položek: tuple
+        """
+        def gram(position):
+            return _GRAM.unpack_from(
+                self.buffer, self.grams_start + position * _GRAM.size)
+
+        position = bisect.bisect_left(range(self.gram_count), code,
+                                      key=lambda p: gram(p)[0])
+        if position == self.gram_count:
+            return ()
+
+        found, offset, length = gram(position)
+        if found != code:
+            return ()
+
+        return struct.unpack_from(f'<{length}I', self.buffer,
+                                  self.postings_start + offset * _ORDER.size)
+
+
+class IndexFile(CatalogIndex):
+    """
+    Třída zpřístupňující index uložený v souboru
+
+    Soubor se namapuje do paměti, takže se při vytvoření instance přečte
+    pouze jeho hlavička.
+    """
+
+    def __init__(self, path=CATALOG_INDEX):
+        """
+        Konstruktor indexu uloženého v souboru
+
+        :param path: cesta k souboru s indexem: str
+        """
+        with open(path, 'rb') as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            super().__init__(self.mapping)
+        except (ValueError, KeyError, struct.error):
+            self.mapping.close()
+            raise ValueError(f'Soubor {path} neobsahuje platný index '
+                             f'katalogu.')
+
+    def close(self):
+        """
+        Uvolní pohled na index a uzavře namapovaný soubor
+
+        :return: None
+        """
+        super().close()
+        self.mapping.close()
+
+
+class LazyShapeDict(dict):
+    """
+    Slovník dostupných GEOMETRICKÝCH útvarů s líně načítanými položkami
+
+    Položka útvaru (slovník s popisným názvem, cestou k textovému souboru
+    a informací, zda je útvar instanciovaný) se vytvoří z indexu až při
+    prvním přístupu k ní, takže slovník obsahuje pouze dosud použité
+    útvary. Operátor in však ověřuje existenci útvaru v celém indexu.
+    """
+
+    def __init__(self, index=None):
+        """
+        Konstruktor slovníku
+
+        :param index: index výčtu GEOMETRICKÝCH útvarů: CatalogIndex
+        """
+        super().__init__()
+        self.index = index
+
+    def __missing__(self, geom_shape_name):
+        entry = None if self.index is None else self.index.get(
+            geom_shape_name)
+        if entry is None:
+            raise KeyError(geom_shape_name)
+
+        shape = {'full_name': entry.full_name, 'path': entry.path,
+                 'is_instantiated': False}
+        self[geom_shape_name] = shape
+        return shape
+
+    def __contains__(self, geom_shape_name):
+        return super().__contains__(geom_shape_name) or (
+            self.index is not None and geom_shape_name in self.index)
+
+
+def build_index(path=CATALOG_INDEX, list_of_shapes=LIST_OF_SHAPES):
+    """
+    Sestaví index výčtu GEOMETRICKÝCH útvarů a uloží ho do souboru
+
+    Soubor se zapíše nejprve pod dočasným názvem a teprve poté se
+    přejmenuje, takže běžící program nikdy nenačte napůl zapsaný index.
+
+    :param path: cesta k souboru s indexem: str
+    :param list_of_shapes: cesta k výčtu GEOMETRICKÝCH útvarů: str
+    :return: počet útvarů v indexu: int
+    """
+    signature = textfiles.file_signature(list_of_shapes)
+    shapes = textfiles.shape_list_from_text_file(list_of_shapes)
+    data = serialize_index(shapes, {list_of_shapes: signature})
+
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        file.write(data)
+    os.replace(temporary_path, path)
+
+    return len(CatalogIndex(data))
+
+
+def open_index(path=CATALOG_INDEX):
+    """
+    Otevře index uložený v souboru, pokud existuje a je platný
+
+    :param path: cesta k souboru s indexem: str
+    :return: index nebo None: IndexFile
+    """
+    try:
+        return IndexFile(path)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['build']:
+        shape_count = build_index()
+        print(f'Index {CATALOG_INDEX} obsahuje {shape_count} útvarů.')
+        sys.exit(0)
+
+    if len(sys.argv) not in (2, 3):
+        print('Použití: python catalog_index.py build | {hledaný text} '
+              '[stránka]')
+        sys.exit(2)
+
+    catalog_index = open_index() or CatalogIndex(serialize_index(
+        textfiles.shape_list_from_text_file(LIST_OF_SHAPES)))
+    page_number = int(sys.argv[2]) - 1 if len(sys.argv) == 3 else 0
+    found_entries, found_count = catalog_index.page(sys.argv[1], page_number)
+    for found_entry in found_entries:
+        print(f'{found_entry.name} ({found_entry.full_name})')
+    print(f'Stránka {page_number + 1} / '
+          f'{max(1, -(-found_count // DEFAULT_PAGE_SIZE))} '
+          f'(útvarů: {found_count})')
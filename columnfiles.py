@@ -0,0 +1,408 @@
+"""
+Modul pro hromadný výpočet nad sloupci hodnot uloženými v binárních souborech
+
+Tabulky s hodnotami veličin, které se nevejdou do operační paměti, lze
+uložit do adresáře jako sloupce čísel typu float64 (little-endian), a to
+buď:
+- v souborech formátu .npy (formát knihovny NumPy; název souboru bez
+  přípony je značkou veličiny), nebo
+- v souborech bez hlavičky, které popisuje soubor schema.json ve tvaru
+  {"rows": počet řádků, "columns": {značka: název souboru}}; soubory
+  s příponou .npy se i v tomto případě čtou včetně hlavičky.
+
+Soubory se namapují do paměti (mmap) a zpracovávají se po dávkách pevné
+velikosti (viz solve_table), takže spotřeba paměti závisí pouze na
+velikosti dávky, nikoli na počtu řádků tabulky. Spočítané hodnoty
+ostatních veličin a sloupec s platností řádků (valid) se zapisují přímo do
+předem vytvořených souborů formátu .npy ve výstupním adresáři, který tak
+lze opět načíst jako vstupní tabulku (nebo např. funkcí numpy.load).
+
+Modul lze spustit i samostatně příkazem:
+
+python columnfiles.py {název útvaru} {vstupní adresář} {výstupní adresář}
+[počet řádků v dávce]
+
+který spočítá hodnoty všech veličin útvaru pro všechny řádky vstupní
+tabulky a vypíše počet platných řádků, nebo příkazem:
+
+python columnfiles.py check {název útvaru} {vstupní adresář}
+{výstupní adresář} [tolerance]
+
+který ověří vzájemný soulad zadaných hodnot ve všech řádcích vstupní
+tabulky (viz check_table) a vypíše počet řádků s přípustnou odchylkou.
+"""
+
+import array
+import ast
+import json
+import mmap
+import os
+import sys
+import solver
+
+
+# Název souboru se schématem tabulky
+SCHEMA_FILE = 'schema.json'
+
+# Název sloupce s platností řádků ve výstupní tabulce
+VALID_COLUMN = 'valid'
+
+# Názvy sloupců s odchylkou a pořadím vzorce s největší odchylkou ve
+# výstupní tabulce ověření souladu hodnot (viz check_table)
+RESIDUAL_COLUMN = 'residual'
+FORMULA_COLUMN = 'formula'
+
+# Podporované typy hodnot ve tvaru {typ NumPy: (formát modulu struct,
+# velikost v bajtech)}
+FLOAT64 = '<f8'
+INT32 = '<i4'
+BOOL = '|b1'
+DTYPES = {FLOAT64: ('d', 8), INT32: ('i', 4), BOOL: ('B', 1)}
+
+# Výchozí počet řádků zpracovávaných najednou (sloupec dávky zabírá
+# 256 KiB, takže se dávka vejde do vyrovnávací paměti procesoru)
+DEFAULT_CHUNK_ROWS = 32768
+
+# Úvodní bajty a zarovnání hlavičky souborů formátu .npy
+NPY_MAGIC = b'\x93NUMPY'
+NPY_ALIGNMENT = 64
+
+
+class ColumnFile:
+    """
+    Třída zpřístupňující sloupec hodnot uložený v binárním souboru
+
+    Soubor se namapuje do paměti a hodnoty jsou dostupné prostřednictvím
+    atributu view (memoryview), jehož řezy lze číst (metoda tolist) i do
+    nich zapisovat (např. přiřazením instance array.array).
+    """
+
+    def __init__(self, path, dtype=FLOAT64, offset=0, rows=None,
+                 writable=False):
+        """
+        Konstruktor sloupce
+
+        :param path: cesta k souboru: str
+        :param dtype: typ hodnot (klíč slovníku DTYPES): str
+        :param offset: počet bajtů před první hodnotou (hlavička): int
+        :param rows: počet hodnot (None znamená všechny hodnoty až do konce
+        souboru): int
+        :param writable: zda se do souboru bude zapisovat: bool
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f'Soubor {path} obsahuje nepodporovaný typ '
+                             f'hodnot {dtype}.')
+        if sys.byteorder != 'little':
+            raise ValueError('Sloupce lze mapovat pouze na počítačích '
+                             's pořadím bajtů little-endian.')
+        view_format, item_size = DTYPES[dtype]
+
+        size = os.path.getsize(path)
+        if rows is None:
+            rows = (size - offset) // item_size
+        if offset + rows * item_size > size:
+            raise ValueError(f'Soubor {path} obsahuje méně než {rows} '
+                             f'hodnot.')
+
+        self.path = path
+        self.dtype = dtype
+        self.rows = rows
+        self.writable = writable
+        if not rows:
+            self.mapping = None
+            self.view = memoryview(array.array(view_format))
+            return
+
+        with open(path, 'r+b' if writable else 'rb') as file:
+            self.mapping = mmap.mmap(
+                file.fileno(), 0,
+                access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.view = memoryview(self.mapping)[
+            offset:offset + rows * item_size].cast(view_format)
+
+    def close(self):
+        """
+        Zapíše případné změny, uvolní pohled na sloupec a uzavře namapovaný
+        soubor
+
+        :return: None
+        """
+        self.view.release()
+        if self.mapping is not None and not self.mapping.closed:
+            if self.writable:
+                self.mapping.flush()
+            self.mapping.close()
+
+
+def read_npy_header(path):
+    """
+    Přečte hlavičku souboru formátu .npy
+
+    :param path: cesta k souboru: str
+    :return: typ hodnot, počet hodnot a velikost hlavičky v bajtech: tuple
+    """
+    with open(path, 'rb') as file:
+        prefix = file.read(len(NPY_MAGIC) + 2)
+        if prefix[:len(NPY_MAGIC)] != NPY_MAGIC:
+            raise ValueError(f'Soubor {path} není ve formátu .npy.')
+        length_size = 2 if prefix[-2] == 1 else 4
+        length = int.from_bytes(file.read(length_size), 'little')
+        header = ast.literal_eval(file.read(length).decode('latin1'))
+
+    shape = header['shape']
+    if header['fortran_order'] or len(shape) != 1:
+        raise ValueError(f'Soubor {path} neobsahuje jednorozměrný sloupec '
+                         f'hodnot.')
+
+    return header['descr'], shape[0], len(prefix) + length_size + length
+
+
+def open_npy(path, writable=False):
+    """
+    Namapuje do paměti sloupec hodnot uložený v souboru formátu .npy
+
+    :param path: cesta k souboru: str
+    :param writable: zda se do souboru bude zapisovat: bool
+    :return: sloupec: ColumnFile
+    """
+    dtype, rows, offset = read_npy_header(path)
+
+    return ColumnFile(path, dtype, offset, rows, writable)
+
+
+def create_npy(path, rows, dtype=FLOAT64):
+    """
+    Vytvoří soubor formátu .npy pro zadaný počet hodnot a namapuje ho do
+    paměti
+
+    Hodnoty se v souboru pouze vyhradí (soubor se zvětší na potřebnou
+    velikost), takže se nezapisují do paměti ani na disk.
+
+    :param path: cesta k souboru: str
+    :param rows: počet hodnot: int
+    :param dtype: typ hodnot (klíč slovníku DTYPES): str
+    :return: sloupec, do kterého lze zapisovat: ColumnFile
+    """
+    header = repr({'descr': dtype, 'fortran_order': False,
+                   'shape': (rows,)})
+    # hlavička včetně úvodních bajtů se doplní mezerami a ukončí znakem
+    # nového řádku tak, aby její délka byla násobkem NPY_ALIGNMENT
+    prefix_size = len(NPY_MAGIC) + 4
+    padding = -(prefix_size + len(header) + 1) % NPY_ALIGNMENT
+    header = (header + ' ' * padding + '\n').encode('latin1')
+
+    with open(path, 'wb') as file:
+        file.write(NPY_MAGIC + bytes([1, 0]))
+        file.write(len(header).to_bytes(2, 'little'))
+        file.write(header)
+        file.truncate(prefix_size + len(header) + rows * DTYPES[dtype][1])
+
+    return ColumnFile(path, dtype, prefix_size + len(header), rows,
+                      writable=True)
+
+
+def open_table(directory):
+    """
+    Namapuje do paměti všechny sloupce tabulky uložené v adresáři
+
+    :param directory: cesta k adresáři s tabulkou: str
+    :return: počet řádků a slovník {značka veličiny: sloupec}: tuple
+    """
+    schema_path = os.path.join(directory, SCHEMA_FILE)
+    if os.path.exists(schema_path):
+        with open(schema_path, encoding='utf-8') as file:
+            schema = json.load(file)
+        file_names = schema['columns']
+        rows = schema.get('rows')
+    else:
+        file_names = {name[:-len('.npy')]: name
+                      for name in sorted(os.listdir(directory))
+                      if name.endswith('.npy')}
+        rows = None
+
+    columns = dict()
+    try:
+        for symbol, file_name in file_names.items():
+            path = os.path.join(directory, file_name)
+            if file_name.endswith('.npy'):
+                columns[symbol] = open_npy(path)
+            else:
+                columns[symbol] = ColumnFile(path, rows=rows)
+        lengths = {column.rows for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f'Sloupce tabulky {directory} mají různé '
+                             f'počty řádků.')
+    except (ValueError, KeyError, SyntaxError):
+        close_table(columns)
+        raise
+
+    return next(iter(lengths), 0), columns
+
+
+def create_table(directory, symbols, rows, dtypes=None, **schema):
+    """
+    Vytvoří v adresáři tabulku se sloupci formátu .npy a jejím schématem
+
+    Sloupec VALID_COLUMN obsahuje logické hodnoty, ostatní sloupce čísla
+    typu float64, pokud parametr dtypes neurčuje jinak.
+
+    :param directory: cesta k adresáři (pokud neexistuje, vytvoří se): str
+    :param symbols: značky veličin (popř. VALID_COLUMN): list of strings
+    :param rows: počet řádků: int
+    :param dtypes: typy hodnot sloupců ve tvaru {značka: typ}: dict
+    :param schema: další položky, které se zapíší do schématu tabulky
+    :return: slovník {značka veličiny: sloupec, do kterého lze zapisovat}:
+    dict
+    """
+    dtypes = {VALID_COLUMN: BOOL, **(dtypes or dict())}
+    os.makedirs(directory, exist_ok=True)
+    columns = dict()
+    for symbol in symbols:
+        columns[symbol] = create_npy(
+            os.path.join(directory, f'{symbol}.npy'), rows,
+            dtypes.get(symbol, FLOAT64))
+
+    schema.update({
+        'rows': rows,
+        'columns': {symbol: f'{symbol}.npy' for symbol in symbols},
+    })
+    with open(os.path.join(directory, SCHEMA_FILE), 'w',
+              encoding='utf-8') as file:
+        json.dump(schema, file, ensure_ascii=False, indent=2)
+
+    return columns
+
+
+def close_table(columns):
+    """
+    Uzavře všechny sloupce tabulky
+
+    :param columns: slovník {značka veličiny: sloupec}: dict
+    :return: None
+    """
+    for column in columns.values():
+        column.close()
+
+
+def solve_table(geom_shape, input_directory, output_directory,
+                chunk_rows=DEFAULT_CHUNK_ROWS, check_conditions=True,
+                sinks=()):
+    """
+    Hromadně spočítá hodnoty veličin pro všechny řádky tabulky v adresáři
+
+    Sloupce vstupní tabulky se zpracovávají po dávkách o chunk_rows
+    řádcích (viz solver.solve_batch). Spočítané hodnoty veličin, které ve
+    vstupní tabulce nejsou, a platnost řádků se zapisují do sloupců
+    výstupní tabulky, takže v paměti jsou vždy pouze hodnoty jedné dávky.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param input_directory: cesta k adresáři se vstupní tabulkou: str
+    :param output_directory: cesta k adresáři pro výstupní tabulku: str
+    :param chunk_rows: počet řádků zpracovávaných najednou: int
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :param sinks: agregáty, do kterých se započítají platné řádky (viz
+    modul aggregates): list
+    :return: počet platných řádků: int
+    """
+    rows, inputs = open_table(input_directory)
+    outputs = dict()
+    try:
+        unknown = inputs.keys() - geom_shape.general_properties.keys()
+        if unknown:
+            raise ValueError(f'Útvar {geom_shape.geom_shape_name} nemá '
+                             f'veličiny {", ".join(sorted(unknown))}.')
+        undetermined = geom_shape.undetermined_quantities(inputs.keys())
+        if undetermined:
+            raise ValueError(f'Ze zadaných veličin nelze spočítat hodnoty '
+                             f'veličin {", ".join(sorted(undetermined))} '
+                             f'útvaru {geom_shape.geom_shape_name}.')
+
+        derived = [symbol for symbol in geom_shape.general_properties
+                   if symbol not in inputs]
+        outputs = create_table(output_directory, derived + [VALID_COLUMN],
+                               rows)
+
+        valid_rows = 0
+        for start in range(0, rows, chunk_rows):
+            end = min(start + chunk_rows, rows)
+            columns = {symbol: column.view[start:end].tolist()
+                       for symbol, column in inputs.items()}
+            values, valid = solver.solve_batch(geom_shape, columns,
+                                               check_conditions, sinks)
+            for symbol in derived:
+                outputs[symbol].view[start:end] = array.array(
+                    'd', values[symbol])
+            outputs[VALID_COLUMN].view[start:end] = bytes(valid)
+            valid_rows += valid.count(True)
+    finally:
+        close_table(inputs)
+        close_table(outputs)
+
+    return valid_rows
+
+
+def check_table(geom_shape, input_directory, output_directory,
+                tolerance=solver.CONSISTENCY_TOLERANCE,
+                chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Ověří vzájemný soulad zadaných hodnot pro všechny řádky tabulky
+
+    Sloupce vstupní tabulky se zpracovávají po dávkách o chunk_rows
+    řádcích (viz solver.check_consistency). Do výstupní tabulky se
+    zapíše sloupec RESIDUAL_COLUMN s největší relativní odchylkou řádku,
+    sloupec VALID_COLUMN s informací, zda je odchylka přípustná,
+    a sloupec FORMULA_COLUMN s pořadím vzorce s největší odchylkou
+    v seznamu vzorců uloženém ve schématu výstupní tabulky (položka
+    'formulas'; -1 znamená, že žádný vzorec nelze vyhodnotit).
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param input_directory: cesta k adresáři se vstupní tabulkou: str
+    :param output_directory: cesta k adresáři pro výstupní tabulku: str
+    :param tolerance: největší přípustná relativní odchylka: float
+    :param chunk_rows: počet řádků zpracovávaných najednou: int
+    :return: počet řádků s přípustnou odchylkou: int
+    """
+    rows, inputs = open_table(input_directory)
+    outputs = dict()
+    try:
+        formulas = [f'{symbol} = {way["expression"]}' for symbol, way
+                    in solver.consistency_formulas(geom_shape, inputs.keys())]
+        indices = {formula: i for i, formula in enumerate(formulas)}
+        indices[None] = -1
+        outputs = create_table(
+            output_directory, [RESIDUAL_COLUMN, VALID_COLUMN, FORMULA_COLUMN],
+            rows, {FORMULA_COLUMN: INT32}, formulas=formulas)
+
+        consistent_rows = 0
+        for start in range(0, rows, chunk_rows):
+            end = min(start + chunk_rows, rows)
+            columns = {symbol: column.view[start:end].tolist()
+                       for symbol, column in inputs.items()}
+            residuals, consistent, worst = solver.check_consistency(
+                geom_shape, columns, tolerance)
+            outputs[RESIDUAL_COLUMN].view[start:end] = array.array(
+                'd', residuals)
+            outputs[VALID_COLUMN].view[start:end] = bytes(consistent)
+            outputs[FORMULA_COLUMN].view[start:end] = array.array(
+                'i', map(indices.__getitem__, worst))
+            consistent_rows += consistent.count(True)
+    finally:
+        close_table(inputs)
+        close_table(outputs)
+
+    return consistent_rows
+
+
+if __name__ == '__main__':
+    import catalog
+
+    shapes = catalog.load_catalog()
+    if sys.argv[1] == 'check':
+        print(check_table(shapes[sys.argv[2]], sys.argv[3], sys.argv[4],
+                          float(sys.argv[5]) if len(sys.argv) > 5
+                          else solver.CONSISTENCY_TOLERANCE))
+        sys.exit()
+    print(solve_table(shapes[sys.argv[1]], sys.argv[2], sys.argv[3],
+                      int(sys.argv[4]) if len(sys.argv) > 4
+                      else DEFAULT_CHUNK_ROWS))
@@ -0,0 +1,453 @@
+"""
+Modul pro výpočet citlivosti hodnot veličin na zadaných hodnotách
+
+Citlivost spočítané veličiny na zadané veličině je parciální derivace,
+např. derivace objemu kvádru V podle délky hrany a. Derivace se počítají
+automatickým derivováním v dopředném režimu: vzorce útvaru se místo nad
+čísly vyhodnotí nad sloupci duálních čísel (třída DualColumn), které kromě
+hodnot nesou i gradienty, tzn. derivace hodnot podle všech zadaných
+veličin. Funkce modulu math mají v objektu DUAL_MATH protějšky, které
+gradienty přenášejí podle pravidel derivování. Jediný výpočet tak vrátí
+hodnoty všech veličin i celou Jacobiho matici bez opakovaných výpočtů se
+změněnými vstupy.
+
+Stejně jako při hromadném výpočtu (viz solver.solve_batch) se každý vzorec
+vyhodnotí najednou nad celými sloupci. Pokud se vyhodnocení u některého
+řádku nezdaří, vyhodnotí se vzorec znovu po řádcích a derivace
+neúspěšných řádků budou NaN.
+
+Hodnotu veličiny spočítanou numerickou inverzí vzorce jiné veličiny (viz
+solver.find_roots) nelze derivovat přímo, její derivace se proto spočítá
+z derivací vzorce podle věty o implicitní funkci.
+
+Úhly se zadávají i vracejí v obloukové míře (radiánech), derivace podle
+úhlů i derivace úhlů jsou proto vztaženy k radiánům.
+
+Modul lze spustit i samostatně příkazem:
+
+python dual.py {název útvaru} {značka}={hodnota} ...
+
+který vypíše hodnoty všech veličin a jejich derivace podle zadaných
+veličin.
+"""
+
+import functools
+import math
+import operator
+import sys
+import types
+import solver
+
+
+class DualColumn:
+    """
+    Třída reprezentující sloupec duálních čísel
+
+    Sloupec se skládá ze seznamu hodnot a z n-tice seznamů derivací těchto
+    hodnot podle jednotlivých zadaných veličin (gradientů). Aritmetické
+    operace se sloupci (i v kombinaci s obyčejnými čísly) se provádějí po
+    řádcích a vrací sloupce s derivacemi spočítanými podle pravidel
+    derivování.
+    """
+
+    __slots__ = ('values', 'gradients')
+
+    def __init__(self, values, gradients):
+        """
+        Konstruktor sloupce duálních čísel
+
+        :param values: hodnoty: list
+        :param gradients: derivace hodnot podle jednotlivých zadaných
+        veličin: tuple of lists
+        """
+        self.values = values
+        self.gradients = gradients
+
+    def __repr__(self):
+        return f'DualColumn({self.values!r}, {self.gradients!r})'
+
+    def __len__(self):
+        return len(self.values)
+
+    def row(self, index):
+        """
+        Vrátí sloupec s jediným řádkem tohoto sloupce
+
+        :param index: pořadí řádku: int
+        :return: sloupec s jedním řádkem: DualColumn
+        """
+        return DualColumn([self.values[index]],
+                          tuple([gradient[index]]
+                                for gradient in self.gradients))
+
+    def chain(self, values, factors):
+        """
+        Vrátí sloupec hodnot funkce tohoto sloupce s derivacemi podle
+        řetízkového pravidla
+
+        :param values: hodnoty funkce: list
+        :param factors: derivace funkce v jednotlivých řádcích: list
+        :return: sloupec duálních čísel: DualColumn
+        """
+        return DualColumn(values, tuple(
+            list(map(operator.mul, factors, gradient))
+            for gradient in self.gradients))
+
+    def __add__(self, other):
+        if isinstance(other, DualColumn):
+            return DualColumn(
+                list(map(operator.add, self.values, other.values)),
+                tuple(list(map(operator.add, gradient, other_gradient))
+                      for gradient, other_gradient
+                      in zip(self.gradients, other.gradients)))
+        return DualColumn([value + other for value in self.values],
+                          self.gradients)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, DualColumn):
+            return DualColumn(
+                list(map(operator.sub, self.values, other.values)),
+                tuple(list(map(operator.sub, gradient, other_gradient))
+                      for gradient, other_gradient
+                      in zip(self.gradients, other.gradients)))
+        return DualColumn([value - other for value in self.values],
+                          self.gradients)
+
+    def __rsub__(self, other):
+        return DualColumn([other - value for value in self.values],
+                          tuple([-d for d in gradient]
+                                for gradient in self.gradients))
+
+    def __neg__(self):
+        return DualColumn([-value for value in self.values],
+                          tuple([-d for d in gradient]
+                                for gradient in self.gradients))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return self.chain([abs(value) for value in self.values],
+                          [1.0 if value >= 0 else -1.0
+                           for value in self.values])
+
+    def __mul__(self, other):
+        if isinstance(other, DualColumn):
+            return DualColumn(
+                list(map(operator.mul, self.values, other.values)),
+                tuple([u * e + v * d for u, v, d, e
+                       in zip(self.values, other.values, gradient,
+                              other_gradient)]
+                      for gradient, other_gradient
+                      in zip(self.gradients, other.gradients)))
+        return DualColumn([value * other for value in self.values],
+                          tuple([d * other for d in gradient]
+                                for gradient in self.gradients))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, DualColumn):
+            quotients = list(map(operator.truediv, self.values,
+                                 other.values))
+            return DualColumn(quotients, tuple(
+                [(d - q * e) / v for q, v, d, e
+                 in zip(quotients, other.values, gradient, other_gradient)]
+                for gradient, other_gradient
+                in zip(self.gradients, other.gradients)))
+        return self * (1.0 / other)
+
+    def __rtruediv__(self, other):
+        quotients = [other / value for value in self.values]
+        return self.chain(quotients, [-q / value for q, value
+                                      in zip(quotients, self.values)])
+
+    def __pow__(self, other):
+        if isinstance(other, DualColumn):
+            powers = list(map(operator.pow, self.values, other.values))
+            return DualColumn(powers, tuple(
+                [p * (w * d / u + math.log(u) * e) if e else p * w * d / u
+                 for p, u, w, d, e in zip(powers, self.values, other.values,
+                                          gradient, other_gradient)]
+                for gradient, other_gradient
+                in zip(self.gradients, other.gradients)))
+        if other == 0:
+            return self.chain([1.0] * len(self.values),
+                              [0.0] * len(self.values))
+        return self.chain([value ** other for value in self.values],
+                          [other * value ** (other - 1)
+                           for value in self.values])
+
+    def __rpow__(self, other):
+        powers = [other ** value for value in self.values]
+        log = math.log(other)
+        return self.chain(powers, [p * log for p in powers])
+
+
+def _unary(function, derivative):
+    """
+    Vytvoří protějšek funkce jedné proměnné pro sloupce duálních čísel
+
+    :param function: funkce modulu math
+    :param derivative: funkce vracející derivaci funkce v daném bodě
+    :return: funkce přijímající sloupce duálních čísel i obyčejná čísla
+    """
+    def dual_function(x):
+        if not isinstance(x, DualColumn):
+            return function(x)
+        return x.chain(list(map(function, x.values)),
+                       list(map(derivative, x.values)))
+
+    return dual_function
+
+
+def _as_column(x, like):
+    """
+    Převede obyčejné číslo na sloupec duálních čísel s nulovými derivacemi
+
+    :param x: sloupec duálních čísel nebo obyčejné číslo
+    :param like: sloupec duálních čísel, jehož rozměry má výsledek mít:
+    DualColumn
+    :return: sloupec duálních čísel: DualColumn
+    """
+    if isinstance(x, DualColumn):
+        return x
+    zeros = [0.0] * len(like)
+    return DualColumn([x] * len(like), tuple(zeros for _ in like.gradients))
+
+
+def _atan2(y, x):
+    """
+    Protějšek funkce math.atan2 pro sloupce duálních čísel
+    """
+    if not isinstance(y, DualColumn) and not isinstance(x, DualColumn):
+        return math.atan2(y, x)
+    like = y if isinstance(y, DualColumn) else x
+    y, x = _as_column(y, like), _as_column(x, like)
+    norms = [u * u + v * v for u, v in zip(y.values, x.values)]
+    return DualColumn(
+        list(map(math.atan2, y.values, x.values)),
+        tuple([(v * d - u * e) / n for u, v, n, d, e
+               in zip(y.values, x.values, norms, y_gradient, x_gradient)]
+              for y_gradient, x_gradient in zip(y.gradients, x.gradients)))
+
+
+def _hypot(*coordinates):
+    """
+    Protějšek funkce math.hypot pro sloupce duálních čísel
+    """
+    columns = [c for c in coordinates if isinstance(c, DualColumn)]
+    if not columns:
+        return math.hypot(*coordinates)
+    coordinates = [_as_column(c, columns[0]) for c in coordinates]
+    values = list(map(math.hypot, *[c.values for c in coordinates]))
+    factors = [[u / h if h else 0.0 for u, h in zip(c.values, values)]
+               for c in coordinates]
+    return DualColumn(values, tuple(
+        [sum(row) for row in zip(*[map(operator.mul, f, c.gradients[k])
+                                   for f, c in zip(factors, coordinates)])]
+        for k in range(len(columns[0].gradients))))
+
+
+def _log(x, base=math.e):
+    """
+    Protějšek funkce math.log pro sloupce duálních čísel
+    """
+    if isinstance(base, DualColumn):
+        return _log(x) / _log(base)
+    factor = 1.0 / math.log(base)
+    if not isinstance(x, DualColumn):
+        return math.log(x, base)
+    return x.chain([math.log(value) * factor for value in x.values],
+                   [factor / value for value in x.values])
+
+
+def _pow(x, y):
+    """
+    Protějšek funkce math.pow pro sloupce duálních čísel
+    """
+    if not isinstance(x, DualColumn) and not isinstance(y, DualColumn):
+        return math.pow(x, y)
+    return x ** y
+
+
+# Protějšek modulu math, pod jehož názvem se vyhodnocují vzorce nad
+# sloupci duálních čísel (viz compile_dual_expression)
+DUAL_MATH = types.SimpleNamespace(
+    pi=math.pi, e=math.e, tau=math.tau, inf=math.inf, nan=math.nan,
+    sqrt=_unary(math.sqrt, lambda v: 0.5 / math.sqrt(v)),
+    exp=_unary(math.exp, math.exp),
+    log=_log,
+    log10=_unary(math.log10, lambda v: 1.0 / (v * math.log(10.0))),
+    pow=_pow,
+    sin=_unary(math.sin, math.cos),
+    cos=_unary(math.cos, lambda v: -math.sin(v)),
+    tan=_unary(math.tan, lambda v: 1.0 / math.cos(v) ** 2),
+    asin=_unary(math.asin, lambda v: 1.0 / math.sqrt(1.0 - v * v)),
+    acos=_unary(math.acos, lambda v: -1.0 / math.sqrt(1.0 - v * v)),
+    atan=_unary(math.atan, lambda v: 1.0 / (1.0 + v * v)),
+    atan2=_atan2,
+    hypot=_hypot,
+    fabs=_unary(math.fabs, lambda v: 1.0 if v >= 0 else -1.0),
+    degrees=_unary(math.degrees, lambda v: 180.0 / math.pi),
+    radians=_unary(math.radians, lambda v: math.pi / 180.0),
+)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_dual_expression(expression):
+    """
+    Přeloží výraz se značkami veličin na funkci pracující se sloupci
+    duálních čísel
+
+    Funkce je stejná jako funkce vrácená solver.compile_expression, jen se
+    v ní místo modulu math používá objekt DUAL_MATH.
+
+    :param expression: výraz se značkami veličin ohraničenými složenými
+    závorkami: str
+    :return: značky veličin v pořadí argumentů a přeložená funkce: tuple
+    """
+    arguments, source = solver.translate_expression(expression)
+    return arguments, eval(source, {'math': DUAL_MATH})
+
+
+def evaluate_dual(function, columns):
+    """
+    Vyhodnotí funkci nad sloupci duálních čísel
+
+    Funkce se nejprve vyhodnotí nad celými sloupci najednou. Pokud se
+    vyhodnocení u některého řádku nezdaří, vyhodnotí se funkce znovu po
+    řádcích a hodnoty i derivace neúspěšných řádků budou NaN (obdobně
+    jako u funkce solver.map_safe).
+
+    :param function: funkce přeložená funkcí compile_dual_expression
+    :param columns: sloupce duálních čísel s argumenty funkce: list
+    :return: sloupec výsledků: DualColumn
+    """
+    try:
+        return _as_column(function(*columns), columns[0])
+    except solver.EVALUATION_ERRORS:
+        pass
+
+    size = len(columns[0].gradients)
+    values = []
+    gradients = tuple([] for _ in range(size))
+    for index in range(len(columns[0])):
+        try:
+            result = _as_column(function(*[column.row(index)
+                                           for column in columns]),
+                                columns[0].row(index))
+            values.append(result.values[0])
+            for gradient, result_gradient in zip(gradients,
+                                                 result.gradients):
+                gradient.append(result_gradient[0])
+        except solver.EVALUATION_ERRORS:
+            values.append(math.nan)
+            for gradient in gradients:
+                gradient.append(math.nan)
+
+    return DualColumn(values, gradients)
+
+
+def solve_batch_jacobian(geom_shape, columns, check_conditions=True):
+    """
+    Hromadně spočítá hodnoty veličin a jejich derivace podle zadaných
+    veličin
+
+    Hodnoty veličin se spočítají funkcí solver.solve_batch a poté se podle
+    stejného plánu výpočtu vyhodnotí vzorce nad sloupci duálních čísel.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param columns: sloupce hodnot zadaných veličin: dict
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :return: sloupce hodnot všech veličin, derivace ve tvaru {značka
+    veličiny: {značka zadané veličiny: sloupec derivací}} a sloupec
+    s informací, zda je daný řádek platný: tuple
+    """
+    values, valid = solver.solve_batch(geom_shape, columns, check_conditions)
+
+    inputs = sorted(columns)
+    rows = len(valid)
+    zeros = [0.0] * rows
+    ones = [1.0] * rows
+    duals = {symbol: DualColumn(list(columns[symbol]), tuple(
+        ones if other == symbol else zeros for other in inputs))
+        for symbol in inputs}
+
+    for symbol, way, target in geom_shape.get_evaluation_plan(columns.keys()):
+        arguments, function = compile_dual_expression(way['expression'])
+        if target is None:
+            duals[symbol] = evaluate_dual(function,
+                                          [duals[a] for a in arguments])
+            continue
+
+        # hodnota veličiny x byla nalezena jako kořen rovnice
+        # f(x, y) = target, takže podle věty o implicitní funkci platí
+        # dx = (d target - df/dy * dy) / (df/dx)
+        others = evaluate_dual(function, [
+            DualColumn(values[symbol], tuple(zeros for _ in inputs))
+            if a == symbol else duals[a] for a in arguments])
+        slopes = evaluate_dual(function, [
+            DualColumn(values[a], (ones if a == symbol else zeros,))
+            for a in arguments]).gradients[0]
+        duals[symbol] = DualColumn(values[symbol], tuple(
+            [(d - e) / slope if slope else math.nan
+             for d, e, slope in zip(target_gradient, other_gradient, slopes)]
+            for target_gradient, other_gradient
+            in zip(duals[target].gradients, others.gradients)))
+
+    jacobian = {symbol: dict(zip(inputs, map(list, duals[symbol].gradients)))
+                for symbol in geom_shape.general_properties}
+
+    return values, jacobian, valid
+
+
+def solve_jacobian(geom_shape, inputs, check_conditions=True):
+    """
+    Spočítá hodnoty veličin jednoho útvaru a jejich derivace podle
+    zadaných veličin
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param inputs: hodnoty zadaných veličin ve tvaru {značka: hodnota}:
+    dict
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :return: hodnoty veličin ve tvaru {značka: hodnota}, derivace ve tvaru
+    {značka veličiny: {značka zadané veličiny: derivace}} a informace, zda
+    jsou hodnoty platné: tuple
+    """
+    values, jacobian, valid = solve_batch_jacobian(
+        geom_shape, {symbol: [value] for symbol, value in inputs.items()},
+        check_conditions)
+
+    return ({symbol: column[0] for symbol, column in values.items()},
+            {symbol: {input_symbol: column[0]
+                      for input_symbol, column in row.items()}
+             for symbol, row in jacobian.items()},
+            valid[0])
+
+
+if __name__ == '__main__':
+    import catalog
+
+    shapes = catalog.load_catalog()
+    given_values = dict()
+    for argument in sys.argv[2:]:
+        given_symbol, _, given_value = argument.partition('=')
+        given_values[given_symbol] = float(given_value)
+
+    solved_values, solved_jacobian, solved_valid = solve_jacobian(
+        shapes[sys.argv[1]], given_values)
+    if not solved_valid:
+        print('Zadané hodnoty nesplňují podmínky konstruovatelnosti.')
+
+    given_symbols = sorted(given_values)
+    print('\t'.join(['veličina', 'hodnota']
+                    + [f'd/d{symbol}' for symbol in given_symbols]))
+    for solved_symbol, solved_value in solved_values.items():
+        print('\t'.join([solved_symbol, f'{solved_value:.10g}']
+                        + [f'{solved_jacobian[solved_symbol][symbol]:.10g}'
+                           for symbol in given_symbols]))
@@ -0,0 +1,201 @@
+"""
+Modul s parametrickými rodinami GEOMETRICKÝCH útvarů
+
+Parametrická rodina popisuje jediným textovým souborem mnoho GEOMETRICKÝCH
+útvarů, které se liší pouze hodnotou celočíselného parametru (např.
+pravidelné n-úhelníky). Textový soubor rodiny obsahuje kromě oddílů
+textového souboru GEOMETRICKÉHO útvaru také oddíl PARAMETERS s popisem
+parametru; značka parametru se ve vzorcích, podmínkách a popisech nahradí
+jeho hodnotou.
+
+Pro každou hodnotu parametru se vytvoří samostatná instance třídy
+GeometricShape s názvem tvořeným názvem rodiny a hodnotou parametru (např.
+nuhelnik5). Instance včetně plánů výpočtu se uchovávají v mezipaměti,
+ze které se při překročení kapacity FAMILY_CACHE_SIZE vyřazují nejdéle
+nepoužité instance (viz instantiate_family).
+
+Rodiny se načítají z výčtu v souboru list_of_families.txt, který má stejný
+formát jako soubor list_of_shapes.txt.
+"""
+
+import functools
+import math
+import re
+import solver
+import textfiles
+from shape import GeometricShape
+
+
+# Textový soubor s výčtem dostupných parametrických rodin
+LIST_OF_FAMILIES = 'list_of_families.txt'
+
+# Maximální počet instancí GEOMETRICKÝCH útvarů všech rodin uchovávaných
+# v mezipaměti
+FAMILY_CACHE_SIZE = 64
+
+
+class ShapeFamily:
+    """
+    Třída reprezentující parametrickou rodinu GEOMETRICKÝCH útvarů
+    """
+
+    def __init__(self, family_name, path):
+        """
+        Konstruktor rodiny
+
+        :param family_name: název rodiny bez diakritiky (shodný s názvem
+        jejího textového souboru bez přípony): str
+        :param path: relativní cesta k textovému souboru rodiny bez jeho
+        názvu: str
+        """
+        parameter, descriptive_name, quantities, formulas, conditions \
+            = textfiles.family_init_list_from_text_file(path, family_name)
+
+        self.family_name = family_name
+        self.path = path
+        self.parameter_symbol = parameter[0]
+        self.parameter_short_name = parameter[1]
+        self.parameter_description = parameter[2]
+        self.minimum = int(parameter[3])
+        self.descriptive_name = descriptive_name
+        self.quantities = quantities
+        self.formulas = formulas
+        self.conditions = conditions
+
+        # značka parametru se nahrazuje pouze jako samostatné slovo, nikoli
+        # např. uvnitř názvu funkce math.tan
+        self.pattern = re.compile(
+            rf'(?<![\w.]){re.escape(self.parameter_symbol)}(?!\w)')
+
+    def __repr__(self):
+        return f'ShapeFamily({self.family_name!r})'
+
+    def shape_name(self, value):
+        """
+        Vrátí název GEOMETRICKÉHO útvaru rodiny s danou hodnotou parametru
+
+        :param value: hodnota parametru: int
+        :return: název útvaru (např. nuhelnik5): str
+        """
+        return f'{self.family_name}{value}'
+
+    def parameter_value(self, value):
+        """
+        Ověří hodnotu parametru a převede ji na celé číslo
+
+        :param value: hodnota parametru: int nebo float
+        :return: hodnota parametru: int
+        """
+        if value != value or value % 1 or value < self.minimum:
+            raise ValueError(f'Parametr {self.parameter_symbol} rodiny '
+                             f'{self.family_name} musí být celé číslo větší '
+                             f'nebo rovné {self.minimum}.')
+        return int(value)
+
+    def substitute(self, text, value):
+        """
+        Nahradí v textu značku parametru jeho hodnotou
+
+        :param text: vzorec, podmínka nebo popis: str
+        :param value: hodnota parametru: int
+        :return: text s dosazenou hodnotou parametru: str
+        """
+        return self.pattern.sub(str(value), text)
+
+    def instantiate(self, value):
+        """
+        Vrátí instanci GEOMETRICKÉHO útvaru rodiny s danou hodnotou parametru
+
+        :param value: hodnota parametru: int
+        :return: instance GEOMETRICKÉHO útvaru: GeometricShape
+        """
+        return instantiate_family(self, self.parameter_value(value))
+
+
+@functools.lru_cache(maxsize=FAMILY_CACHE_SIZE)
+def instantiate_family(family, value):
+    """
+    Vytvoří instanci GEOMETRICKÉHO útvaru rodiny s danou hodnotou parametru
+
+    Instance se uchovávají v mezipaměti podle rodiny a hodnoty parametru,
+    takže se vzorce každého útvaru analyzují a plány výpočtu sestavují
+    pouze jednou.
+
+    :param family: parametrická rodina: ShapeFamily
+    :param value: ověřená hodnota parametru: int
+    :return: instance GEOMETRICKÉHO útvaru: GeometricShape
+    """
+    quantities = [[quantity[0]]
+                  + [family.substitute(text, value) for text in quantity[1:3]]
+                  + quantity[3:] for quantity in family.quantities]
+    formulas = [family.substitute(formula, value)
+                for formula in family.formulas]
+    conditions = [[family.substitute(text, value) for text in condition]
+                  for condition in family.conditions]
+
+    return GeometricShape(family.shape_name(value),
+                          family.substitute(family.descriptive_name, value),
+                          quantities, formulas, conditions)
+
+
+def load_families(list_of_families=LIST_OF_FAMILIES):
+    """
+    Vytvoří instance všech parametrických rodin z výčtu
+
+    :param list_of_families: cesta k výčtu rodin: str
+    :return: slovník s instancemi rodin: dict
+    """
+    return {family_name: ShapeFamily(family_name, path)
+            for family_name, _, path
+            in textfiles.shape_list_from_text_file(list_of_families)}
+
+
+def solve_family_batch(family, parameters, columns, check_conditions=True,
+                       sinks=()):
+    """
+    Hromadně spočítá hodnoty veličin mnoha útvarů jedné rodiny
+
+    Řádky se seskupí podle hodnoty parametru a každá skupina se spočítá
+    najednou funkcí solver.solve_batch s instancí útvaru pro danou hodnotu.
+    Řádky s neplatnou hodnotou parametru jsou neplatné a hodnoty jejich
+    veličin jsou NaN.
+
+    :param family: parametrická rodina: ShapeFamily
+    :param parameters: sloupec hodnot parametru: list
+    :param columns: sloupce hodnot zadaných veličin: dict
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :param sinks: agregáty, do kterých se započítají platné řádky (viz
+    modul aggregates): list
+    :return: sloupce hodnot všech veličin a sloupec s informací, zda je
+    daný řádek platný: tuple
+    """
+    rows = len(parameters)
+    values = {quantity[0]: [math.nan] * rows for quantity in family.quantities}
+    valid = [False] * rows
+
+    groups = dict()
+    for i, value in enumerate(parameters):
+        groups.setdefault(value, []).append(i)
+
+    for value, indices in groups.items():
+        try:
+            geom_shape = family.instantiate(value)
+        except ValueError:
+            continue
+
+        group_values, group_valid = solver.solve_batch(
+            geom_shape, {symbol: [column[i] for i in indices]
+                         for symbol, column in columns.items()},
+            check_conditions)
+        for symbol, column in group_values.items():
+            target = values[symbol]
+            for i, result in zip(indices, column):
+                target[i] = result
+        for i, ok in zip(indices, group_valid):
+            valid[i] = ok
+
+    for sink in sinks:
+        sink.update(values, valid)
+
+    return values, valid
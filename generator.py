@@ -0,0 +1,195 @@
+"""
+Modul pro generování náhodných konstruovatelných útvarů
+
+Modul slouží k přípravě velkého množství testovacích dat. Pro zvolený
+GEOMETRICKÝ útvar se náhodně vygenerují hodnoty některé minimální množiny
+veličin, která určuje hodnoty všech ostatních veličin (viz
+GeometricShape.minimal_determining_sets), zbývající hodnoty se hromadně
+dopočítají (viz solver.solve_batch) a ponechají se pouze ty řádky, které
+splňují implicitní i explicitní podmínky konstruovatelnosti útvaru.
+
+Modul lze spustit i samostatně příkazem:
+
+python generator.py [počet řádků] [seed]
+
+který pro každý útvar z katalogu vypíše podíl přijatých řádků, nebo
+příkazem:
+
+python generator.py {název útvaru} {počet řádků} [seed]
+
+který vypíše vygenerované řádky zvoleného útvaru ve formátu CSV.
+"""
+
+import math
+import random
+import sys
+import catalog
+import solver
+
+
+# Výchozí horní mez náhodně generovaných hodnot veličin, které nejsou úhly
+DEFAULT_SCALE = 10.0
+
+# Výchozí počet řádků zpracovávaných najednou
+DEFAULT_CHUNK_SIZE = 10000
+
+# Nejvyšší počet po sobě jdoucích dávek bez jediného přijatého řádku, po
+# kterém generování skončí výjimkou
+MAX_EMPTY_CHUNKS = 20
+
+
+class ShapeGenerator:
+    """
+    Třída generující náhodné konstruovatelné útvary jednoho typu
+    """
+
+    def __init__(self, geom_shape, seed=None, input_symbols=None,
+                 ranges=None):
+        """
+        Konstruktor generátoru
+
+        :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+        :param seed: počáteční hodnota generátoru náhodných čísel, díky
+        které lze vygenerovat tatáž data opakovaně: int
+        :param input_symbols: množina veličin, jejichž hodnoty se budou
+        generovat (None znamená náhodnou volbu z minimálních množin pro
+        každou dávku zvlášť): set of strings
+        :param ranges: meze náhodně generovaných hodnot jednotlivých
+        veličin ve tvaru {značka: (dolní mez, horní mez)}; veličiny, které
+        ve slovníku nejsou, se generují z intervalu (0, pí) v případě úhlů
+        a (0, DEFAULT_SCALE) v ostatních případech: dict
+        """
+        self.geom_shape = geom_shape
+        self.random = random.Random(seed)
+
+        if input_symbols is not None:
+            undetermined = geom_shape.undetermined_quantities(input_symbols)
+            if undetermined:
+                raise ValueError(f'Zadané veličiny neurčují hodnoty veličin '
+                                 f'{", ".join(sorted(undetermined))}.')
+            self.input_sets = [frozenset(input_symbols)]
+        else:
+            self.input_sets = geom_shape.minimal_determining_sets
+
+        self.ranges = dict()
+        for symbol, properties in geom_shape.general_properties.items():
+            if properties['is_angle']:
+                self.ranges[symbol] = (0.0, math.pi)
+            else:
+                self.ranges[symbol] = (0.0, DEFAULT_SCALE)
+        self.ranges.update(ranges or {})
+
+        # počet vygenerovaných a počet přijatých řádků
+        self.generated_rows = 0
+        self.accepted_rows = 0
+
+    @property
+    def acceptance_rate(self):
+        """
+        Podíl přijatých řádků ze všech dosud vygenerovaných řádků
+
+        :return: podíl přijatých řádků: float
+        """
+        if not self.generated_rows:
+            return 0.0
+        return self.accepted_rows / self.generated_rows
+
+    def generate_chunk(self, size):
+        """
+        Vygeneruje jednu dávku řádků a vrátí z ní přijaté řádky
+
+        :param size: počet generovaných řádků: int
+        :return: sloupce hodnot všech veličin přijatých řádků: dict
+        """
+        input_symbols = self.random.choice(self.input_sets)
+
+        columns = dict()
+        for symbol in sorted(input_symbols):
+            low, high = self.ranges[symbol]
+            uniform = self.random.uniform
+            columns[symbol] = [uniform(low, high) for _ in range(size)]
+
+        values, valid = solver.solve_batch(self.geom_shape, columns)
+
+        self.generated_rows += size
+        self.accepted_rows += valid.count(True)
+
+        return {symbol: [value for value, ok in zip(column, valid) if ok]
+                for symbol, column in values.items()}
+
+    def chunks(self, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Postupně vrací dávky přijatých řádků, dokud jich nevrátí požadovaný
+        počet
+
+        Jde o generátor, takže v paměti je vždy pouze jedna dávka řádků.
+        Pokud MAX_EMPTY_CHUNKS po sobě jdoucích dávek neobsahuje žádný
+        přijatý řádek (např. zadané veličiny nemohou splnit podmínky
+        konstruovatelnosti), vyvolá se výjimka ValueError.
+
+        :param rows: požadovaný počet přijatých řádků: int
+        :param chunk_size: počet řádků generovaných v jedné dávce: int
+        :return: generátor dávek přijatých řádků
+        """
+        remaining = rows
+        empty_chunks = 0
+        while remaining > 0:
+            chunk = self.generate_chunk(chunk_size)
+            accepted = len(next(iter(chunk.values())))
+            if not accepted:
+                empty_chunks += 1
+                if empty_chunks >= MAX_EMPTY_CHUNKS:
+                    raise ValueError(
+                        f'Pro útvar {self.geom_shape.geom_shape_name} se '
+                        f'nepodařilo vygenerovat konstruovatelné hodnoty.')
+                continue
+            empty_chunks = 0
+            if accepted > remaining:
+                chunk = {symbol: column[:remaining]
+                         for symbol, column in chunk.items()}
+                accepted = remaining
+            remaining -= accepted
+            yield chunk
+
+
+def acceptance_report(geom_shapes, rows, seed=None):
+    """
+    Vrátí podíl přijatých řádků pro každý GEOMETRICKÝ útvar
+
+    :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    :param rows: počet generovaných řádků pro každý útvar: int
+    :param seed: počáteční hodnota generátoru náhodných čísel: int
+    :return: slovník {název útvaru: podíl přijatých řádků}: dict
+    """
+    report = dict()
+    for geom_shape_name, geom_shape in geom_shapes.items():
+        generator = ShapeGenerator(geom_shape, seed)
+        for offset in range(0, rows, DEFAULT_CHUNK_SIZE):
+            generator.generate_chunk(min(DEFAULT_CHUNK_SIZE, rows - offset))
+        report[geom_shape_name] = generator.acceptance_rate
+
+    return report
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    shapes = catalog.load_catalog()
+
+    if arguments and arguments[0] in shapes:
+        shape_generator = ShapeGenerator(
+            shapes[arguments[0]],
+            int(arguments[2]) if len(arguments) > 2 else None)
+        symbols = list(shapes[arguments[0]].general_properties)
+        print(','.join(symbols))
+        for generated_chunk in shape_generator.chunks(int(arguments[1])):
+            print('\n'.join(
+                ','.join(repr(value) for value in row)
+                for row in zip(*(generated_chunk[s] for s in symbols))))
+        print(f'Podíl přijatých řádků: '
+              f'{shape_generator.acceptance_rate:.4f}', file=sys.stderr)
+    else:
+        for name, rate in acceptance_report(
+                shapes,
+                int(arguments[0]) if arguments else DEFAULT_CHUNK_SIZE,
+                int(arguments[1]) if len(arguments) > 1 else None).items():
+            print(f'{name}: {rate:.4f}')
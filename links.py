@@ -0,0 +1,349 @@
+"""
+Modul pro vazby mezi veličinami různých UŽIVATELSKÝCH útvarů
+
+Vazba určuje, že hodnota veličiny jednoho UŽIVATELSKÉHO útvaru se spočítá
+z hodnot veličin jiných UŽIVATELSKÝCH útvarů, např.:
+
+valec1.r = krychle1.a / 2
+jehlan1.a = ctverec1.a
+
+Na pravé straně vazby lze použít stejné výrazy jako ve vzorcích
+v textových souborech útvarů, jen se místo značek veličin ve složených
+závorkách píší odkazy ve tvaru {uživatelské jméno}.{značka veličiny}.
+Vazba je jednosměrná - hodnota na levé straně se spočítá z hodnot na pravé
+straně, nikoli naopak. Úhly se ve vazbách vyjadřují v obloukové míře
+(radiánech).
+
+Vazby tvoří orientovaný graf, jehož uzly jsou UŽIVATELSKÉ útvary a hrany
+vedou od útvarů na pravé straně vazby k útvaru na její levé straně. Graf
+nesmí obsahovat cyklus. Po přiřazení hodnoty veličině útvaru se hodnoty
+šíří po hranách grafu pomocí fronty útvarů, u kterých mohlo dojít ke
+změně, takže se přepočítají pouze útvary, kterých se přiřazení týká.
+Hodnoty vypočítané vazbou se přiřazují stejně jako hodnoty zadané
+uživatelem, tzn. včetně kontroly podmínek konstruovatelnosti cílového
+útvaru. Pokud cílová veličina již hodnotu má, ověří se, zda je s vazbou
+v souladu.
+"""
+
+import collections
+import math
+import re
+import solver
+
+
+# Relativní odchylka, do které se hodnota veličiny považuje za shodnou
+# s hodnotou spočítanou vazbou
+LINK_TOLERANCE = 1e-9
+
+# Odkaz na veličinu UŽIVATELSKÉHO útvaru ve tvaru {jméno}.{značka}
+REFERENCE = re.compile(r'\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\b')
+
+# Jedna vazba - cílový útvar a veličina, text pravé strany, odkazy na
+# veličiny jiných útvarů v pořadí argumentů přeložené funkce a přeložená
+# funkce
+Link = collections.namedtuple(
+    'Link', 'target_shape target_symbol expression references function')
+
+
+class LinkedAssembly:
+    """
+    Třída reprezentující sestavu UŽIVATELSKÝCH útvarů propojených vazbami
+    """
+
+    def __init__(self, user_shapes):
+        """
+        Konstruktor sestavy
+
+        :param user_shapes: slovník s instancemi UŽIVATELSKÝCH útvarů,
+        jejichž veličiny lze vazbami propojovat: dict
+        """
+        self.user_shapes = user_shapes
+
+        # vazby podle cílové veličiny ve tvaru {(jméno, značka): vazba}
+        self.links = dict()
+
+        # vazby podle útvarů na jejich pravé straně ve tvaru
+        # {jméno: [vazba, ...]}
+        self.dependents = collections.defaultdict(list)
+
+    def parse_link(self, declaration):
+        """
+        Zpracuje textový zápis vazby
+
+        :param declaration: zápis vazby ve tvaru 'jméno.značka = výraz':
+        str
+        :return: vazba: Link
+        """
+        if declaration.count('=') != 1:
+            raise ValueError('Vazba musí mít tvar jméno.značka = výraz.')
+        left_side, right_side = [side.strip()
+                                 for side in declaration.split('=')]
+
+        target = REFERENCE.fullmatch(left_side)
+        if target is None:
+            raise ValueError(f'Levá strana vazby {left_side} není odkazem '
+                             f'na veličinu útvaru.')
+        self._check_reference(*target.groups())
+
+        # odkazy na veličiny útvarů nahradíme značkami ve složených
+        # závorkách, aby bylo možné výraz přeložit funkcí
+        # solver.compile_expression; odkazy ve tvaru math.{funkce} se
+        # ponechají beze změny
+        placeholders = dict()
+
+        def replace(match):
+            if match.group(1) == 'math':
+                return match.group(0)
+            self._check_reference(*match.groups())
+            reference = match.groups()
+            if reference not in placeholders:
+                placeholders[reference] = f'v{len(placeholders)}'
+            return '{' + placeholders[reference] + '}'
+
+        expression = REFERENCE.sub(replace, right_side)
+        if not placeholders:
+            raise ValueError('Pravá strana vazby neobsahuje žádný odkaz na '
+                             'veličinu útvaru.')
+
+        try:
+            arguments, function = solver.compile_expression(expression)
+        except SyntaxError:
+            raise ValueError(f'Pravá strana vazby {right_side} není platným '
+                             f'výrazem.')
+
+        by_placeholder = {placeholder: reference for reference, placeholder
+                          in placeholders.items()}
+        return Link(target.group(1), target.group(2), right_side,
+                    tuple(by_placeholder[a] for a in arguments), function)
+
+    def _check_reference(self, user_shape_name, symbol):
+        """
+        Ověří, zda odkazovaný útvar existuje a má danou veličinu
+
+        :param user_shape_name: UŽIVATELSKÉ jméno útvaru: str
+        :param symbol: značka veličiny: str
+        :return: None
+        """
+        user_shape = self.user_shapes.get(user_shape_name)
+        if user_shape is None:
+            raise ValueError(f'Útvar {user_shape_name} neexistuje.')
+        if not user_shape.quantity_exists(symbol):
+            raise ValueError(f'Útvar {user_shape_name} nemá veličinu '
+                             f'{symbol}.')
+
+    def add_link(self, declaration):
+        """
+        Přidá do sestavy novou vazbu a rozšíří hodnoty podle ní
+
+        Vazbu nelze přidat, pokud cílová veličina již je cílem jiné vazby,
+        pokud odkazuje na svůj vlastní útvar nebo pokud by vytvořila cyklus.
+
+        :param declaration: zápis vazby ve tvaru 'jméno.značka = výraz':
+        str
+        :return: zprávy o nesouladu hodnot nebo nesplněných podmínkách
+        zjištěných při šíření hodnot (viz propagate): list
+        """
+        link = self.parse_link(declaration)
+        target = (link.target_shape, link.target_symbol)
+
+        if target in self.links:
+            raise ValueError(f'Veličina {link.target_shape}.'
+                             f'{link.target_symbol} už je cílem vazby.')
+
+        sources = {user_shape_name for user_shape_name, _ in link.references}
+        if link.target_shape in sources:
+            raise ValueError('Vazba nesmí odkazovat na svůj vlastní útvar.')
+
+        cycle = self.find_path(link.target_shape, sources)
+        if cycle is not None:
+            raise ValueError(f'Vazba by vytvořila cyklus '
+                             f'{" -> ".join(cycle + [link.target_shape])}.')
+
+        self.links[target] = link
+        for source in sources:
+            self.dependents[source].append(link)
+
+        return self.propagate(*sources)
+
+    def remove_link(self, user_shape_name, symbol):
+        """
+        Odstraní vazbu, jejímž cílem je daná veličina
+
+        Hodnoty, které již byly vazbou spočítány, zůstanou zachovány.
+
+        :param user_shape_name: UŽIVATELSKÉ jméno cílového útvaru: str
+        :param symbol: značka cílové veličiny: str
+        :return: zda taková vazba existovala: bool
+        """
+        link = self.links.pop((user_shape_name, symbol), None)
+        if link is None:
+            return False
+
+        for source in {name for name, _ in link.references}:
+            self.dependents[source].remove(link)
+            if not self.dependents[source]:
+                del self.dependents[source]
+        return True
+
+    def remove_shape(self, user_shape_name):
+        """
+        Odstraní všechny vazby, které se týkají daného útvaru
+
+        :param user_shape_name: UŽIVATELSKÉ jméno útvaru: str
+        :return: None
+        """
+        for link in list(self.links.values()):
+            if link.target_shape == user_shape_name \
+                    or any(name == user_shape_name
+                           for name, _ in link.references):
+                self.remove_link(link.target_shape, link.target_symbol)
+
+    def find_path(self, start, goals):
+        """
+        Najde cestu grafem vazeb z daného útvaru do některého z cílů
+
+        :param start: UŽIVATELSKÉ jméno počátečního útvaru: str
+        :param goals: UŽIVATELSKÁ jména cílových útvarů: set
+        :return: jména útvarů na cestě nebo None, pokud cesta neexistuje:
+        list
+        """
+        previous = {start: None}
+        queue = collections.deque([start])
+        while queue:
+            user_shape_name = queue.popleft()
+            if user_shape_name in goals:
+                path = []
+                while user_shape_name is not None:
+                    path.append(user_shape_name)
+                    user_shape_name = previous[user_shape_name]
+                return path[::-1]
+
+            for link in self.dependents.get(user_shape_name, ()):
+                if link.target_shape not in previous:
+                    previous[link.target_shape] = user_shape_name
+                    queue.append(link.target_shape)
+
+        return None
+
+    def evaluate(self, link):
+        """
+        Spočítá hodnotu cílové veličiny vazby
+
+        :param link: vazba: Link
+        :return: hodnota nebo None, pokud některá veličina na pravé straně
+        vazby dosud nemá hodnotu nebo výraz nelze vyhodnotit: float
+        """
+        arguments = []
+        for user_shape_name, symbol in link.references:
+            quantity = self.user_shapes[user_shape_name].quantity_values[
+                symbol]
+            if not quantity['has_value']:
+                return None
+            arguments.append(quantity['value'])
+
+        try:
+            return link.function(*arguments)
+        except solver.EVALUATION_ERRORS:
+            return None
+
+    def propagate(self, *user_shape_names):
+        """
+        Rozšíří hodnoty ze zadaných útvarů do útvarů na ně navázaných
+
+        Útvary, u kterých mohlo dojít ke změně, se zařazují do fronty.
+        Pro každý útvar z fronty se vyhodnotí vazby, které na něj odkazují,
+        a pokud cílová veličina dosud nemá hodnotu, spočítaná hodnota se
+        jí přiřadí (včetně dopočítání ostatních veličin cílového útvaru)
+        a cílový útvar se zařadí do fronty. Pokud cílová veličina hodnotu
+        již má, ověří se její soulad s vazbou.
+
+        :param user_shape_names: UŽIVATELSKÁ jména útvarů, jejichž hodnoty
+        se změnily: str
+        :return: zprávy o nesouladu hodnot nebo nesplněných podmínkách:
+        list
+        """
+        messages = []
+        queue = collections.deque(user_shape_names)
+        queued = set(user_shape_names)
+        while queue:
+            user_shape_name = queue.popleft()
+            queued.discard(user_shape_name)
+
+            for link in self.dependents.get(user_shape_name, ()):
+                changed, message = self._apply(link)
+                if message is not None:
+                    messages.append(message)
+                if changed and link.target_shape not in queued:
+                    queue.append(link.target_shape)
+                    queued.add(link.target_shape)
+
+        return messages
+
+    def _apply(self, link):
+        """
+        Přiřadí cílové veličině vazby spočítanou hodnotu
+
+        :param link: vazba: Link
+        :return: zda se hodnotu podařilo přiřadit a zpráva o nesouladu
+        hodnot nebo nesplněné podmínce (nebo None): tuple
+        """
+        value = self.evaluate(link)
+        if value is None:
+            return False, None
+
+        user_shape = self.user_shapes[link.target_shape]
+
+        if user_shape.quantity_has_value(link.target_symbol):
+            return False, self._compare(link, value)
+
+        if not user_shape.value_meets_conditions(link.target_symbol, value):
+            return False, f'{link.target_shape}.{link.target_symbol} = ' \
+                          f'{link.expression}: ' \
+                          f'{user_shape.last_condition_message}'
+
+        user_shape.assign_value_and_recalculate(link.target_symbol, value)
+        return True, None
+
+    def _compare(self, link, value):
+        """
+        Ověří soulad existující hodnoty cílové veličiny s vazbou
+
+        :param link: vazba: Link
+        :param value: hodnota spočítaná vazbou: float
+        :return: zpráva o nesouladu nebo None: str
+        """
+        current_value = self.user_shapes[link.target_shape].quantity_values[
+            link.target_symbol]['value']
+        if math.isclose(current_value, value, rel_tol=LINK_TOLERANCE):
+            return None
+
+        return f'{link.target_shape}.{link.target_symbol} = ' \
+               f'{link.expression}: hodnota {current_value} neodpovídá ' \
+               f'hodnotě {value} spočítané vazbou.'
+
+    def check(self):
+        """
+        Ověří soulad všech vazeb sestavy s hodnotami veličin
+
+        :return: zprávy o nesouladu hodnot: list
+        """
+        messages = []
+        for link in self.links.values():
+            value = self.evaluate(link)
+            user_shape = self.user_shapes[link.target_shape]
+            if value is not None \
+                    and user_shape.quantity_has_value(link.target_symbol):
+                message = self._compare(link, value)
+                if message is not None:
+                    messages.append(message)
+
+        return messages
+
+    def format_links(self):
+        """
+        Vrátí zápisy všech vazeb sestavy
+
+        :return: zápisy vazeb ve tvaru 'jméno.značka = výraz': list
+        """
+        return [f'{link.target_shape}.{link.target_symbol} = '
+                f'{link.expression}' for link in self.links.values()]
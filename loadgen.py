@@ -0,0 +1,476 @@
+"""
+Modul pro zátěžové měření neinteraktivního režimu aplikace
+
+Na rozdíl od měření propustnosti samotného hromadného výpočtu (viz modul
+benchmark) modul napodobuje skutečné používání aplikace: vytváření útvarů,
+postupné přiřazování hodnot jejich veličinám, vypisování hodnot a seznamu
+útvarů a odstraňování útvarů. Příkazy se provádějí funkcí
+main.execute_script_command nad slovníkem main.user_shapes, tzn. stejně jako
+příkazy skriptu (viz main.run_script).
+
+Zátěž se generuje předem a deterministicky podle počáteční hodnoty
+generátoru náhodných čísel. Typy útvarů se volí podle zadaných vah a hodnoty
+veličin se přebírají z náhodně vygenerovaných konstruovatelných útvarů (viz
+modul generator), přičemž zadávané veličiny tvoří některou z minimálních
+množin určujících útvar (viz GeometricShape.minimal_determining_sets).
+
+Příkazy se odesílají v pevném rozvrhu podle požadovaného počtu požadavků za
+sekundu bez ohledu na to, zda byly předchozí příkazy již provedeny
+(tzv. otevřená smyčka). Doba odezvy se proto měří od plánovaného okamžiku
+odeslání, takže zahrnuje i čekání ve frontě, ke kterému dochází, když
+aplikace požadavky nestíhá zpracovávat.
+
+Výsledkem měření je zpráva ve formátu JSON se seřazenými klíči, kterou lze
+porovnat se zprávou z jiné verze aplikace (viz compare_reports). Zpráva
+obsahuje propustnost, percentily doby odezvy pro jednotlivé druhy příkazů
+a průběh využití procesoru a paměti v čase.
+
+Modul lze spustit i samostatně příkazem:
+
+python loadgen.py {požadavků za sekundu} {doba v sekundách} [název=váha ...]
+
+který vypíše zprávu o měření ve formátu JSON. Název je buď název
+GEOMETRICKÉHO útvaru (např. kvadr=3), nebo druh příkazu (např. dump=2, viz
+DEFAULT_OPERATION_WEIGHTS); počet požadavků za sekundu 0 znamená odesílání
+dalšího příkazu ihned po provedení předchozího. Příkazem:
+
+python loadgen.py --compare {starší zpráva} {novější zpráva}
+
+se vypíše relativní změna propustnosti a percentilů doby odezvy.
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import time
+import generator
+import main
+
+try:
+    import resource
+except ImportError:
+    # modul resource není k dispozici ve Windows
+    resource = None
+
+
+# Výchozí váhy druhů příkazů; příkaz clear se odesílá automaticky, když
+# má útvar přiřazeny všechny naplánované hodnoty
+DEFAULT_OPERATION_WEIGHTS = {
+    'create': 1,
+    'assign': 6,
+    'dump': 2,
+    'list': 1,
+    'delete': 1,
+}
+
+# Nejvyšší počet současně existujících útvarů; při jeho dosažení se místo
+# vytvoření útvaru některý útvar odstraní
+DEFAULT_MAX_SHAPES = 1000
+
+# Počet předem vygenerovaných konstruovatelných útvarů každého typu
+ROWS_PER_SHAPE = 256
+
+# Nejvyšší počet veličin přiřazovaných jedním příkazem
+MAX_ASSIGNMENTS_PER_COMMAND = 2
+
+# Délka intervalu v sekundách, po kterém se zaznamenává využití procesoru
+# a paměti
+DEFAULT_SAMPLE_INTERVAL = 1.0
+
+# Percentily doby odezvy uváděné ve zprávě
+PERCENTILES = (50, 90, 99)
+
+# Výchozí počáteční hodnota generátoru náhodných čísel
+DEFAULT_SEED = 0
+
+
+def input_rows(geom_shape, rows, seed):
+    """
+    Vygeneruje hodnoty zadávaných veličin konstruovatelných útvarů
+
+    Pro každý řádek se náhodně zvolí jedna z minimálních množin veličin
+    určujících útvar. Hodnoty úhlů se převedou na stupně, jak je očekává
+    příkaz přiřazení hodnot.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param rows: požadovaný počet řádků: int
+    :param seed: počáteční hodnota generátoru náhodných čísel: int
+    :return: seznamy dvojic (značka, hodnota) v pořadí přiřazení: list
+    """
+    shape_generator = generator.ShapeGenerator(geom_shape, seed)
+    choose = random.Random(seed)
+    sets = [sorted(input_set)
+            for input_set in geom_shape.minimal_determining_sets]
+    properties = geom_shape.general_properties
+
+    result = []
+    for chunk in shape_generator.chunks(rows, rows):
+        for j in range(len(next(iter(chunk.values())))):
+            symbols = choose.choice(sets)
+            result.append([
+                (symbol, math.degrees(chunk[symbol][j])
+                 if properties[symbol]['is_angle'] else chunk[symbol][j])
+                for symbol in symbols])
+
+    return result
+
+
+def generate_workload(requests, shape_weights, operation_weights=None,
+                      max_shapes=DEFAULT_MAX_SHAPES, seed=DEFAULT_SEED):
+    """
+    Vygeneruje posloupnost příkazů skriptu
+
+    Generátor sleduje, které útvary budou v danou chvíli existovat
+    a které hodnoty jim zbývá přiřadit, takže příkazy dávají smysl
+    (např. se neodstraňuje neexistující útvar). Hodnoty se útvaru
+    přiřazují postupně po nejvýše MAX_ASSIGNMENTS_PER_COMMAND veličinách;
+    po přiřazení všech hodnot se útvar vymaže a naplánují se hodnoty
+    jiného útvaru téhož typu.
+
+    :param requests: počet příkazů: int
+    :param shape_weights: váhy GEOMETRICKÝCH útvarů ve tvaru
+    {název útvaru: váha}: dict
+    :param operation_weights: váhy druhů příkazů (None znamená
+    DEFAULT_OPERATION_WEIGHTS): dict
+    :param max_shapes: nejvyšší počet současně existujících útvarů: int
+    :param seed: počáteční hodnota generátoru náhodných čísel: int
+    :return: dvojice (druh příkazu, příkaz): list
+    """
+    operation_weights = operation_weights or DEFAULT_OPERATION_WEIGHTS
+    choose = random.Random(seed)
+
+    rows = dict()
+    for i, geom_shape_name in enumerate(sorted(shape_weights)):
+        if geom_shape_name not in main.geometric_shapes:
+            raise ValueError(f'Neznámý geometrický útvar {geom_shape_name}.')
+        geom_shape = main.geometric_shapes[geom_shape_name]['instance'] \
+            if main.geometric_shapes[geom_shape_name]['is_instantiated'] \
+            else main.load_geometric_shape(geom_shape_name)
+        rows[geom_shape_name] = input_rows(geom_shape, ROWS_PER_SHAPE,
+                                           seed + i)
+
+    shape_names = sorted(shape_weights)
+    weights = [shape_weights[name] for name in shape_names]
+    operations = sorted(operation_weights)
+    op_weights = [operation_weights[operation] for operation in operations]
+
+    # existující útvary ve tvaru {jméno: [název útvaru, zbývající dvojice]}
+    live = dict()
+    counter = 0
+    workload = []
+
+    while len(workload) < requests:
+        operation = choose.choices(operations, op_weights)[0]
+        if not live or operation == 'create' and len(live) < max_shapes:
+            operation = 'create'
+        elif operation == 'create':
+            operation = 'delete'
+
+        if operation == 'create':
+            counter += 1
+            user_shape_name = f'tvar{counter}'
+            geom_shape_name = choose.choices(shape_names, weights)[0]
+            live[user_shape_name] = [
+                geom_shape_name, list(choose.choice(rows[geom_shape_name]))]
+            workload.append(
+                (operation, f'create {geom_shape_name} {user_shape_name}'))
+            continue
+
+        if operation == 'list':
+            workload.append((operation, 'list'))
+            continue
+
+        user_shape_name = choose.choice(list(live))
+        if operation == 'assign':
+            geom_shape_name, pending = live[user_shape_name]
+            if not pending:
+                pending.extend(choose.choice(rows[geom_shape_name]))
+                workload.append(('clear', f'clear {user_shape_name}'))
+                continue
+            count = choose.randint(1, MAX_ASSIGNMENTS_PER_COMMAND)
+            pairs = ' '.join(f'{symbol}={value!r}'
+                             for symbol, value in pending[:count])
+            del pending[:count]
+            workload.append((operation, f'{user_shape_name}: {pairs}'))
+        else:
+            if operation == 'delete':
+                del live[user_shape_name]
+            workload.append((operation, f'{operation} {user_shape_name}'))
+
+    return workload
+
+
+def resident_memory():
+    """
+    Zjistí aktuální velikost fyzické paměti procesu
+
+    V Linuxu se velikost čte ze souboru /proc/self/statm, jinde se použije
+    nejvyšší dosažená velikost podle modulu resource.
+
+    :return: velikost paměti v bajtech (None, pokud ji nelze zjistit): int
+    """
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    return peak_memory()
+
+
+def peak_memory():
+    """
+    Zjistí nejvyšší dosaženou velikost fyzické paměti procesu
+
+    :return: velikost paměti v bajtech (None, pokud ji nelze zjistit): int
+    """
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # v macOS je velikost v bajtech, jinde v kilobajtech
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def percentile(sorted_values, p):
+    """
+    Vrátí percentil seřazených hodnot (metodou nejbližšího pořadí)
+
+    :param sorted_values: vzestupně seřazené hodnoty: list
+    :param p: percentil v rozsahu 0 až 100: float
+    :return: hodnota percentilu (None pro prázdný seznam): float
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies):
+    """
+    Shrne doby odezvy do počtu, průměru, percentilů a maxima
+
+    :param latencies: doby odezvy v sekundách: list
+    :return: slovník se shrnutím v milisekundách: dict
+    """
+    ordered = sorted(latencies)
+    summary = {'count': len(ordered)}
+    if ordered:
+        summary['mean_ms'] = 1000 * sum(ordered) / len(ordered)
+        summary['max_ms'] = 1000 * ordered[-1]
+        for p in PERCENTILES:
+            summary[f'p{p}_ms'] = 1000 * percentile(ordered, p)
+
+    return summary
+
+
+def run_workload(workload, rate, execute=None,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL,
+                 clock=time.perf_counter, sleep=time.sleep):
+    """
+    Provede příkazy v pevném rozvrhu a změří doby jejich odezvy
+
+    Příkaz s pořadím i se odešle v okamžiku i / rate od začátku měření,
+    nebo ihned po provedení předchozího příkazu, pokud aplikace nestíhá.
+    Doba odezvy ('latency') se měří od plánovaného okamžiku odeslání,
+    doba zpracování ('service') od skutečného okamžiku odeslání.
+
+    :param workload: dvojice (druh příkazu, příkaz): list
+    :param rate: počet příkazů za sekundu (0 nebo None znamená odeslání
+    ihned po provedení předchozího příkazu): float
+    :param execute: funkce, která provede příkaz a vrátí řádek výstupu nebo
+    None v případě chyby (None znamená main.execute_script_command): function
+    :param sample_interval: délka intervalu v sekundách, po kterém se
+    zaznamená využití procesoru a paměti: float
+    :param clock: funkce vracející aktuální čas v sekundách: function
+    :param sleep: funkce pro čekání na čas odeslání: function
+    :return: slovník s výsledky měření bez konfigurace: dict
+    """
+    execute = execute or main.execute_script_command
+
+    latencies = dict()
+    services = dict()
+    errors = dict()
+    timeline = []
+
+    start = clock()
+    cpu_start = time.process_time()
+    sample_start, sample_cpu, sample_done = start, cpu_start, 0
+    next_sample = start + sample_interval
+
+    for i, (operation, command) in enumerate(workload):
+        scheduled = start + i / rate if rate else clock()
+        delay = scheduled - clock()
+        if delay > 0:
+            sleep(delay)
+
+        sent = clock()
+        response = execute(command)
+        finished = clock()
+
+        latencies.setdefault(operation, []).append(finished - scheduled)
+        services.setdefault(operation, []).append(finished - sent)
+        if response is None:
+            errors[operation] = errors.get(operation, 0) + 1
+
+        if finished >= next_sample or i == len(workload) - 1:
+            cpu = time.process_time()
+            elapsed = finished - sample_start
+            timeline.append({
+                'elapsed_s': finished - start,
+                'requests': i + 1 - sample_done,
+                'requests_per_second': (i + 1 - sample_done) / elapsed
+                if elapsed else 0.0,
+                'cpu_percent': 100 * (cpu - sample_cpu) / elapsed
+                if elapsed else 0.0,
+                'resident_bytes': resident_memory(),
+                'user_shapes': len(main.user_shapes),
+            })
+            sample_start, sample_cpu, sample_done = finished, cpu, i + 1
+            next_sample = finished + sample_interval
+
+    seconds = clock() - start
+    all_latencies = [latency for values in latencies.values()
+                     for latency in values]
+
+    return {
+        'totals': {
+            'requests': len(workload),
+            'errors': sum(errors.values()),
+            'seconds': seconds,
+            'requests_per_second': len(workload) / seconds
+            if seconds else 0.0,
+            'cpu_seconds': time.process_time() - cpu_start,
+            'peak_resident_bytes': peak_memory(),
+            'latency': latency_summary(all_latencies),
+        },
+        'operations': {
+            operation: {
+                'errors': errors.get(operation, 0),
+                'latency': latency_summary(latencies[operation]),
+                'service': latency_summary(services[operation]),
+            } for operation in sorted(latencies)},
+        'timeline': timeline,
+    }
+
+
+def load_test(rate, duration, shape_weights=None, operation_weights=None,
+              max_shapes=DEFAULT_MAX_SHAPES, seed=DEFAULT_SEED,
+              sample_interval=DEFAULT_SAMPLE_INTERVAL):
+    """
+    Připraví aplikaci, vygeneruje zátěž, provede ji a vrátí zprávu
+
+    :param rate: počet příkazů za sekundu (0 znamená odeslání ihned po
+    provedení předchozího příkazu): float
+    :param duration: doba měření v sekundách (pro rate 0 počet příkazů):
+    float
+    :param shape_weights: váhy GEOMETRICKÝCH útvarů ve tvaru
+    {název útvaru: váha} (None znamená všechny útvary katalogu se stejnou
+    vahou): dict
+    :param operation_weights: váhy druhů příkazů (None znamená
+    DEFAULT_OPERATION_WEIGHTS): dict
+    :param max_shapes: nejvyšší počet současně existujících útvarů: int
+    :param seed: počáteční hodnota generátoru náhodných čísel: int
+    :param sample_interval: délka intervalu v sekundách, po kterém se
+    zaznamená využití procesoru a paměti: float
+    :return: zpráva o měření: dict
+    """
+    if main.geometric_shapes.index is None:
+        main.initialize_script_mode()
+    shape_weights = shape_weights or {
+        geom_shape_name: 1
+        for geom_shape_name in main.geometric_shapes.index.names()}
+    operation_weights = operation_weights or DEFAULT_OPERATION_WEIGHTS
+    requests = int(rate * duration) if rate else int(duration)
+
+    workload = generate_workload(requests, shape_weights, operation_weights,
+                                 max_shapes, seed)
+    report = run_workload(workload, rate, sample_interval=sample_interval)
+    report['configuration'] = {
+        'rate': rate,
+        'duration': duration,
+        'shape_weights': shape_weights,
+        'operation_weights': operation_weights,
+        'max_shapes': max_shapes,
+        'seed': seed,
+    }
+    report['environment'] = {
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+    }
+
+    return report
+
+
+def compare_reports(old, new):
+    """
+    Porovná dvě zprávy o měření
+
+    :param old: starší zpráva: dict
+    :param new: novější zpráva: dict
+    :return: řádky s relativní změnou propustnosti a percentilů doby odezvy
+    jednotlivých druhů příkazů: list
+    """
+    def change(key, old_value, new_value):
+        if old_value is None or new_value is None:
+            return f'{key}: {old_value} -> {new_value}'
+        relative = f'{100 * (new_value / old_value - 1):+.1f} %' \
+            if old_value else 'n/a'
+        return f'{key}: {old_value:.3f} -> {new_value:.3f} ({relative})'
+
+    lines = [change('requests_per_second',
+                    old['totals']['requests_per_second'],
+                    new['totals']['requests_per_second'])]
+    sections = [('total', old['totals'], new['totals'])] \
+        + [(operation, old['operations'][operation],
+            new['operations'][operation])
+           for operation in sorted(old['operations'])
+           if operation in new['operations']]
+    for name, old_section, new_section in sections:
+        for key in ['mean_ms'] + [f'p{p}_ms' for p in PERCENTILES]:
+            lines.append(change(f'{name} {key}',
+                                old_section['latency'].get(key),
+                                new_section['latency'].get(key)))
+
+    return lines
+
+
+def parse_weights(args):
+    """
+    Rozdělí argumenty ve tvaru název=váha na váhy útvarů a druhů příkazů
+
+    :param args: argumenty příkazového řádku: list
+    :return: váhy útvarů a váhy druhů příkazů (None, pokud nebyly zadány):
+    tuple
+    """
+    shape_weights = dict()
+    operation_weights = dict()
+    for arg in args:
+        name, _, weight = arg.partition('=')
+        if name in DEFAULT_OPERATION_WEIGHTS:
+            operation_weights[name] = float(weight)
+        else:
+            shape_weights[name] = float(weight)
+
+    if operation_weights:
+        operation_weights = {**DEFAULT_OPERATION_WEIGHTS, **operation_weights}
+
+    return shape_weights or None, operation_weights or None
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--compare':
+        reports = []
+        for report_path in sys.argv[2:]:
+            with open(report_path, 'r', encoding='utf8') as report_file:
+                reports.append(json.load(report_file))
+        print('\n'.join(compare_reports(*reports)))
+    else:
+        weights_of_shapes, weights_of_operations = parse_weights(sys.argv[3:])
+        load_report = load_test(float(sys.argv[1]), float(sys.argv[2]),
+                                weights_of_shapes, weights_of_operations)
+        print(json.dumps(load_report, indent=2, sort_keys=True,
+                         ensure_ascii=False))
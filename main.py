@@ -11,7 +11,16 @@ který reprezentuje např. UŽIVATELSKÝ název útvaru nebo výraz,
 pomocí nějž se vybrané veličině přiřazuje hodnota.
 """
 
+import functools
 import math
+import sys
+import time
+import cache
+import catalog
+import catalog_index
+import links
+import memory
+import solver
 import textfiles
 from shape import GeometricShape, UserShape
 
@@ -22,13 +31,52 @@ VERSION = '1.0.0'
 # Zdroj ke stažení zdrojového kódu aplikace
 installation_resource = ''  # todo doplnit
 
+# Textový soubor s výčtem dostupných geometrických útvarů
+LIST_OF_SHAPES = 'list_of_shapes.txt'
+
 # Druhy geometrických útvarů dostupných na tomto zařízení dle
-# obsahu textového souboru 'list_of_shapes.txt'
-geometric_shapes = dict()
+# obsahu textového souboru 'list_of_shapes.txt'; položky se načítají z indexu
+# výčtu (viz modul catalog_index) až při prvním přístupu k nim
+geometric_shapes = catalog_index.LazyShapeDict()
+
+# Signatura textového souboru 'list_of_shapes.txt' při jeho posledním
+# načtení (viz textfiles.file_signature)
+list_of_shapes_signature = None
+
+# Balíček katalogu (viz catalog.build_bundle), ze kterého se načítají
+# GEOMETRICKÉ útvary, jejichž textové soubory se od sestavení balíčku
+# nezměnily; None, pokud balíček neexistuje
+catalog_bundle = None
+
+# Způsob naložení s existujícími UŽIVATELSKÝMI útvary, pokud se za běhu
+# programu změní textový soubor jejich GEOMETRICKÉHO útvaru:
+# - 'migrate' - útvary se převedou na novou definici GEOMETRICKÉHO útvaru
+#   a hodnoty přiřazené uživatelem se znovu přiřadí,
+# - 'pin' - útvary nadále používají původní definici GEOMETRICKÉHO útvaru
+#   a novou definici používají až nově vytvořené útvary.
+USER_SHAPE_RELOAD_POLICY = 'migrate'
+
+# Minimální počet sekund mezi dvěma kontrolami změn textových souborů
+# s geometrickými útvary
+CATALOG_POLL_INTERVAL = 1.0
+
+# Čas poslední kontroly změn textových souborů s geometrickými útvary
+last_catalog_poll = 0.0
 
 # Slovník s konkrétními geometrickými útvary vytvořenými uživatelem
 user_shapes = dict()
 
+# Vazby mezi veličinami různých UŽIVATELSKÝCH útvarů (viz modul links)
+shape_links = links.LinkedAssembly(user_shapes)
+
+# Zprávy o nesouladu hodnot zjištěném při šíření hodnot po vazbách při
+# posledním přiřazení hodnoty (viz assign_quantity_value)
+last_link_messages = []
+
+# mezipaměť výsledků přiřazení hodnot v neinteraktivním režimu (viz modul
+# cache); None znamená, že se mezipaměť nepoužívá
+result_cache = None
+
 # Poslední chybová zpráva pro jakoukoli část modulu
 last_error_message = {
     'error': False,
@@ -39,6 +87,20 @@ last_error_message = {
 # hodnoty veličin útvaru při jejich výpisu
 ROUND_DECIMALS = 4
 
+# Počet UŽIVATELSKÝCH útvarů zobrazených na jedné stránce jejich seznamu
+USER_SHAPES_PAGE_SIZE = 20
+
+# Počet GEOMETRICKÝCH útvarů zobrazených na jedné stránce jejich seznamu
+GEOMETRIC_SHAPES_PAGE_SIZE = 20
+
+# Počet řádků výstupu skriptu, po jejichž nashromáždění se výstup zapíše
+SCRIPT_OUTPUT_BUFFER = 4096
+
+# Zda se popisy veličin GEOMETRICKÝCH útvarů mají načítat z textových souborů
+# až při prvním přístupu k nim (viz QuantityProperties); v neinteraktivním
+# režimu se popisy nevypisují, a proto se zde nastaví na True
+LAZY_DESCRIPTIONS = False
+
 # Proměnná continue_app je kontrolována na začátku hlavní smyčky
 # aplikace. Pokud nabude hodnoty False, aplikace se ukončí.
 continue_app = True
@@ -86,29 +148,256 @@ def initialize_geometric_shapes():
     """
     Inicializuje slovník s dostupnými GEOMETRICKÝMI útvary
 
-    Funkce transformuje informace z textového souboru
-    list_of_shapes.txt do slovníku, aby aplikace věděla, se kterými
-    GEOMETRICKÝMI útvary může pracovat, a mohla vytvářet jejich
-    instance.
+    Funkce zpřístupní informace z textového souboru list_of_shapes.txt
+    prostřednictvím indexu výčtu ve slovníku geometric_shapes, aby
+    aplikace věděla, se kterými GEOMETRICKÝMI útvary může pracovat,
+    a mohla vytvářet jejich instance. Položky slovníku se z indexu načítají
+    až při prvním přístupu k nim (viz read_shape_index).
 
     :return: None
     """
-    lines = textfiles.load_text_file('list_of_shapes.txt')
+    global catalog_bundle
+    catalog_bundle = catalog.open_bundle()
 
-    clean_lines = textfiles.get_clean_lines(lines)
-    for clean_line in clean_lines:
-        shape = dict()
-        shape_name, full_name, path = [
-            item.strip() for item in clean_line.split('|')]
-        shape['full_name'] = full_name
-        shape['path'] = path
-        shape['is_instantiated'] = False
-        geometric_shapes[shape_name] = shape
+    global list_of_shapes_signature
+    if catalog_bundle is not None:
+        list_of_shapes_signature = catalog_bundle.is_current(LIST_OF_SHAPES)
+    if list_of_shapes_signature is None:
+        list_of_shapes_signature = textfiles.file_signature(LIST_OF_SHAPES)
+
+    geometric_shapes.index = read_shape_index()
 
     if check_empty_geometric_shapes():
         return
 
 
+def read_shape_index():
+    """
+    Načte index výčtu dostupných GEOMETRICKÝCH útvarů
+
+    Pokud se textový soubor list_of_shapes.txt od sestavení souboru
+    s indexem nezměnil, index se z tohoto souboru pouze namapuje do paměti,
+    takže doba načtení nezávisí na velikosti výčtu. Jinak se index sestaví
+    v paměti z textového souboru list_of_shapes.txt, nebo z balíčku
+    katalogu, pokud se soubor od sestavení balíčku nezměnil.
+
+    :return: index výčtu GEOMETRICKÝCH útvarů: catalog_index.CatalogIndex
+    """
+    shape_index = catalog_index.open_index()
+    if shape_index is not None:
+        if shape_index.is_current(LIST_OF_SHAPES) is not None:
+            return shape_index
+        shape_index.close()
+
+    if catalog_bundle is not None \
+            and catalog_bundle.is_current(LIST_OF_SHAPES) is not None:
+        list_of_shapes = catalog_bundle.list_of_shapes
+    else:
+        list_of_shapes = textfiles.shape_list_from_text_file(LIST_OF_SHAPES)
+
+    return catalog_index.CatalogIndex(
+        catalog_index.serialize_index(list_of_shapes))
+
+
+def load_geometric_shape(geom_shape_name):
+    """
+    Vytvoří instanci GEOMETRICKÉHO útvaru z jeho textového souboru
+
+    Funkce načte a zpracuje textový soubor GEOMETRICKÉHO útvaru, vytvoří
+    na jeho základě instanci třídy GeometricShape, kterou uloží do
+    globálního slovníku geometric_shapes, a vrátí ji. Spolu s instancí
+    uloží i signaturu textového souboru, aby bylo později možné zjistit,
+    zda se soubor mezitím nezměnil.
+
+    Instance se do slovníku geometric_shapes uloží jediným přiřazením až
+    poté, co je kompletně vytvořena, takže v případě znovunačtení změněného
+    souboru nikdy nedojde k použití napůl zpracované definice útvaru.
+
+    Pokud balíček katalogu obsahuje útvar, jehož textový soubor se od
+    sestavení balíčku nezměnil, instance se místo zpracování souboru
+    deserializuje z balíčku.
+
+    :param geom_shape_name: geometrický název útvaru bez diakritiky: str
+    :return: instance GEOMETRICKÉHO útvaru: GeometricShape
+    """
+    path = geometric_shapes[geom_shape_name]['path']
+
+    if catalog_bundle is not None and geom_shape_name in catalog_bundle:
+        signature = catalog_bundle.is_current(path + geom_shape_name + '.txt')
+        if signature is not None:
+            try:
+                geometric_shape_instance = catalog_bundle.get(geom_shape_name)
+            except ValueError:
+                pass
+            else:
+                geometric_shapes[geom_shape_name]['signature'] = signature
+                geometric_shapes[geom_shape_name]['instance'] \
+                    = geometric_shape_instance
+                geometric_shapes[geom_shape_name]['is_instantiated'] = True
+                return geometric_shape_instance
+
+    signature = textfiles.file_signature(path + geom_shape_name + '.txt')
+
+    # v neinteraktivním režimu se popisy veličin načítají až při prvním
+    # přístupu k nim (viz QuantityProperties)
+    description_index = None
+    if LAZY_DESCRIPTIONS:
+        description_index = textfiles.quantity_text_index(
+            path + geom_shape_name + '.txt')
+
+    # získání inicializačních informací GEOMETRICKÉHO útvaru
+    # z příslušného textového souboru
+    shape_init_data = textfiles.shape_init_list_from_text_file(
+        path, geom_shape_name)
+
+    # destrukturace (unpacking) inicializačních dat pro konstruktor
+    geom_full_name, quantities, formulas, conditions = shape_init_data
+
+    # vytvoření instance GEOMETRICKÉHO útvaru
+    geometric_shape_instance = GeometricShape(
+        geom_shape_name, geom_full_name, quantities, formulas, conditions,
+        description_index)
+
+    # označení instance daného GEOMETRICKÉHO útvaru jako vytvořené
+    # a uložení reference na ni do globálního slovníku geometric_shapes
+    geometric_shapes[geom_shape_name]['signature'] = signature
+    geometric_shapes[geom_shape_name]['instance'] = geometric_shape_instance
+    geometric_shapes[geom_shape_name]['is_instantiated'] = True
+
+    return geometric_shape_instance
+
+
+def reload_changed_geometric_shapes():
+    """
+    Znovu načte GEOMETRICKÉ útvary, jejichž textové soubory se změnily
+
+    Funkce se volá z hlavních smyček programu a v intervalu daném konstantou
+    CATALOG_POLL_INTERVAL kontroluje, zda se od posledního načtení nezměnil
+    textový soubor list_of_shapes.txt nebo textové soubory již
+    instanciovaných GEOMETRICKÝCH útvarů. Změna se zjišťuje podle času
+    poslední změny a velikosti souboru, a pokud se tyto liší, tak podle
+    hashe jeho obsahu. Znovu se zpracují pouze změněné soubory.
+
+    Existující UŽIVATELSKÉ útvary se na novou definici GEOMETRICKÉHO útvaru
+    převedou, nebo si ponechají původní definici, podle konstanty
+    USER_SHAPE_RELOAD_POLICY.
+
+    :return: None
+    """
+    global last_catalog_poll
+    now = time.monotonic()
+    if now - last_catalog_poll < CATALOG_POLL_INTERVAL:
+        return
+    last_catalog_poll = now
+
+    global list_of_shapes_signature
+    signature = textfiles.file_signature(LIST_OF_SHAPES,
+                                         list_of_shapes_signature)
+    if signature is not None and signature != list_of_shapes_signature:
+        changed = list_of_shapes_signature is None \
+            or signature[2] != list_of_shapes_signature[2]
+        list_of_shapes_signature = signature
+        if changed:
+            update_list_of_shapes()
+
+    for geom_shape_name, shape in list(geometric_shapes.items()):
+        if not shape['is_instantiated']:
+            continue
+
+        full_path = shape['path'] + geom_shape_name + '.txt'
+        signature = textfiles.file_signature(full_path, shape['signature'])
+        if signature is None or signature == shape['signature']:
+            continue
+
+        # pokud se změnil pouze čas poslední změny souboru, ale jeho obsah
+        # zůstal stejný, stačí uložit novou signaturu
+        if signature[2] == shape['signature'][2]:
+            shape['signature'] = signature
+            continue
+
+        old_instance = shape['instance']
+        try:
+            new_instance = load_geometric_shape(geom_shape_name)
+        except (ValueError, IndexError, KeyError, TypeError):
+            # soubor je pravděpodobně právě rozpracovaný - ponecháme
+            # původní definici a soubor zkusíme znovu zpracovat až po jeho
+            # další změně (signatura se uloží, aby se upozornění
+            # nevypisovalo při každé kontrole)
+            shape['signature'] = signature
+            fixed_width_output(f'UPOZORNĚNÍ: Změněný soubor {full_path} se '
+                               f'nepodařilo zpracovat, útvar '
+                               f'{geom_shape_name} používá původní '
+                               f'definici.')
+            continue
+
+        fixed_width_output(f'Geometrický útvar {geom_shape_name} byl znovu '
+                           f'načten ze změněného souboru {full_path}.')
+        if USER_SHAPE_RELOAD_POLICY == 'migrate':
+            migrate_user_shapes(old_instance, new_instance)
+        print()
+
+
+def update_list_of_shapes():
+    """
+    Promítne změny souboru list_of_shapes.txt do slovníku geometric_shapes
+
+    Index výčtu se nahradí novým indexem, takže nově uvedené GEOMETRICKÉ
+    útvary budou ve slovníku dostupné, a útvary, které v souboru již nejsou
+    uvedeny, se ze slovníku odstraní. Existující
+    UŽIVATELSKÉ útvary odstraněných GEOMETRICKÝCH útvarů zůstanou funkční,
+    protože obsahují odkaz na svoji instanci GEOMETRICKÉHO útvaru. Pokud se
+    u některého útvaru změnila cesta k jeho textovému souboru, útvar se
+    bude považovat za dosud neinstanciovaný.
+
+    :return: None
+    """
+    try:
+        shape_index = read_shape_index()
+    except (ValueError, TypeError):
+        fixed_width_output(f'UPOZORNĚNÍ: Změněný soubor {LIST_OF_SHAPES} se '
+                           f'nepodařilo zpracovat.')
+        return
+
+    old_index = geometric_shapes.index
+    geometric_shapes.index = shape_index
+    if old_index is not None:
+        old_index.close()
+
+    # ve slovníku jsou pouze dosud použité útvary, ostatní se načtou až
+    # z nového indexu
+    for geom_shape_name, current_shape in list(geometric_shapes.items()):
+        entry = shape_index.get(geom_shape_name)
+        if entry is None or current_shape['path'] != entry.path:
+            del geometric_shapes[geom_shape_name]
+        else:
+            current_shape['full_name'] = entry.full_name
+
+
+def migrate_user_shapes(old_instance, new_instance):
+    """
+    Převede UŽIVATELSKÉ útvary na novou instanci GEOMETRICKÉHO útvaru
+
+    Převedou se pouze ty UŽIVATELSKÉ útvary, které odkazují na původní
+    instanci GEOMETRICKÉHO útvaru. Uživatel je informován o hodnotách,
+    které se po převodu nepodařilo znovu přiřadit.
+
+    :param old_instance: původní instance GEOMETRICKÉHO útvaru:
+    GeometricShape
+    :param new_instance: nová instance GEOMETRICKÉHO útvaru: GeometricShape
+    :return: None
+    """
+    for user_shape_name, user_shape in user_shapes.items():
+        if user_shape.geom_shape_instance is not old_instance:
+            continue
+
+        dropped_symbols = user_shape.migrate_to_geometric_shape(new_instance)
+        if dropped_symbols:
+            fixed_width_output(f'Útvaru {user_shape_name} se po převodu na '
+                               f'novou definici nepodařilo znovu přiřadit '
+                               f'hodnoty veličin: '
+                               f'{", ".join(dropped_symbols)}.')
+
+
 def check_empty_geometric_shapes():
     """
     Zkontroluje, zda jsou k dispozici GEOMETRICKÉ útvary.
@@ -120,7 +409,7 @@ def check_empty_geometric_shapes():
     :return: zda má aplikace k dispozici textové soubory k vytváření útvarů:
     bool
     """
-    if geometric_shapes == {}:
+    if geometric_shapes.index is None or not len(geometric_shapes.index):
         fixed_width_output(f'Na vašem zařízení nejsou dostupné žádné '
                            f'geometrické útvary.\n\n'
                            f'Můžete zkusit program znovu stáhnout z '
@@ -140,8 +429,22 @@ def main():
     ze které se podle uživatelových voleb budou volat jiné funkce
     potřebné pro provádění příslušných akcí.
 
+    Pokud je program spuštěn s argumenty '--script {soubor}', nespustí
+    se textové uživatelské rozhraní, ale provedou se příkazy ze souboru
+    (viz run_script). Místo názvu souboru lze zadat '-', pak se příkazy
+    čtou ze standardního vstupu. Dalšími argumenty '--cache {soubor}' lze
+    zadat soubor s mezipamětí výsledků sdílenou procesy (viz modul cache).
+
     :return: None
     """
+    if len(sys.argv) == 3 and sys.argv[1] == '--script':
+        run_script_file(sys.argv[2])
+        return
+    if len(sys.argv) == 5 and sys.argv[1] == '--script' \
+            and sys.argv[3] == '--cache':
+        run_script_file(sys.argv[2], sys.argv[4])
+        return
+
     initialize_geometric_shapes()
     if check_empty_geometric_shapes():
         return
@@ -173,6 +476,7 @@ def main():
 
     # Hlavní smyčka textového rozhraní aplikace
     while continue_app:
+        reload_changed_geometric_shapes()
         action = key_command_menu(main_menu_options, 'Hlavní menu')
         if action == help_app:
             help_app('main')
@@ -339,6 +643,10 @@ def create_new_user_shape():
     nově vzniklého UŽIVATELSKÉHO útvaru uloží pouze reference na
     již existující instanci GEOMETRICKÉHO útvaru.
 
+    Dostupné GEOMETRICKÉ útvary se nabízejí po stránkách a uživatel je může
+    vyhledávat podle názvu nebo popisného názvu (viz
+    select_geometric_shape), takže se nikdy nevypisuje celý katalog.
+
     Díky tomuto přístupu mohou různé UŽIVATELSKÉ útvary stejného
     GEOMETRICKÉHO typu sdílet jedinou instanci třídy GeometricShape.
     Uživatel tak může mít např. vytvořený libovolný počet obdélníků
@@ -351,21 +659,8 @@ def create_new_user_shape():
 
     :return: None
     """
-    fixed_width_output('Seznam dostupných geometrických útvarů na vašem '
-                       'zařízení:\n')
-
-    for geom_shape, v in geometric_shapes.items():
-        print(f'{geom_shape} ({v["full_name"]})')
-    print()
-
     # výzva uživateli k výběru GEOMETRICKÉHO útvaru
-    user_option = secondary_menu(
-        'Napište název geometrického útvaru ze seznamu, který chcete '
-        'vytvořit.\nNapište pouze název ze začátku řádku, bez diakritiky '
-        'a popisu v závorce!',
-        geometric_shapes.keys(),
-        {'Z': 'Návrat zpět do hlavního menu', }
-    )
+    user_option = select_geometric_shape()
     if user_option == 'z':
         print()
         return
@@ -383,29 +678,111 @@ def create_new_user_shape():
     # UŽIVATELSKÝ název útvaru
     user_shape_name = user_option
 
+    create_user_shape(geom_shape_name, user_shape_name)
+
+    fixed_width_output(f'Geometrický útvar {geom_shape_name} s názvem '
+                       f'{user_shape_name} byl vytvořen.')
+    print()
+
+
+def select_geometric_shape():
+    """
+    Zobrazí stránkovaný seznam GEOMETRICKÝCH útvarů a vyzve k výběru
+
+    Seznam se zobrazuje po stránkách o GEOMETRIC_SHAPES_PAGE_SIZE útvarech.
+    Uživatel může mezi stránkami listovat a vyhledávat útvary podle části
+    názvu nebo popisného názvu, dokud nezadá název útvaru, který chce
+    vytvořit, nebo volbu pro návrat do hlavního menu. Zadaný název se
+    ověřuje v indexu výčtu, nikoli porovnáním se všemi názvy.
+
+    :return: geometrický název vybraného útvaru nebo 'z': str
+    """
+    page = 0
+    query = ''
+
+    while True:
+        pages = show_geometric_shapes(page, query)
+
+        assistive_options = dict()
+        if page + 1 < pages:
+            assistive_options['D'] = 'Další stránka'
+        if page > 0:
+            assistive_options['P'] = 'Předchozí stránka'
+        assistive_options['H'] = 'Hledat podle názvu'
+        assistive_options['Z'] = 'Návrat zpět do hlavního menu'
+
+        user_option = secondary_menu(
+            'Napište název geometrického útvaru ze seznamu, který chcete '
+            'vytvořit.\nNapište pouze název ze začátku řádku, bez '
+            'diakritiky a popisu v závorce!',
+            geometric_shapes,
+            assistive_options
+        )
+
+        if user_option == 'd':
+            page += 1
+        elif user_option == 'p':
+            page -= 1
+        elif user_option == 'h':
+            query = input('Napište část názvu geometrického útvaru '
+                          '(prázdný vstup hledání zruší): ').strip()
+            page = 0
+        else:
+            return user_option
+        print()
+
+
+def show_geometric_shapes(page=0, query=''):
+    """
+    Zobrazí stránku seznamu dostupných GEOMETRICKÝCH útvarů
+
+    Stránka se přečte z indexu výčtu (viz modul catalog_index), takže doba
+    výpisu nezávisí na velikosti katalogu.
+
+    :param page: pořadové číslo stránky počínaje nulou: int
+    :param query: pokud není prázdný, zobrazí se pouze útvary, jejichž
+    název nebo popisný název obsahuje tento text (bez ohledu na
+    diakritiku): str
+    :return: celkový počet stránek: int
+    """
+    entries, total = geometric_shapes.index.page(
+        query, page, GEOMETRIC_SHAPES_PAGE_SIZE)
+    pages = max(1, -(-total // GEOMETRIC_SHAPES_PAGE_SIZE))
+
+    lines = list(wrap_text('Seznam dostupných geometrických útvarů na vašem '
+                           'zařízení:'))
+    lines.append('')
+
+    for entry in entries:
+        lines.append(f'{entry.name} ({entry.full_name})')
+
+    lines.append('')
+    query_text = f', hledáno {query}' if query else ''
+    lines.append(f'Stránka {page + 1} / {pages} '
+                 f'(útvarů: {total}{query_text})')
+    lines.append('')
+
+    write_lines(lines)
+    return pages
+
+
+def create_user_shape(geom_shape_name, user_shape_name):
+    """
+    Vytvoří nový UŽIVATELSKÝ útvar a uloží ho do slovníku user_shapes
+
+    Funkce předpokládá, že GEOMETRICKÝ název útvaru i UŽIVATELSKÉ jméno
+    útvaru již byly zvalidovány.
+
+    :param geom_shape_name: geometrický název útvaru bez diakritiky: str
+    :param user_shape_name: UŽIVATELSKÉ jméno útvaru: str
+    :return: instance nového UŽIVATELSKÉHO útvaru: UserShape
+    """
+
     # Pokud uživatelem zvolený geometrický útvar není instanciovaný,
     # pak se tato instance vytvoří a reference na ni se uloží
     # do globálního slovníku geometric_shapes
     if not geometric_shapes[geom_shape_name]['is_instantiated']:
-        # získání inicializačních informací GEOMETRICKÉHO útvaru
-        # z příslušného textového souboru
-        path = geometric_shapes[geom_shape_name]['path']
-        filename = geom_shape_name
-        shape_init_data = textfiles.shape_init_list_from_text_file(
-            path, filename)
-
-        # destrukturace (unpacking) inicializačních dat pro konstruktor
-        geom_full_name, quantities, formulas, conditions = shape_init_data
-
-        # vytvoření instance GEOMETRICKÉHO útvaru
-        geometric_shape_instance = GeometricShape(
-            geom_shape_name, geom_full_name, quantities, formulas, conditions)
-
-        # označení instance daného GEOMETRICKÉHO útvaru jako vytvořené
-        # a uložení reference na ni do globálního slovníku geometric_shapes
-        geometric_shapes[geom_shape_name]['is_instantiated'] = True
-        geometric_shapes[geom_shape_name][
-            'instance'] = geometric_shape_instance
+        geometric_shape_instance = load_geometric_shape(geom_shape_name)
 
     # Pokud uživatelem zvolený geometrický útvar je instanciovaný,
     # pak jsou všechny jeho vlastnosti (značky a popisy veličin,
@@ -428,9 +805,7 @@ def create_new_user_shape():
     user_shape_instance = UserShape(user_shape_name, geometric_shape_instance)
     user_shapes[user_shape_name] = user_shape_instance
 
-    fixed_width_output(f'Geometrický útvar {geom_shape_name} s názvem '
-                       f'{user_shape_name} byl vytvořen.')
-    print()
+    return user_shape_instance
 
 
 def input_new_user_shape_name():
@@ -499,17 +874,7 @@ def my_shapes():
         print()
         return
 
-    show_user_shapes()
-
-    # funkci pro pomocné menu předáme jako druhý argument klíče slovníku
-    # user_shapes, které jsou tvořeny UŽIVATELSKÝMI názvy dosud
-    # vytvořených útvarů; tento argument představuje platné volby,
-    # které uživatel (kromě pomocných voleb) může v pomocném menu zadat
-    user_option = secondary_menu(
-        'Napište uživatelské jméno útvaru, se kterým chcete pracovat.',
-        user_shapes.keys(),
-        {'Z': 'Návrat zpět do hlavního menu'}
-    )
+    user_option = select_user_shape()
     print()
     if user_option == 'z':
         return
@@ -528,6 +893,8 @@ def my_shapes():
     while continue_user_shape_work:
         global detailed_last
 
+        reload_changed_geometric_shapes()
+
         # běžný výpis hodnot veličin; provedeme ho pouze v případě,
         # nebyl-li v předchozí iteraci použit podrobný výpis veličin
         # pomocí funkce detailed_quantity_overview
@@ -552,28 +919,116 @@ def my_shapes():
             action(user_shape)
 
 
-def show_user_shapes():
+def select_user_shape():
     """
-    Zobrazí seznam UŽIVATELSKÝCH útvarů
+    Zobrazí stránkovaný seznam UŽIVATELSKÝCH útvarů a vyzve k výběru
 
-    Funkce zobrazí úvodní popisek a vypíše seznam UŽIVATELSKÝCH útvarů
-    včetně stručných informací o počtu jejich známých veličin (zadaných
-    nebo vypočítaných) a celkovém počtu jejich veličin.
+    Seznam se zobrazuje po stránkách o USER_SHAPES_PAGE_SIZE útvarech.
+    Uživatel může mezi stránkami listovat, seznam filtrovat podle
+    GEOMETRICKÉHO typu útvaru a řadit podle podílu známých veličin, dokud
+    nezadá jméno útvaru, se kterým chce pracovat, nebo volbu pro návrat
+    do hlavního menu.
 
-    :return: None
+    :return: UŽIVATELSKÉ jméno vybraného útvaru nebo 'z': str
     """
-    fixed_width_output('Seznam vašich útvarů. Položky na každém řádku '
-                       'jsou vypsány v tomto formátu:\n'
-                       '{uživatelské jméno útvaru} ... {geometrický typ} ... '
-                       '{počet známých veličin} / {celkový počet veličin}')
-    print()
+    page = 0
+    geom_shape_name = ''
+    by_completeness = False
+
+    while True:
+        pages = show_user_shapes(page, geom_shape_name, by_completeness)
+
+        assistive_options = dict()
+        if page + 1 < pages:
+            assistive_options['D'] = 'Další stránka'
+        if page > 0:
+            assistive_options['P'] = 'Předchozí stránka'
+        assistive_options['F'] = 'Filtrovat podle geometrického typu'
+        if by_completeness:
+            assistive_options['R'] = 'Řadit podle jména'
+        else:
+            assistive_options['R'] = 'Řadit podle počtu známých veličin'
+        assistive_options['Z'] = 'Návrat zpět do hlavního menu'
+
+        # funkci pro pomocné menu předáme jako druhý argument klíče slovníku
+        # user_shapes, které jsou tvořeny UŽIVATELSKÝMI názvy dosud
+        # vytvořených útvarů; tento argument představuje platné volby,
+        # které uživatel (kromě pomocných voleb) může v pomocném menu zadat
+        user_option = secondary_menu(
+            'Napište uživatelské jméno útvaru, se kterým chcete pracovat.',
+            user_shapes.keys(),
+            assistive_options
+        )
 
-    for k, v in user_shapes.items():
-        print(f'{k} ... {v.geom_shape_name} ... '
-              f'{v.number_of_known_quantities} / '
-              f'{v.total_number_of_quantities}')
+        if user_option == 'd':
+            page += 1
+        elif user_option == 'p':
+            page -= 1
+        elif user_option == 'f':
+            geom_shape_name = input('Napište geometrický typ útvarů, které '
+                                    'chcete zobrazit (prázdný vstup filtr '
+                                    'zruší): ').strip()
+            page = 0
+        elif user_option == 'r':
+            by_completeness = not by_completeness
+            page = 0
+        else:
+            return user_option
+        print()
 
-    print()
+
+def show_user_shapes(page=0, geom_shape_name='', by_completeness=False):
+    """
+    Zobrazí stránku seznamu UŽIVATELSKÝCH útvarů
+
+    Funkce zobrazí úvodní popisek a vypíše jednu stránku seznamu
+    UŽIVATELSKÝCH útvarů včetně stručných informací o počtu jejich
+    známých veličin (zadaných nebo vypočítaných) a celkovém počtu jejich
+    veličin. Celý výpis se sestaví v paměti a vypíše najednou.
+
+    :param page: pořadové číslo stránky počínaje nulou: int
+    :param geom_shape_name: pokud není prázdný, zobrazí se pouze útvary
+    tohoto GEOMETRICKÉHO typu: str
+    :param by_completeness: zda se mají útvary řadit sestupně podle
+    podílu známých veličin (jinak se řadí podle UŽIVATELSKÉHO jména): bool
+    :return: celkový počet stránek: int
+    """
+    selected = [user_shape for user_shape in user_shapes.values()
+                if not geom_shape_name
+                or user_shape.geom_shape_name == geom_shape_name]
+
+    if by_completeness:
+        selected.sort(key=lambda user_shape: (
+            -user_shape.number_of_known_quantities
+            / user_shape.total_number_of_quantities,
+            user_shape.user_shape_name))
+    else:
+        selected.sort(key=lambda user_shape: user_shape.user_shape_name)
+
+    pages = max(1, -(-len(selected) // USER_SHAPES_PAGE_SIZE))
+    start = page * USER_SHAPES_PAGE_SIZE
+
+    lines = list(wrap_text('Seznam vašich útvarů. Položky na každém řádku '
+                           'jsou vypsány v tomto formátu:\n'
+                           '{uživatelské jméno útvaru} ... {geometrický typ} '
+                           '... {počet známých veličin} / {celkový počet '
+                           'veličin}'))
+    lines.append('')
+
+    for user_shape in selected[start:start + USER_SHAPES_PAGE_SIZE]:
+        lines.append(f'{user_shape.user_shape_name} ... '
+                     f'{user_shape.geom_shape_name} ... '
+                     f'{user_shape.number_of_known_quantities} / '
+                     f'{user_shape.total_number_of_quantities}')
+
+    lines.append('')
+    filter_text = f', typ {geom_shape_name}' if geom_shape_name else ''
+    lines.append(f'Stránka {page + 1} / {pages} '
+                 f'(útvarů: {len(selected)}{filter_text})')
+    lines.append('')
+
+    write_lines(lines)
+    return pages
 
 
 def user_shape_menu():
@@ -595,6 +1050,18 @@ def user_shape_menu():
             'description': 'Podrobný výpis veličin včetně jejich popisů',
             'action': detailed_quantity_overview,
         },
+        'S': {
+            'description': 'Sledování výpočtů (původ vypočítaných hodnot)',
+            'action': derivation_trace,
+        },
+        'K': {
+            'description': 'Krok zpět (vrátit poslední změnu hodnot)',
+            'action': undo_last_change,
+        },
+        'N': {
+            'description': 'Znovu provést vrácenou změnu hodnot',
+            'action': redo_last_change,
+        },
         'V': {
             'description': 'Vymazat hodnoty všech veličin',
             'action': delete_all_quantity_values,
@@ -637,23 +1104,24 @@ def print_quantity_values(user_shape):
 
     # oddělující čára
     line_length = max(len(user_shape_header), len(geom_shape_header))
-    print('-'*line_length)
+    lines = ['-'*line_length]
 
     # výpis hlavičky
-    fixed_width_output(user_shape_header)
-    fixed_width_output(geom_shape_header)
-    print()
-    fixed_width_output('Veličiny a jejich hodnoty:')
-    fixed_width_output('Formát výpisu: {značka veličiny} = {hodnota}')
-    fixed_width_output('(Tři tečky za rovnítkem znamenají, že hodnota veličiny '
-                       'je zatím neznámá.)')
-    print()
+    lines.extend(wrap_text(user_shape_header))
+    lines.extend(wrap_text(geom_shape_header))
+    lines.append('')
+    lines.extend(wrap_text('Veličiny a jejich hodnoty:'))
+    lines.extend(wrap_text('Formát výpisu: {značka veličiny} = {hodnota}'))
+    lines.extend(wrap_text('(Tři tečky za rovnítkem znamenají, že hodnota '
+                           'veličiny je zatím neznámá.)'))
+    lines.append('')
 
     # výpis značek veličin a odpovídajících hodnot
     for k, v in user_shape.quantity_values.items():
-        print_symbol_and_value(user_shape, k, v)
+        lines.append(format_symbol_and_value(user_shape, k, v))
 
-    print()
+    lines.append('')
+    write_lines(lines)
 
 
 def detailed_quantity_overview(user_shape):
@@ -667,24 +1135,27 @@ def detailed_quantity_overview(user_shape):
     útvaru: UserShape
     :return: None
     """
-    fixed_width_output('Podrobný výpis veličin útvaru včetně jejich popisů:')
-    print()
+    lines = list(wrap_text('Podrobný výpis veličin útvaru včetně jejich '
+                           'popisů:'))
+    lines.append('')
 
     for k, v in user_shape.quantity_values.items():
-        print_symbol_and_value(user_shape, k, v)
-        fixed_width_output(f'Stručný popis veličiny: '
-                           f'{user_shape.get_property(k, "short_name")}')
-        fixed_width_output(f'Podrobný popis veličiny: '
-                           f'{user_shape.get_property(k, "description")}')
-        print()
+        lines.append(format_symbol_and_value(user_shape, k, v))
+        lines.extend(wrap_text(f'Stručný popis veličiny: '
+                               f'{user_shape.get_property(k, "short_name")}'))
+        lines.extend(wrap_text(f'Podrobný popis veličiny: '
+                               f'{user_shape.get_property(k, "description")}'))
+        lines.append('')
 
-        # globální proměnnou detailed_last nastavíme na hodnotu True,
-        # aby program po návratu do hlavní smyčky pro práci s UŽIVATELSKÝMI
-        # útvary věděl, že právě byl uskutečněn tento podrobný výpis,
-        # a nedošlo k bezprostřednímu běžnému výpisu veličin a hodnot
-        # tohoto útvaru
-        global detailed_last
-        detailed_last = True
+    write_lines(lines)
+
+    # globální proměnnou detailed_last nastavíme na hodnotu True,
+    # aby program po návratu do hlavní smyčky pro práci s UŽIVATELSKÝMI
+    # útvary věděl, že právě byl uskutečněn tento podrobný výpis,
+    # a nedošlo k bezprostřednímu běžnému výpisu veličin a hodnot
+    # tohoto útvaru
+    global detailed_last
+    detailed_last = True
 
 
 def back_to_main_menu():
@@ -729,6 +1200,14 @@ def set_new_quantity_value(user_shape):
                            f'(přiřazené nebo vypočítané).')
         return
 
+    # před výzvou se vypíší povolené rozsahy hodnot neznámých veličin
+    lines = list(wrap_text('Povolené rozsahy hodnot neznámých veličin:'))
+    lines.extend(format_allowed_range(user_shape, k)
+                 for k, v in user_shape.quantity_values.items()
+                 if not v['has_value'])
+    lines.append('')
+    write_lines(lines)
+
     # výzva uživateli k zadání značky veličiny a hodnoty
     user_option = secondary_menu(
         'Napište výraz ve tvaru {značka veličiny} = {hodnota}',
@@ -754,13 +1233,45 @@ def set_new_quantity_value(user_shape):
         fixed_width_output(last_error_message['text'])
         return
 
+    # ověření a přiřazení hodnoty; pokud některé ověření selže, vypíše se
+    # informace o příčině selhání
+    if not assign_quantity_value(user_shape, symbol, value):
+        fixed_width_output(last_error_message['text'])
+        return
+
+    fixed_width_output('Hodnota byla úspěšně přiřazena.')
+    for message in last_link_messages:
+        fixed_width_output(f'UPOZORNĚNÍ: {message}')
+
+
+def assign_quantity_value(user_shape, symbol, value):
+    """
+    Ověří a přiřadí uživatelem zadanou hodnotu veličině útvaru
+
+    Funkce provede všechna nezbytná ověření, zda lze hodnotu příslušné
+    veličině přiřadit. Pokud některé z nich selže, nastaví chybovou zprávu
+    last_error_message a vrátí False. V opačném případě hodnotu přiřadí,
+    dopočítá hodnoty dalších veličin, rozšíří hodnoty po vazbách do
+    navázaných útvarů (zprávy o případném nesouladu uloží do
+    last_link_messages) a vrátí True.
+
+    :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
+    útvaru: UserShape
+    :param symbol: značka veličiny: str
+    :param value: přiřazovaná hodnota (úhly ve stupních): float
+    :return: zda se hodnotu podařilo přiřadit: bool
+    """
+    last_error_message['error'] = True
+
     # kontrola, zda aktuální UŽIVATELSKÝ útvar má definovánu veličinu
     # se značkou, kterou zadal
     if not user_shape.quantity_exists(symbol):
-        fixed_width_output(f'CHYBA: Váš útvar {user_shape.user_shape_name} '
-                           f'typu {user_shape.geom_shape_name} '
-                           f'nemá definovánu veličinu se značkou {symbol}.')
-        return
+        last_error_message['text'] = f'CHYBA: Váš útvar ' \
+                                     f'{user_shape.user_shape_name} typu ' \
+                                     f'{user_shape.geom_shape_name} nemá ' \
+                                     f'definovánu veličinu se značkou ' \
+                                     f'{symbol}.'
+        return False
 
     # přiřazování úhlů probíhá ve stupních, ale do příslušné datové
     # struktury s UŽIVATELSKÝM útvarem se ukládá v obloukové míře
@@ -772,27 +1283,33 @@ def set_new_quantity_value(user_shape):
 
     # kontrola, zda uživatelem zvolená veličina již nemá přiřazenu hodnotu
     if user_shape.quantity_has_value(symbol):
-        fixed_width_output(f'CHYBA: Veličina {symbol} již má přiřazenu hodnotu '
-                           f'{user_shape.quantity_values[symbol]["value"]}.')
-        return
+        current_value = user_shape.quantity_values[symbol]['value']
+        residual = solver.relative_residual(value, current_value)
+        last_error_message['text'] = f'CHYBA: Veličina {symbol} již má ' \
+                                     f'přiřazenu hodnotu {current_value}. ' \
+                                     f'Zadaná hodnota se od ní relativně ' \
+                                     f'liší o {residual:.3g}.'
+        return False
 
     # kontrola, zda uživatelem zadaná hodnota náleží do rozsahu hodnot,
     # kterých může nabývat v rámci obecných geometrických pravidel
     # i v rámci aktuálního kontextu (tj. vzhledem k hodnotám jiných
     # veličin)
     if not user_shape.value_meets_conditions(symbol, value):
-        fixed_width_output(f'CHYBA: {user_shape.last_condition_message}')
-        return
+        last_error_message['text'] \
+            = f'CHYBA: {user_shape.last_condition_message}'
+        return False
 
     # funkce dosud neprovedla návrat, což znamená, že všechna ověření
-    # uživatelova zadání prošla - přiřadíme tedy hodnotu dané veličině
-    # a informujeme o tom uživatele; při každém přiřazení se VŽDY
-    # automaticky provede pokus o výpočet hodnot dalších veličin
-    # UŽIVATELSKÉHO útvaru na základě množiny hodnot, která se právě
-    # rozšířila o hodnotu novou, jak napovídá název funkce
-    # assign_value_and_recalculate
+    # uživatelova zadání prošla - přiřadíme tedy hodnotu dané veličině;
+    # při každém přiřazení se VŽDY automaticky provede pokus o výpočet
+    # hodnot dalších veličin UŽIVATELSKÉHO útvaru na základě množiny
+    # hodnot, která se právě rozšířila o hodnotu novou, jak napovídá
+    # název funkce assign_value_and_recalculate
     user_shape.assign_value_and_recalculate(symbol, value)
-    fixed_width_output('Hodnota byla úspěšně přiřazena.')
+    last_link_messages[:] = shape_links.propagate(user_shape.user_shape_name)
+    last_error_message['error'] = False
+    return True
 
 
 def parse_command(user_command):
@@ -896,32 +1413,153 @@ def print_symbol_and_value(user_shape, k, v):
     :param v: hodnota veličiny UŽIVATELSKÉHO útvaru: float
     :return: None
     """
-    print(f'{k} = ', end='')
-    if v['has_value']:
-        if user_shape.get_property(k, 'is_angle'):
-            print(round(math.degrees(v['value']), ROUND_DECIMALS))
-        else:
-            print(round(v['value'], ROUND_DECIMALS))
-    else:
-        print('...')
+    print(format_symbol_and_value(user_shape, k, v))
+
+
+def format_symbol_and_value(user_shape, k, v):
+    """
+    Vrátí řádek se značkou veličiny a její hodnotou
+
+    Hodnota se zaokrouhlí na ROUND_DECIMALS desetinných míst, úhly se
+    převedou na stupně a neznámá hodnota se nahradí třemi tečkami.
+
+    :param user_shape: reference na instanci UŽIVATELSKÉHO útvaru:
+    UserShape
+    :param k: značka veličiny UŽIVATELSKÉHO útvaru: str
+    :param v: hodnota veličiny UŽIVATELSKÉHO útvaru: float
+    :return: řádek ve tvaru '{značka} = {hodnota}': str
+    """
+    if not v['has_value']:
+        return f'{k} = ...'
+    if user_shape.get_property(k, 'is_angle'):
+        return f'{k} = {round(math.degrees(v["value"]), ROUND_DECIMALS)}'
+    return f'{k} = {round(v["value"], ROUND_DECIMALS)}'
+
+
+def format_allowed_range(user_shape, k):
+    """
+    Vrátí řádek s povoleným rozsahem hodnot veličiny
+
+    Meze rozsahu úhlů se převedou na stupně (viz UserShape.allowed_range).
+
+    :param user_shape: reference na instanci UŽIVATELSKÉHO útvaru:
+    UserShape
+    :param k: značka veličiny UŽIVATELSKÉHO útvaru: str
+    :return: řádek ve tvaru '{značka}: {interval}': str
+    """
+    convert = math.degrees if user_shape.get_property(k, 'is_angle') \
+        else None
+    return f'{k}: {user_shape.allowed_range(k).format(convert)}'
 
 
 def delete_all_quantity_values(user_shape):
     """
     Vymaže hodnoty všech veličin UŽIVATELSKÉHO útvaru
 
+    Vymazání lze vrátit volbou 'Krok zpět'.
+
     :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
     útvaru: UserShape
     :return: None
     """
-    user_shape.delete_quantity_values()
+    user_shape.clear_quantity_values()
+
+
+def undo_last_change(user_shape):
+    """
+    Vrátí poslední změnu hodnot veličin UŽIVATELSKÉHO útvaru
+
+    Změnou se rozumí přiřazení hodnoty veličině včetně všech hodnot, které
+    se z ní dopočítaly, nebo vymazání hodnot všech veličin.
+
+    :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
+    útvaru: UserShape
+    :return: None
+    """
+    if not user_shape.undo():
+        fixed_width_output('Není co vrátit.')
+        print()
+
+
+def redo_last_change(user_shape):
+    """
+    Znovu provede poslední vrácenou změnu hodnot veličin UŽIVATELSKÉHO útvaru
+
+    :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
+    útvaru: UserShape
+    :return: None
+    """
+    if not user_shape.redo():
+        fixed_width_output('Není co znovu provést.')
+        print()
+
+
+def derivation_trace(user_shape):
+    """
+    Zobrazí záznamy o původu vypočítaných hodnot veličin útvaru
+
+    Pokud je sledování výpočtů u útvaru vypnuto, funkce nabídne jeho
+    zapnutí. V opačném případě vypíše záznamy o tom, jakým vzorcem,
+    z jakých hodnot a v kolikátém průchodu cyklem přepočtu byla každá
+    hodnota spočítána, a nabídne jejich export do souboru ve formátu JSON
+    nebo DOT (Graphviz), případně vypnutí sledování.
+
+    :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
+    útvaru: UserShape
+    :return: None
+    """
+    if user_shape.trace is None:
+        if confirm_option('Sledování výpočtů je vypnuto. Přejete si ho '
+                          'zapnout?'):
+            user_shape.enable_tracing()
+            fixed_width_output('Sledování výpočtů je zapnuto. Původ hodnot '
+                               'se bude zaznamenávat od příštího přiřazení '
+                               'hodnoty.')
+        print()
+        return
+
+    lines = list(wrap_text('Záznamy o původu hodnot veličin:'))
+    lines.append('')
+    for record_line in user_shape.trace.format_records() \
+            or ['(Zatím žádné záznamy.)']:
+        lines.extend(wrap_text(record_line))
+    lines.append('')
+    write_lines(lines)
+
+    user_option = secondary_menu(
+        'Zvolte, co si přejete se záznamy udělat.',
+        [],
+        {'J': 'Export ve formátu JSON', 'D': 'Export ve formátu DOT',
+         'V': 'Vypnout sledování', 'Z': 'Návrat zpět'}
+    )
+
+    if user_option == 'v':
+        user_shape.disable_tracing()
+    elif user_option in ('j', 'd'):
+        extension = 'json' if user_option == 'j' else 'dot'
+        path = input(f'Napište název souboru (prázdný vstup znamená '
+                     f'{user_shape.user_shape_name}.{extension}): ').strip() \
+            or f'{user_shape.user_shape_name}.{extension}'
+        if user_option == 'j':
+            content = user_shape.trace.to_json()
+        else:
+            content = user_shape.trace.to_dot(user_shape.user_shape_name)
+        try:
+            with open(path, 'w', encoding='utf8') as file:
+                file.write(content)
+        except OSError as error:
+            fixed_width_output(f'Soubor {path} nelze zapsat ({error}).')
+        else:
+            fixed_width_output(f'Záznamy byly uloženy do souboru {path}.')
+    print()
 
 
 def delete_user_shape(user_shape):
     """
     Smaže celý UŽIVATELSKÝ útvar
 
-    Funkce odstraní UŽIVATELSKÝ útvar z globálního slovníku user_shapes.
+    Funkce odstraní UŽIVATELSKÝ útvar z globálního slovníku user_shapes
+    spolu se všemi vazbami, které se ho týkají.
 
     :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
     útvaru: UserShape
@@ -929,6 +1567,7 @@ def delete_user_shape(user_shape):
     """
     deleted_user_shape_name = user_shape.user_shape_name
     deleted_geom_shape_name = user_shape.geom_shape_name
+    shape_links.remove_shape(deleted_user_shape_name)
     del user_shapes[user_shape.user_shape_name]
     fixed_width_output(f'Útvar s názvem {deleted_user_shape_name} typu '
                        f'{deleted_geom_shape_name} byl smazán.')
@@ -1000,30 +1639,59 @@ def fixed_width_output(text, columns=76):
     :param columns: maximální počet znaků v jednom řádku: int
     :return: None
     """
-    while len(text) > columns:
+    write_lines(wrap_text(text, columns))
 
-        # index poslední mezery v rozsahu délky řádku
-        space_index = text[:columns].rfind(' ')
+
+@functools.lru_cache(maxsize=1024)
+def wrap_text(text, columns=76):
+    """
+    Zalomí text na požadovanou šířku a vrátí jeho řádky
+
+    Text se zalamuje za poslední mezerou v rozsahu délky řádku nebo na
+    znaku konce řádku. Pokud v rozsahu délky řádku není žádná mezera,
+    zalomí se text natvrdo. Výsledky se uchovávají v mezipaměti, takže
+    opakovaně vypisované texty (nápověda, popisy veličin apod.) se
+    zalamují pouze jednou.
+
+    :param text: zalamovaný text: str
+    :param columns: maximální počet znaků v jednom řádku: int
+    :return: řádky zalomeného textu: tuple
+    """
+    lines = []
+    start = 0
+    while len(text) - start > columns:
+        end = start + columns
 
         # index prvního znaku konce řádku v rozsahu délky řádku
-        nl_index = text[:columns].find('\n')
+        nl_index = text.find('\n', start, end)
 
         if nl_index == -1:
-            # v rozsahu délky řádku není znak konce řádku - vypíše se
-            # část textu po poslední mezeru na konci tohoto rozsahu
-            # a vypsaná část textu se odřízne
-            print(text[:space_index + 1])
-            text = text[space_index + 1:]
+            # v rozsahu délky řádku není znak konce řádku - řádek končí
+            # poslední mezerou v tomto rozsahu (včetně ní)
+            space_index = text.rfind(' ', start, end)
+            if space_index == -1:
+                space_index = end - 1
+            lines.append(text[start:space_index + 1])
+            start = space_index + 1
         else:
-            # v rozsahu délky řádku je znak konce řádku, vypíše se tedy
-            # část textu, která končí těsně před ním, protože odřádkování
-            # zajistí samotné volání funkce print(), a vypsaná část textu
-            # se odřízne
-            print(text[:nl_index])
-            text = text[nl_index + 1:]
-    else:
-        # vypsání zbytku textu
-        print(text)
+            # v rozsahu délky řádku je znak konce řádku, řádek tedy končí
+            # těsně před ním
+            lines.append(text[start:nl_index])
+            start = nl_index + 1
+
+    # zbytek textu
+    lines.append(text[start:])
+    return tuple(lines)
+
+
+def write_lines(lines):
+    """
+    Vypíše řádky textu jediným zápisem do standardního výstupu
+
+    :param lines: řádky textu: iterable of strings
+    :return: None
+    """
+    sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def help_app(topic):
@@ -1154,5 +1822,365 @@ def help_app(topic):
     return
 
 
+def run_script_file(path, cache_path=None):
+    """
+    Provede příkazy ze souboru nebo ze standardního vstupu
+
+    :param path: cesta k souboru s příkazy nebo '-' pro standardní vstup:
+    str
+    :param cache_path: cesta k souboru s mezipamětí výsledků sdílenou
+    procesy (None znamená mezipaměť pouze v paměti procesu): str
+    :return: None
+    """
+    initialize_script_mode(cache_path)
+
+    if path == '-':
+        run_script(sys.stdin, sys.stdout)
+    else:
+        with open(path, 'r', encoding='utf8') as file:
+            run_script(file, sys.stdout)
+    result_cache.close()
+
+
+def initialize_script_mode(cache_path=None):
+    """
+    Připraví aplikaci na provádění příkazů skriptu
+
+    Funkce se volá před prvním voláním funkce execute_script_command (viz
+    run_script_file a modul loadgen).
+
+    :param cache_path: cesta k souboru s mezipamětí výsledků sdílenou
+    procesy (None znamená mezipaměť pouze v paměti procesu): str
+    :return: None
+    """
+    global LAZY_DESCRIPTIONS
+    LAZY_DESCRIPTIONS = True
+
+    global result_cache
+    result_cache = cache.ResultCache(path=cache_path)
+
+    global catalog_bundle
+    catalog_bundle = catalog.open_bundle()
+
+    geometric_shapes.index = read_shape_index()
+
+
+def run_script(lines, output):
+    """
+    Provede příkazy skriptu bez menu a interaktivních výzev
+
+    Každý řádek skriptu obsahuje jeden příkaz (prázdné řádky a komentáře
+    začínající znakem '#' se ignorují):
+    - 'create {geometrický název} {uživatelské jméno}' - vytvoří útvar,
+    - '{uživatelské jméno}: {značka} = {hodnota} ...' - přiřadí hodnoty
+      jedné nebo více veličinám útvaru (úhly ve stupních),
+    - 'dump {uživatelské jméno}' - vypíše hodnoty veličin útvaru,
+    - 'clear {uživatelské jméno}' - vymaže hodnoty všech veličin útvaru,
+    - 'undo {uživatelské jméno}' - vrátí poslední příkaz přiřazení nebo
+      vymazání hodnot útvaru,
+    - 'redo {uživatelské jméno}' - znovu provede vrácenou změnu,
+    - 'delete {uživatelské jméno}' - odstraní útvar,
+    - 'list' - vypíše jména všech útvarů,
+    - 'check {geometrický název} {značka} = {hodnota} ...' - ověří
+      vzájemný soulad zadaných hodnot veličin (viz
+      solver.check_consistency),
+    - 'cache' - vypíše počty vyhledání a vyřazení v mezipaměti výsledků
+      (viz modul cache),
+    - 'memory [{uživatelské jméno}]' - vypíše paměťovou náročnost
+      zadaného útvaru, nebo všech útvarů a katalogu v bajtech (viz modul
+      memory),
+    - 'link {jméno}.{značka} = {výraz}' - přidá vazbu mezi veličinami
+      útvarů (viz modul links),
+    - 'unlink {jméno}.{značka}' - odstraní vazbu s danou cílovou veličinou,
+    - 'links' - vypíše všechny vazby a zprávy o jejich případném nesouladu
+      s hodnotami veličin.
+
+    Na každý příkaz odpoví skript jedním řádkem výstupu, jehož položky jsou
+    odděleny tabulátorem. Prvním slovem řádku je 'OK' nebo 'CHYBA'; za
+    slovem 'CHYBA' následuje číslo řádku skriptu a popis chyby. Hodnoty
+    veličin se vypisují nezaokrouhlené, úhly ve stupních a neznámé hodnoty
+    jako '?'. Výstup se zapisuje po větších blocích (viz konstanta
+    SCRIPT_OUTPUT_BUFFER).
+
+    :param lines: řádky skriptu: iterable of strings
+    :param output: výstupní proud: file object
+    :return: None
+    """
+    buffer = []
+    for line_number, line in enumerate(lines, 1):
+        command = line.split('#', 1)[0].strip()
+        if not command:
+            continue
+
+        response = execute_script_command(command)
+        if response is None:
+            text = last_error_message['text'].removeprefix('CHYBA: ')
+            response = f'CHYBA\t{line_number}\t{text}'
+        buffer.append(response)
+
+        if len(buffer) >= SCRIPT_OUTPUT_BUFFER:
+            output.write('\n'.join(buffer) + '\n')
+            buffer.clear()
+
+    if buffer:
+        output.write('\n'.join(buffer) + '\n')
+    output.flush()
+
+
+def execute_script_command(command):
+    """
+    Provede jeden příkaz skriptu
+
+    :param command: příkaz bez komentáře a bílých znaků na okrajích: str
+    :return: řádek výstupu nebo None v případě chyby, jejíž popis je
+    uložen v last_error_message: str
+    """
+    last_error_message['error'] = True
+
+    if ':' in command:
+        user_shape_name, assignments = command.split(':', 1)
+        user_shape = get_script_user_shape(user_shape_name.strip())
+        if user_shape is None:
+            return None
+
+        parsed_command = parse_command(assignments)
+        pairs = []
+        for i in range(0, max(len(parsed_command), 1), 3):
+            pairs.append(get_assignment_pair(parsed_command[i:i + 3]))
+            if last_error_message['error']:
+                return None
+        if not assign_cached_quantity_values(user_shape, pairs):
+            return None
+        return '\t'.join(['OK'] + last_link_messages)
+
+    words = command.split()
+    if words[0] == 'create' and len(words) == 3:
+        geom_shape_name, user_shape_name = words[1:]
+        if geom_shape_name not in geometric_shapes:
+            last_error_message['text'] = f'Neznámý geometrický útvar ' \
+                                         f'{geom_shape_name}.'
+            return None
+        if user_shape_name in user_shapes:
+            last_error_message['text'] = f'Útvar {user_shape_name} už ' \
+                                         f'existuje.'
+            return None
+        if not validate_name(user_shape_name):
+            last_error_message['text'] = f'Neplatné jméno útvaru ' \
+                                         f'{user_shape_name}.'
+            return None
+        create_user_shape(geom_shape_name, user_shape_name)
+        return 'OK'
+
+    if words[0] == 'list' and len(words) == 1:
+        return '\t'.join(['OK'] + list(user_shapes))
+
+    if words[0] == 'cache' and len(words) == 1 and result_cache is not None:
+        return '\t'.join(['OK'] + [f'{k}={v}' for k, v
+                                   in result_cache.statistics().items()])
+
+    if words[0] == 'memory' and len(words) <= 2:
+        if len(words) == 1:
+            report = memory.session_report(user_shapes)
+            totals = memory.catalog_report(
+                {k: v['instance'] for k, v in geometric_shapes.items()
+                 if v['is_instantiated']})['totals']
+            report.update({f'catalog_{k}': v for k, v in totals.items()})
+        else:
+            user_shape = get_script_user_shape(words[1])
+            if user_shape is None:
+                return None
+            report = memory.user_shape_report(user_shape)
+        return '\t'.join(['OK'] + [f'{k}={v}' for k, v in report.items()])
+
+    if words[0] == 'check' and len(words) >= 2:
+        return check_script_values(words[1], command.split(None, 2)[2:])
+
+    if words[0] == 'ranges' and len(words) == 2:
+        user_shape = get_script_user_shape(words[1])
+        if user_shape is None:
+            return None
+        return '\t'.join(['OK'] + [
+            format_allowed_range(user_shape, k).replace(': ', '=', 1)
+            for k, v in user_shape.quantity_values.items()
+            if not v['has_value']])
+
+    if words[0] in ('dump', 'clear', 'delete', 'undo', 'redo') \
+            and len(words) == 2:
+        user_shape = get_script_user_shape(words[1])
+        if user_shape is None:
+            return None
+        if words[0] == 'dump':
+            items = [f'{k}={format_script_value(user_shape, k, v)}'
+                     for k, v in user_shape.quantity_values.items()]
+            return '\t'.join(['OK', user_shape.user_shape_name,
+                              user_shape.geom_shape_name] + items)
+        if words[0] == 'clear':
+            user_shape.clear_quantity_values()
+        elif words[0] in ('undo', 'redo'):
+            if not getattr(user_shape, words[0])():
+                last_error_message['text'] = 'Není co vrátit.' \
+                    if words[0] == 'undo' else 'Není co znovu provést.'
+                return None
+        else:
+            shape_links.remove_shape(user_shape.user_shape_name)
+            del user_shapes[user_shape.user_shape_name]
+        return 'OK'
+
+    if words[0] == 'link':
+        try:
+            messages = shape_links.add_link(command[len('link'):])
+        except ValueError as error:
+            last_error_message['text'] = str(error)
+            return None
+        return '\t'.join(['OK'] + messages)
+
+    if words[0] == 'unlink' and len(words) == 2 and '.' in words[1]:
+        if not shape_links.remove_link(*words[1].split('.', 1)):
+            last_error_message['text'] = f'Veličina {words[1]} není cílem ' \
+                                         f'žádné vazby.'
+            return None
+        return 'OK'
+
+    if words[0] == 'links' and len(words) == 1:
+        return '\t'.join(['OK'] + shape_links.format_links()
+                         + shape_links.check())
+
+    last_error_message['text'] = 'Neznámý příkaz.'
+    return None
+
+
+def assign_cached_quantity_values(user_shape, pairs):
+    """
+    Přiřadí hodnoty více veličinám útvaru s využitím mezipaměti výsledků
+
+    Pokud útvar dosud nemá žádné známé hodnoty a nesleduje se původ
+    hodnot, vyhledají se hodnoty všech veličin v mezipaměti result_cache
+    podle přiřazovaných hodnot a po nalezení se útvaru pouze obnoví (viz
+    UserShape.restore_values). Jinak se hodnoty postupně přiřadí funkcí
+    assign_quantity_value a výsledek se do mezipaměti uloží. Zprávy
+    o nesouladu vazeb se uloží do last_link_messages.
+
+    V obou případech tvoří přiřazení všech hodnot jediný krok historie
+    změn, takže ho lze vrátit jediným příkazem undo bez ohledu na to, zda
+    byl výsledek nalezen v mezipaměti.
+
+    :param user_shape: reference na instanci příslušného UŽIVATELSKÉHO
+    útvaru: UserShape
+    :param pairs: dvojice (značka veličiny, hodnota) v pořadí přiřazení
+    (úhly ve stupních): list
+    :return: zda se všechny hodnoty podařilo přiřadit: bool
+    """
+    inputs = dict()
+    for symbol, value in pairs:
+        if not user_shape.quantity_exists(symbol) or symbol in inputs:
+            inputs = None
+            break
+        inputs[symbol] = math.radians(value) \
+            if user_shape.get_property(symbol, 'is_angle') else value
+
+    geom_shape = user_shape.geom_shape_instance
+    use_cache = result_cache is not None and inputs is not None \
+        and user_shape.number_of_known_quantities == 0 \
+        and user_shape.trace is None
+    if use_cache:
+        values = result_cache.get_values(geom_shape, inputs)
+        if values is not None:
+            user_shape.restore_values(inputs, values)
+            last_link_messages[:] = shape_links.propagate(
+                user_shape.user_shape_name)
+            last_error_message['error'] = False
+            return True
+
+    messages = []
+    start = len(user_shape.value_log)
+    for symbol, value in pairs:
+        assigned = assign_quantity_value(user_shape, symbol, value)
+        user_shape.merge_undo_steps(start)
+        if not assigned:
+            return False
+        messages.extend(last_link_messages)
+    last_link_messages[:] = messages
+
+    if use_cache:
+        result_cache.put_values(geom_shape, inputs, {
+            k: v['value'] for k, v in user_shape.quantity_values.items()
+            if v['has_value']})
+    return True
+
+
+def check_script_values(geom_shape_name, assignments):
+    """
+    Ověří vzájemný soulad hodnot zadaných v příkazu skriptu 'check'
+
+    :param geom_shape_name: geometrický název útvaru: str
+    :param assignments: seznam s nejvýše jedním řetězcem s přiřazeními
+    hodnot veličinám (úhly ve stupních): list
+    :return: řádek výstupu s největší relativní odchylkou, informací, zda
+    je přípustná, a vzorcem s největší odchylkou, nebo None v případě
+    chyby: str
+    """
+    if geom_shape_name not in geometric_shapes:
+        last_error_message['text'] = f'Neznámý geometrický útvar ' \
+                                     f'{geom_shape_name}.'
+        return None
+    if not geometric_shapes[geom_shape_name]['is_instantiated']:
+        load_geometric_shape(geom_shape_name)
+    geom_shape = geometric_shapes[geom_shape_name]['instance']
+
+    parsed_command = parse_command(assignments[0] if assignments else '')
+    columns = dict()
+    for i in range(0, max(len(parsed_command), 1), 3):
+        symbol, value = get_assignment_pair(parsed_command[i:i + 3])
+        if last_error_message['error']:
+            return None
+        if symbol not in geom_shape.general_properties:
+            last_error_message['error'] = True
+            last_error_message['text'] = f'Útvar {geom_shape_name} nemá ' \
+                                         f'definovánu veličinu se značkou ' \
+                                         f'{symbol}.'
+            return None
+        if geom_shape.general_properties[symbol]['is_angle']:
+            value = math.radians(value)
+        columns[symbol] = [value]
+
+    residuals, consistent, formulas = solver.check_consistency(geom_shape,
+                                                               columns)
+    return '\t'.join(['OK', f'residual={residuals[0]!r}',
+                      f'consistent={consistent[0]}',
+                      f'formula={formulas[0] or ""}'])
+
+
+def get_script_user_shape(user_shape_name):
+    """
+    Vrátí UŽIVATELSKÝ útvar pro příkaz skriptu
+
+    :param user_shape_name: UŽIVATELSKÉ jméno útvaru: str
+    :return: instance UŽIVATELSKÉHO útvaru nebo None, pokud neexistuje:
+    UserShape
+    """
+    user_shape = user_shapes.get(user_shape_name)
+    if user_shape is None:
+        last_error_message['error'] = True
+        last_error_message['text'] = f'Útvar {user_shape_name} neexistuje.'
+    return user_shape
+
+
+def format_script_value(user_shape, k, v):
+    """
+    Vrátí hodnotu veličiny ve strojově čitelném tvaru pro výstup skriptu
+
+    :param user_shape: reference na instanci UŽIVATELSKÉHO útvaru:
+    UserShape
+    :param k: značka veličiny UŽIVATELSKÉHO útvaru: str
+    :param v: hodnota veličiny UŽIVATELSKÉHO útvaru: dict
+    :return: nezaokrouhlená hodnota (úhly ve stupních) nebo '?': str
+    """
+    if not v['has_value']:
+        return '?'
+    if user_shape.get_property(k, 'is_angle'):
+        return repr(math.degrees(v['value']))
+    return repr(v['value'])
+
+
 if __name__ == '__main__':
     main()
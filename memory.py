@@ -0,0 +1,313 @@
+"""
+Modul pro zjišťování paměťové náročnosti útvarů
+
+Modul určuje velikost datových struktur GEOMETRICKÝCH a UŽIVATELSKÝCH útvarů
+dvěma způsoby:
+- strukturálně, tzn. součtem velikostí (sys.getsizeof) všech objektů, které
+  jsou z dané struktury dosažitelné, přičemž každý objekt se započítá pouze
+  jednou,
+- měřením alokací pomocí modulu tracemalloc, tzn. rozdílem dvou snímků
+  paměti pořízených před provedením zvolené operace a po něm.
+
+Strukturální velikost GEOMETRICKÉHO útvaru se dále člení na popisy veličin,
+vzorce a podmínky konstruovatelnosti, takže je možné ověřit účinek změn
+v uložení těchto částí. Modul také zjišťuje, kolik paměti zabírají
+opakované kopie stejných řetězců a kolik by se jí ušetřilo jejich
+internováním (sys.intern).
+
+Modul lze spustit i samostatně příkazem:
+
+python memory.py
+
+který vypíše přehled paměťové náročnosti celého katalogu GEOMETRICKÝCH
+útvarů včetně alokací změřených při jeho načtení.
+"""
+
+import collections
+import sys
+import tracemalloc
+import types
+
+
+# Typy objektů, které se do strukturální velikosti nezapočítávají, protože
+# jsou sdíleny celým programem (funkce, třídy, moduly apod.)
+SHARED_TYPES = (type, types.ModuleType, types.FunctionType,
+                types.BuiltinFunctionType, types.MethodType,
+                types.CodeType)
+
+# Typy kontejnerů, jejichž prvky se do strukturální velikosti započítávají
+CONTAINER_TYPES = (list, tuple, set, frozenset, collections.deque)
+
+# Části slovníku general_properties jedné veličiny, na které se člení
+# velikost GEOMETRICKÉHO útvaru
+DESCRIPTION_KEYS = ('short_name', 'description')
+FORMULA_KEYS = ('countable_by',)
+CONDITION_KEYS = ('conditions',)
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Vrátí strukturální velikost objektu včetně všech dosažitelných objektů
+
+    Prochází se obsah slovníků, seznamů, n-tic a množin a atributy
+    instancí tříd. Objekty, jejichž identifikátory jsou v množině seen,
+    se nezapočítají, a započítané objekty se do této množiny přidají, takže
+    opakovanými voláními se stejnou množinou lze sdílené objekty počítat
+    pouze jednou.
+
+    :param obj: libovolný objekt
+    :param seen: identifikátory již započítaných objektů: set
+    :return: velikost v bajtech: int
+    """
+    if seen is None:
+        seen = set()
+
+    size = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SHARED_TYPES):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, (dict, types.MappingProxyType)):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, CONTAINER_TYPES):
+            stack.extend(current)
+        if hasattr(current, '__dict__'):
+            stack.append(vars(current))
+        for slot in getattr(type(current), '__slots__', ()):
+            if hasattr(current, slot):
+                stack.append(getattr(current, slot))
+
+    return size
+
+
+def geometric_shape_report(geom_shape):
+    """
+    Vrátí přehled paměťové náročnosti GEOMETRICKÉHO útvaru
+
+    Velikost slovníku general_properties se člení na popisy veličin,
+    vzorce a podmínky konstruovatelnosti; zbytek (značky veličin, příznaky
+    úhlů a samotné slovníky) tvoří položku 'other'. Položka 'analysis'
+    obsahuje výsledky statické analýzy vzorců včetně plánů výpočtu
+    a položka 'total' velikost celé instance.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :return: slovník s velikostmi v bajtech: dict
+    """
+    general_properties = geom_shape.general_properties
+    report = dict()
+
+    for part, keys in (('descriptions', DESCRIPTION_KEYS),
+                       ('formulas', FORMULA_KEYS),
+                       ('conditions', CONDITION_KEYS)):
+        # přítomnost položky se ověřuje operátorem in, aby se přehledem
+        # nenačetly líně načítané popisy veličin (viz QuantityProperties)
+        seen = set()
+        report[part] = sum(deep_sizeof(properties[key], seen)
+                           for properties in general_properties.values()
+                           for key in keys if key in properties)
+
+    report['general_properties'] = deep_sizeof(general_properties)
+    report['other'] = report['general_properties'] - report['descriptions'] \
+        - report['formulas'] - report['conditions']
+
+    seen = {id(general_properties)}
+    report['analysis'] = sum(deep_sizeof(getattr(geom_shape, name), seen)
+                             for name in ('underivable_quantities',
+                                          'unused_formulas',
+                                          '_minimal_determining_sets',
+                                          'evaluation_plans',
+                                          'inverse_ways'))
+    report['total'] = deep_sizeof(geom_shape)
+
+    return report
+
+
+def user_shape_report(user_shape):
+    """
+    Vrátí přehled paměťové náročnosti UŽIVATELSKÉHO útvaru
+
+    Do velikosti UŽIVATELSKÉHO útvaru se nezapočítává instance
+    GEOMETRICKÉHO útvaru, na kterou odkazuje, protože je sdílena všemi
+    útvary stejného typu.
+
+    :param user_shape: instance UŽIVATELSKÉHO útvaru: UserShape
+    :return: slovník s velikostmi v bajtech: dict
+    """
+    excluded = {id(user_shape.geom_shape_instance)}
+
+    return {
+        'quantity_values': deep_sizeof(user_shape.quantity_values,
+                                       set(excluded)),
+        'assigned_values': deep_sizeof(user_shape.assigned_values,
+                                       set(excluded)),
+        'trace': deep_sizeof(user_shape.trace, set(excluded))
+        if user_shape.trace is not None else 0,
+        'history': deep_sizeof([user_shape.undo_steps,
+                                user_shape.redo_steps], set(excluded)),
+        'total': deep_sizeof(user_shape, set(excluded)),
+    }
+
+
+def session_report(user_shapes):
+    """
+    Vrátí souhrnný přehled paměťové náročnosti všech UŽIVATELSKÝCH útvarů
+
+    Sdílené objekty (např. stejné řetězce nebo čísla v hodnotách veličin
+    různých útvarů) se v položce 'total' započítají pouze jednou.
+
+    :param user_shapes: slovník s instancemi UŽIVATELSKÝCH útvarů: dict
+    :return: slovník s velikostmi v bajtech a počtem útvarů: dict
+    """
+    seen = {id(user_shape.geom_shape_instance)
+            for user_shape in user_shapes.values()}
+    quantity_values = sum(
+        deep_sizeof(user_shape.quantity_values, set(seen))
+        for user_shape in user_shapes.values())
+
+    return {
+        'user_shapes': len(user_shapes),
+        'quantity_values': quantity_values,
+        'total': deep_sizeof(user_shapes, seen),
+    }
+
+
+def interning_report(geom_shapes):
+    """
+    Vrátí přehled opakovaných kopií stejných řetězců v katalogu
+
+    Funkce projde všechny řetězce dosažitelné z instancí GEOMETRICKÝCH
+    útvarů a zjistí, kolik paměti zabírají řetězce, které jsou pouze
+    další kopií jiného řetězce se stejným obsahem, tzn. kolik paměti by
+    se ušetřilo, kdyby byly všechny stejné řetězce internovány.
+
+    :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    :return: slovník s počty řetězců a velikostmi v bajtech: dict
+    """
+    strings = dict()
+    seen = set()
+    stack = list(geom_shapes.values())
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SHARED_TYPES):
+            continue
+        seen.add(id(current))
+
+        if isinstance(current, str):
+            strings.setdefault(current, set()).add(id(current))
+        elif isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, CONTAINER_TYPES):
+            stack.extend(current)
+        elif hasattr(current, '__dict__'):
+            stack.append(vars(current))
+
+    copies = sum(len(ids) for ids in strings.values())
+    duplicates = copies - len(strings)
+    savings = sum((len(ids) - 1) * sys.getsizeof(text)
+                  for text, ids in strings.items())
+
+    return {
+        'strings': copies,
+        'distinct_strings': len(strings),
+        'duplicate_strings': duplicates,
+        'interning_savings': savings,
+    }
+
+
+def catalog_report(geom_shapes):
+    """
+    Vrátí přehled paměťové náročnosti celého katalogu GEOMETRICKÝCH útvarů
+
+    :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů: dict
+    :return: slovník s přehledy jednotlivých útvarů (položka 'shapes'),
+    jejich součty (položka 'totals', jejíž položka 'deduplicated' obsahuje
+    velikost katalogu se sdílenými objekty započítanými pouze jednou)
+    a přehledem opakovaných řetězců (položka 'interning'): dict
+    """
+    shapes = {name: geometric_shape_report(geom_shape)
+              for name, geom_shape in geom_shapes.items()}
+
+    totals = dict()
+    for report in shapes.values():
+        for part, size in report.items():
+            totals[part] = totals.get(part, 0) + size
+    totals['deduplicated'] = deep_sizeof(geom_shapes)
+
+    return {
+        'shapes': shapes,
+        'totals': totals,
+        'interning': interning_report(geom_shapes),
+    }
+
+
+def measure_allocations(function, *args, top=5, **kwargs):
+    """
+    Změří paměť alokovanou během volání funkce pomocí modulu tracemalloc
+
+    Pokud sledování alokací dosud neběží, funkce je po dobu měření zapne
+    a poté opět vypne. Započítává se pouze paměť, která zůstala alokována
+    i po návratu z volané funkce.
+
+    :param function: volaná funkce
+    :param args: poziční argumenty volané funkce
+    :param top: počet řádků zdrojového kódu s největšími alokacemi, které
+    se vrátí: int
+    :param kwargs: pojmenované argumenty volané funkce
+    :return: návratová hodnota funkce, celková velikost alokací v bajtech
+    a seznam dvojic (řádek zdrojového kódu, velikost v bajtech): tuple
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+
+    try:
+        before = tracemalloc.take_snapshot()
+        result = function(*args, **kwargs)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    statistics = after.compare_to(before, 'lineno')
+    allocated = sum(statistic.size_diff for statistic in statistics)
+    largest = [(str(statistic.traceback), statistic.size_diff)
+               for statistic in statistics[:top]]
+
+    return result, allocated, largest
+
+
+def format_report(report, indent=''):
+    """
+    Vrátí přehled paměťové náročnosti ve formě řádků textu
+
+    :param report: přehled vrácený některou z funkcí modulu: dict
+    :param indent: odsazení řádků: str
+    :return: řádky textu: list
+    """
+    lines = []
+    for key, value in report.items():
+        if isinstance(value, dict):
+            lines.append(f'{indent}{key}:')
+            lines.extend(format_report(value, indent + '  '))
+        else:
+            lines.append(f'{indent}{key}: {value}')
+
+    return lines
+
+
+if __name__ == '__main__':
+    import catalog
+
+    loaded_shapes, allocated_bytes, largest_allocations \
+        = measure_allocations(catalog.load_catalog)
+
+    print('\n'.join(format_report(catalog_report(loaded_shapes))))
+    print(f'Alokace při načtení katalogu (tracemalloc): {allocated_bytes}')
+    for location, allocation in largest_allocations:
+        print(f'  {location}: {allocation}')
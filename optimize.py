@@ -0,0 +1,422 @@
+"""
+Modul pro hledání útvarů s nejmenší nebo největší hodnotou veličiny
+
+Modul odpovídá na otázky typu "rotační válec s největším objemem při
+daném povrchu" nebo "kvádr s nejmenším povrchem, jehož objem je alespoň
+1000, při daných mezích délek hran". Hledá se nad množinou zadaných
+veličin, která určuje hodnoty všech ostatních veličin útvaru:
+- veličiny s mezemi (parametr bounds) jsou proměnné, přes které se hledá,
+- veličiny s požadovanou hodnotou (parametr equal) se zadají pevně,
+- nerovnosti pro libovolné veličiny (parametry at_least a at_most) se
+  spolu s podmínkami konstruovatelnosti z oddílu CONDITIONS použijí jako
+  omezení; řádky, které je nesplňují, se nepoužijí.
+
+Hledá se zjemňováním mřížky: v mezích proměnných se vytvoří pravidelná
+mřížka bodů, která se spočítá najednou hromadným výpočtem (viz
+solver.solve_batch), a meze se poté zúží kolem nejlepšího přípustného
+bodu. Postup se opakuje, dokud šířka mezí neklesne pod zadanou relativní
+přesnost. Hledání najde globální extrém, pokud ho první mřížka zachytí
+alespoň přibližně (např. u funkcí s jediným extrémem v mezích).
+
+Extrém často leží na hranici některé nerovnosti (např. kvádr s nejmenším
+povrchem má objem právě 1000). Takový extrém zjemňování mřížky najde jen
+přibližně, protože každý bod mřížky, který by se k němu podél zakřivené
+hranice přiblížil, nerovnost poruší. Pokud nejlepší nalezený bod leží na
+hranici nerovnosti, zpřesní se proto gradientními kroky podél této
+hranice (viz _polish), přičemž se derivace veličin spočítají modulem
+dual.
+
+Úhly se zadávají i vracejí v obloukové míře (radiánech).
+
+Modul lze spustit i samostatně příkazem:
+
+python optimize.py {název útvaru} {min|max} {veličina} {omezení} ...
+
+kde omezení mají tvar {značka}={dolní mez}:{horní mez} (proměnná),
+{značka}={hodnota}, {značka}>={hodnota} nebo {značka}<={hodnota}, např.:
+
+python optimize.py valec max V S=100 r=0.1:10
+"""
+
+import collections
+import itertools
+import math
+import operator
+import sys
+import dual
+import solver
+
+
+# Výchozí nejvyšší počet bodů mřížky spočítaných v jednom kroku
+DEFAULT_GRID_POINTS = 4096
+
+# Výchozí nejvyšší počet kroků zjemňování mřížky
+DEFAULT_ITERATIONS = 50
+
+# Výchozí relativní přesnost, při které se zjemňování ukončí
+DEFAULT_TOLERANCE = 1e-10
+
+# Poměr, v jakém se v každém kroku zmenší šířka mezí proměnných
+REFINEMENT_FACTOR = 0.5
+
+# Relativní vzdálenost hodnoty veličiny od meze nerovnosti, při které se
+# nerovnost považuje za aktivní (viz _polish)
+ACTIVE_TOLERANCE = 1e-3
+
+# Nejvyšší počet gradientních kroků, počet zkoušených délek kroku a počet
+# kroků Newtonovy metody při zpřesňování bodu na hranici nerovností (viz
+# _polish)
+POLISH_STEPS = 200
+LINE_SEARCH_STEPS = 40
+NEWTON_STEPS = 3
+
+
+class OptimizationResult(collections.namedtuple(
+        'OptimizationResult', 'objective values inputs evaluations')):
+    """
+    Výsledek hledání
+
+    Položka objective obsahuje nalezenou hodnotu optimalizované veličiny,
+    položka values hodnoty všech veličin útvaru ve tvaru {značka: hodnota},
+    položka inputs hodnoty proměnných ve tvaru {značka: hodnota} a položka
+    evaluations počet spočítaných útvarů.
+    """
+
+    __slots__ = ()
+
+
+def _grid_axis(low, high, points):
+    """
+    Vrátí rovnoměrně rozložené body intervalu včetně jeho krajů
+
+    :param low: dolní mez: float
+    :param high: horní mez: float
+    :param points: počet bodů: int
+    :return: body intervalu: list
+    """
+    step = (high - low) / (points - 1)
+    return [low + step * k for k in range(points - 1)] + [high]
+
+
+def _check_symbols(geom_shape, objective, bounds, equal, at_least, at_most):
+    """
+    Ověří zadání hledání a vyvolá výjimku ValueError, pokud není platné
+
+    :return: None
+    """
+    symbols = {objective, *bounds, *equal, *at_least, *at_most}
+    unknown = symbols - geom_shape.general_properties.keys()
+    if unknown:
+        raise ValueError(f'Útvar {geom_shape.geom_shape_name} nemá veličiny '
+                         f'{", ".join(sorted(unknown))}.')
+
+    both = bounds.keys() & equal.keys()
+    if both:
+        raise ValueError(f'Veličiny {", ".join(sorted(both))} nemohou mít '
+                         f'zároveň meze i požadovanou hodnotu.')
+
+    for symbol, (low, high) in bounds.items():
+        if not low < high:
+            raise ValueError(f'Dolní mez veličiny {symbol} musí být menší '
+                             f'než horní mez.')
+
+    undetermined = geom_shape.undetermined_quantities(
+        bounds.keys() | equal.keys())
+    if undetermined:
+        raise ValueError(f'Veličiny s mezemi a s požadovanými hodnotami '
+                         f'neurčují hodnoty veličin '
+                         f'{", ".join(sorted(undetermined))}.')
+
+    # hromadný výpočet by hodnotu veličiny určené ostatními zadanými
+    # veličinami pouze přepsal, takže by požadovaná hodnota nebo meze
+    # nebyly dodrženy
+    inputs = bounds.keys() | equal.keys()
+    for symbol in sorted(inputs):
+        if symbol not in geom_shape.undetermined_quantities(
+                inputs - {symbol}):
+            raise ValueError(f'Hodnota veličiny {symbol} je určena ostatními '
+                             f'veličinami s mezemi a s požadovanými '
+                             f'hodnotami; pro omezení jejích hodnot použijte '
+                             f'nerovnosti.')
+
+
+def _refine_grid(geom_shape, objective, sign, bounds, equal, at_least,
+                 at_most, grid_points, iterations, tolerance):
+    """
+    Najde nejlepší přípustný útvar zjemňováním mřížky
+
+    :return: nejlepší nalezená dvojice (hodnota optimalizované veličiny
+    násobená znaménkem sign, hodnoty všech veličin ve tvaru {značka:
+    hodnota}) nebo None a počet spočítaných útvarů: tuple
+    """
+    variables = sorted(bounds)
+    points = max(3, int(grid_points ** (1 / max(1, len(variables)))))
+    box = {symbol: tuple(bounds[symbol]) for symbol in variables}
+
+    best = None
+    evaluations = 0
+    for _ in range(iterations):
+        axes = [_grid_axis(*box[symbol], points) for symbol in variables]
+        grid = list(zip(*itertools.product(*axes)))
+        rows = len(grid[0]) if grid else 1
+        columns = {symbol: list(column)
+                   for symbol, column in zip(variables, grid)}
+        columns.update({symbol: [value] * rows
+                        for symbol, value in equal.items()})
+
+        values, valid = solver.solve_batch(geom_shape, columns)
+        evaluations += rows
+
+        # nejlepší přípustný řádek mřížky
+        best_index = None
+        best_score = best[0] if best is not None else math.inf
+        for i in range(rows):
+            score = values[objective][i] * sign
+            if not valid[i] or not score < best_score:
+                continue
+            if any(not values[symbol][i] >= limit
+                   for symbol, limit in at_least.items()) \
+                    or any(not values[symbol][i] <= limit
+                           for symbol, limit in at_most.items()):
+                continue
+            best_index, best_score = i, score
+        if best_index is not None:
+            best = best_score, {symbol: column[best_index]
+                                for symbol, column in values.items()}
+
+        if best is None or not variables:
+            break
+
+        # zúžení mezí kolem nejlepšího bodu
+        converged = True
+        for symbol in variables:
+            low, high = box[symbol]
+            center = best[1][symbol]
+            span = REFINEMENT_FACTOR * (high - low) / 2
+            box[symbol] = (max(bounds[symbol][0], center - span),
+                           min(bounds[symbol][1], center + span))
+            if box[symbol][1] - box[symbol][0] > tolerance * abs(center):
+                converged = False
+        if converged:
+            break
+
+    return best, evaluations
+
+
+def _dot(u, v):
+    """
+    Vrátí skalární součin dvou vektorů
+
+    :param u: první vektor: list
+    :param v: druhý vektor: list
+    :return: skalární součin: float
+    """
+    return sum(map(operator.mul, u, v))
+
+
+def _polish(geom_shape, objective, sign, best, bounds, equal, at_least,
+            at_most):
+    """
+    Zpřesní nejlepší bod ležící na hranici nerovností gradientními kroky
+
+    V každém kroku se spočítají derivace veličin podle proměnných (viz
+    dual.solve_batch_jacobian). Bod se posune proti gradientu
+    optimalizované veličiny promítnutému do tečného prostoru hranic
+    aktivních nerovností, a to najednou pro řadu délek kroku, a posunuté
+    body se Newtonovou metodou vrátí na hranice nerovností. Použije se
+    nejlepší z přípustných posunutých bodů.
+
+    :return: nejlepší nalezená dvojice (viz _refine_grid) a počet
+    spočítaných útvarů: tuple
+    """
+    variables = sorted(bounds)
+    evaluations = 0
+    limits = [(symbol, limit, 1.0) for symbol, limit in at_least.items()] \
+        + [(symbol, limit, -1.0) for symbol, limit in at_most.items()]
+
+    def columns_of(points):
+        columns = {symbol: [point[k] for point in points]
+                   for k, symbol in enumerate(variables)}
+        columns.update({symbol: [value] * len(points)
+                        for symbol, value in equal.items()})
+        return columns
+
+    for _ in range(POLISH_STEPS):
+        point = [best[1][symbol] for symbol in variables]
+        values, jacobian, _ = dual.solve_batch_jacobian(geom_shape,
+                                                        columns_of([point]))
+        evaluations += 1
+        active = [(symbol, limit, direction)
+                  for symbol, limit, direction in limits
+                  if abs(values[symbol][0] - limit)
+                  <= ACTIVE_TOLERANCE * abs(limit)]
+        if not active:
+            break
+
+        # ortonormální báze gradientů aktivních nerovností (Gramova-
+        # Schmidtova ortogonalizace) a dolní trojúhelníková matice
+        # lower, pro kterou platí gradienty = lower * báze
+        basis = []
+        lower = []
+        for symbol, _, _ in active:
+            gradient = [jacobian[symbol][v][0] for v in variables]
+            row = [_dot(gradient, q) for q in basis]
+            for coefficient, q in zip(row, basis):
+                gradient = [g - coefficient * e for g, e in zip(gradient, q)]
+            norm = math.sqrt(_dot(gradient, gradient))
+            if not norm > 0.0:
+                break
+            basis.append([g / norm for g in gradient])
+            lower.append(row + [norm])
+        if len(basis) < len(active) or len(basis) >= len(variables):
+            break
+
+        # směr kroku v tečném prostoru hranic
+        slope = [sign * jacobian[objective][v][0] for v in variables]
+        for q in basis:
+            coefficient = _dot(slope, q)
+            slope = [s - coefficient * e for s, e in zip(slope, q)]
+        length = math.sqrt(_dot(slope, slope))
+        if not length > 0.0:
+            break
+        scale = math.sqrt(_dot(point, point)) / length
+        points = [[x - scale * 2.0 ** -k * s for x, s in zip(point, slope)]
+                  for k in range(1, LINE_SEARCH_STEPS + 1)]
+
+        # návrat na hranice nerovností; cílová hodnota leží nepatrně uvnitř
+        # přípustné oblasti, aby zaokrouhlovací chyby nevedly k jejímu
+        # opuštění
+        targets = [limit + direction * abs(limit) * ACTIVE_TOLERANCE ** 4
+                   for _, limit, direction in active]
+        for _ in range(NEWTON_STEPS):
+            values, valid = solver.solve_batch(geom_shape,
+                                               columns_of(points))
+            evaluations += len(points)
+            for i, candidate in enumerate(points):
+                residuals = [values[symbol][i] - target
+                             for (symbol, _, _), target
+                             in zip(active, targets)]
+                coordinates = []
+                for j, row in enumerate(lower):
+                    coordinates.append((-residuals[j] - _dot(
+                        row[:j], coordinates)) / row[j])
+                points[i] = [x + _dot(coordinates, [q[k] for q in basis])
+                             for k, x in enumerate(candidate)]
+
+        values, valid = solver.solve_batch(geom_shape, columns_of(points))
+        evaluations += len(points)
+        improved = False
+        for i, candidate in enumerate(points):
+            score = values[objective][i] * sign
+            if not valid[i] or not score < best[0] \
+                    or any(not low <= x <= high for x, (low, high)
+                           in zip(candidate, map(bounds.get, variables))) \
+                    or any(not values[symbol][i] >= limit
+                           for symbol, limit in at_least.items()) \
+                    or any(not values[symbol][i] <= limit
+                           for symbol, limit in at_most.items()):
+                continue
+            best = score, {symbol: column[i]
+                           for symbol, column in values.items()}
+            improved = True
+        if not improved:
+            break
+
+    return best, evaluations
+
+
+def optimize(geom_shape, objective, bounds, maximize=False, equal=None,
+             at_least=None, at_most=None, grid_points=DEFAULT_GRID_POINTS,
+             iterations=DEFAULT_ITERATIONS, tolerance=DEFAULT_TOLERANCE):
+    """
+    Najde útvar s nejmenší nebo největší hodnotou veličiny
+
+    Veličiny s mezemi a veličiny s požadovanými hodnotami musí dohromady
+    určovat hodnoty všech ostatních veličin útvaru a žádná z nich nesmí
+    být určena ostatními, jinak funkce vyvolá výjimku ValueError.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param objective: značka optimalizované veličiny: str
+    :param bounds: meze proměnných ve tvaru {značka: (dolní mez, horní
+    mez)}: dict
+    :param maximize: zda se hledá největší (jinak nejmenší) hodnota: bool
+    :param equal: požadované hodnoty veličin ve tvaru {značka: hodnota}:
+    dict
+    :param at_least: nejmenší přípustné hodnoty veličin ve tvaru {značka:
+    hodnota}: dict
+    :param at_most: největší přípustné hodnoty veličin ve tvaru {značka:
+    hodnota}: dict
+    :param grid_points: nejvyšší počet bodů mřížky v jednom kroku: int
+    :param iterations: nejvyšší počet kroků zjemňování mřížky: int
+    :param tolerance: relativní šířka mezí, při které se zjemňování
+    ukončí: float
+    :return: výsledek hledání nebo None, pokud se nenašel žádný přípustný
+    útvar: OptimizationResult
+    """
+    bounds = {symbol: tuple(limits) for symbol, limits in bounds.items()}
+    equal = dict(equal or {})
+    at_least = dict(at_least or {})
+    at_most = dict(at_most or {})
+    _check_symbols(geom_shape, objective, bounds, equal, at_least, at_most)
+
+    sign = -1.0 if maximize else 1.0
+    best, evaluations = _refine_grid(geom_shape, objective, sign, bounds,
+                                     equal, at_least, at_most, grid_points,
+                                     iterations, tolerance)
+    if best is None:
+        return None
+
+    best, count = _polish(geom_shape, objective, sign, best, bounds, equal,
+                          at_least, at_most)
+    evaluations += count
+
+    values = best[1]
+    return OptimizationResult(values[objective], values,
+                              {symbol: values[symbol] for symbol in bounds},
+                              evaluations)
+
+
+def parse_constraints(arguments):
+    """
+    Převede omezení zadaná na příkazovém řádku na parametry funkce optimize
+
+    :param arguments: omezení ve tvaru {značka}={dolní mez}:{horní mez},
+    {značka}={hodnota}, {značka}>={hodnota} nebo {značka}<={hodnota}: list
+    :return: slovníky bounds, equal, at_least a at_most: tuple
+    """
+    bounds, equal, at_least, at_most = dict(), dict(), dict(), dict()
+    for argument in arguments:
+        if '>=' in argument:
+            symbol, value = argument.split('>=')
+            at_least[symbol] = float(value)
+        elif '<=' in argument:
+            symbol, value = argument.split('<=')
+            at_most[symbol] = float(value)
+        else:
+            symbol, value = argument.split('=')
+            if ':' in value:
+                low, high = value.split(':')
+                bounds[symbol] = (float(low), float(high))
+            else:
+                equal[symbol] = float(value)
+
+    return bounds, equal, at_least, at_most
+
+
+if __name__ == '__main__':
+    import catalog
+
+    shapes = catalog.load_catalog()
+    given_bounds, given_equal, given_at_least, given_at_most \
+        = parse_constraints(sys.argv[4:])
+    optimum = optimize(shapes[sys.argv[1]], sys.argv[3], given_bounds,
+                       sys.argv[2] == 'max', given_equal, given_at_least,
+                       given_at_most)
+    if optimum is None:
+        print('Žádný přípustný útvar nebyl nalezen.')
+        sys.exit(1)
+
+    print(f'{sys.argv[3]} = {optimum.objective:.10g} '
+          f'({optimum.evaluations} spočítaných útvarů)')
+    for optimum_symbol, optimum_value in optimum.values.items():
+        print(f'{optimum_symbol}\t{optimum_value:.10g}')
@@ -0,0 +1,311 @@
+"""
+Modul pro hromadný výpočet proudu řádků různých útvarů
+
+Hromadný výpočet (viz solver.solve_batch) se vyplatí pouze nad bloky
+řádků téhož GEOMETRICKÉHO útvaru se stejnými zadanými veličinami, které se
+spočítají podle jediného plánu výpočtu. Skutečný proud vstupních dat však
+střídá řádky různých útvarů (např. kvadr, valec, krychle, obdelnik)
+s různými zadanými veličinami.
+
+Třída BatchRouter proto řádky průběžně rozděluje do přihrádek podle
+dvojice (název útvaru, množina zadaných veličin). Přihrádka se spočítá
+najednou, když:
+- dosáhne počtu řádků block_rows,
+- její nejstarší řádek čeká déle než max_delay sekund,
+- počet rozpracovaných řádků (čekajících na výpočet nebo na výpis
+  předchozích řádků) dosáhne max_buffered_rows; spočítá se přihrádka
+  s nejstarším dosud nespočítaným řádkem, takže lze vypsat alespoň jeden
+  řádek.
+
+Výsledky se vracejí ve stejném pořadí, v jakém řádky přišly, takže počet
+rozpracovaných řádků je vždy omezen hodnotou max_buffered_rows.
+
+Modul lze spustit i samostatně příkazem:
+
+python router.py < vstup.txt
+
+který čte ze standardního vstupu řádky ve tvaru
+{název útvaru} {značka}={hodnota} ... (úhly v radiánech) a vypisuje
+hodnoty všech veličin spočítaných útvarů ve stejném pořadí.
+"""
+
+import collections
+import math
+import sys
+import time
+import solver
+
+
+# Výchozí počet řádků přihrádky, při kterém se přihrádka spočítá
+DEFAULT_BLOCK_ROWS = 4096
+
+# Výchozí nejvyšší počet rozpracovaných řádků
+DEFAULT_MAX_BUFFERED_ROWS = 65536
+
+# Výchozí nejdelší doba v sekundách, po kterou řádek čeká na výpočet
+DEFAULT_MAX_DELAY = 0.05
+
+
+class RoutedResult(collections.namedtuple(
+        'RoutedResult', 'geom_shape_name values valid error')):
+    """
+    Výsledek výpočtu jednoho řádku
+
+    Položka values obsahuje hodnoty všech veličin útvaru ve tvaru
+    {značka: hodnota} (neznámé hodnoty jsou NaN), položka valid informaci,
+    zda řádek splňuje podmínky konstruovatelnosti, a položka error popis
+    chyby, pokud řádek nebylo možné spočítat vůbec (jinak None).
+    """
+
+    __slots__ = ()
+
+
+class BatchRouter:
+    """
+    Třída rozdělující proud řádků různých útvarů do bloků pro hromadný
+    výpočet
+    """
+
+    def __init__(self, geom_shapes, block_rows=DEFAULT_BLOCK_ROWS,
+                 max_buffered_rows=DEFAULT_MAX_BUFFERED_ROWS,
+                 max_delay=DEFAULT_MAX_DELAY, solve=solver.solve_batch,
+                 clock=time.monotonic):
+        """
+        Konstruktor směrovače
+
+        :param geom_shapes: slovník s instancemi GEOMETRICKÝCH útvarů
+        (např. z funkce catalog.load_catalog): dict
+        :param block_rows: počet řádků přihrádky, při kterém se přihrádka
+        spočítá: int
+        :param max_buffered_rows: nejvyšší počet rozpracovaných řádků: int
+        :param max_delay: nejdelší doba v sekundách, po kterou řádek čeká
+        na výpočet (None znamená bez omezení): float
+        :param solve: funkce pro hromadný výpočet bloku se stejným
+        rozhraním jako solver.solve_batch (např. metoda solve_batch
+        mezipaměti cache.ResultCache): function
+        :param clock: funkce vracející aktuální čas v sekundách: function
+        """
+        self.geom_shapes = geom_shapes
+        self.block_rows = block_rows
+        self.max_buffered_rows = max(1, max_buffered_rows)
+        self.max_delay = max_delay
+        self.solve = solve
+        self.clock = clock
+
+        # přihrádky ve tvaru {(název útvaru, značky): přihrádka}, kde
+        # přihrádka je slovník s pořadími řádků ('indices'), sloupci hodnot
+        # zadaných veličin ('columns') a časem příchodu nejstaršího řádku
+        # ('created'); přihrádky jsou seřazeny podle svého vzniku
+        self.buckets = dict()
+        # přihrádky podle pořadí řádků, které obsahují
+        self.row_buckets = dict()
+
+        # spočítané řádky, které čekají na výpis předchozích řádků
+        self.results = dict()
+        # pořadí příštího přijatého a příštího vypsaného řádku
+        self.next_row = 0
+        self.next_output = 0
+
+        self.blocks = 0
+        self.solved_rows = 0
+        self.flush_reasons = collections.Counter()
+
+    @property
+    def buffered_rows(self):
+        """
+        Počet rozpracovaných řádků
+
+        :return: počet řádků: int
+        """
+        return self.next_row - self.next_output
+
+    def submit(self, geom_shape_name, inputs):
+        """
+        Přijme jeden řádek a vrátí výsledky řádků, které lze vypsat
+
+        :param geom_shape_name: geometrický název útvaru: str
+        :param inputs: hodnoty zadaných veličin ve tvaru {značka: hodnota}:
+        dict
+        :return: výsledky řádků v pořadí jejich příchodu: list
+        """
+        index = self.next_row
+        self.next_row += 1
+        now = self.clock()
+
+        if geom_shape_name not in self.geom_shapes:
+            self.results[index] = RoutedResult(
+                geom_shape_name, dict(inputs), False,
+                f'Neznámý geometrický útvar {geom_shape_name}.')
+        else:
+            key = geom_shape_name, tuple(sorted(inputs))
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = {'indices': [], 'created': now,
+                          'columns': {symbol: [] for symbol in key[1]}}
+                self.buckets[key] = bucket
+            bucket['indices'].append(index)
+            for symbol, column in bucket['columns'].items():
+                column.append(inputs[symbol])
+            self.row_buckets[index] = key
+
+            if len(bucket['indices']) >= self.block_rows:
+                self._flush(key, 'size')
+
+        self._flush_expired(now)
+        while self.buffered_rows >= self.max_buffered_rows \
+                and self.next_output not in self.results:
+            self._flush(self.row_buckets[self.next_output], 'buffer')
+
+        return self._ready_results()
+
+    def poll(self):
+        """
+        Spočítá přihrádky, jejichž řádky čekají příliš dlouho, a vrátí
+        výsledky řádků, které lze vypsat
+
+        Metodu je vhodné volat, pokud delší dobu nepřichází žádný řádek.
+
+        :return: výsledky řádků v pořadí jejich příchodu: list
+        """
+        self._flush_expired(self.clock())
+        return self._ready_results()
+
+    def finish(self):
+        """
+        Spočítá všechny přihrádky a vrátí výsledky všech zbývajících řádků
+
+        :return: výsledky řádků v pořadí jejich příchodu: list
+        """
+        for key in list(self.buckets):
+            self._flush(key, 'finish')
+        return self._ready_results()
+
+    def route(self, rows):
+        """
+        Spočítá proud řádků a postupně vrací jejich výsledky
+
+        Jde o generátor, takže řádky mohou přicházet např. ze souboru nebo
+        ze sítě a v paměti je vždy nejvýše max_buffered_rows řádků.
+
+        :param rows: dvojice (název útvaru, hodnoty zadaných veličin ve
+        tvaru {značka: hodnota}): iterable
+        :return: generátor výsledků řádků v pořadí jejich příchodu
+        """
+        for geom_shape_name, inputs in rows:
+            yield from self.submit(geom_shape_name, inputs)
+        yield from self.finish()
+
+    def statistics(self):
+        """
+        Vrátí počty spočítaných bloků a řádků a důvody výpočtu bloků
+
+        :return: slovník se statistikami: dict
+        """
+        return {
+            'blocks': self.blocks,
+            'rows': self.solved_rows,
+            'mean_block_rows': self.solved_rows / self.blocks
+            if self.blocks else 0.0,
+            'buffered_rows': self.buffered_rows,
+            'flush_reasons': dict(self.flush_reasons),
+        }
+
+    def _flush_expired(self, now):
+        """
+        Spočítá přihrádky, jejichž nejstarší řádek čeká déle než max_delay
+
+        :param now: aktuální čas v sekundách: float
+        :return: None
+        """
+        if self.max_delay is None:
+            return
+
+        # přihrádky jsou seřazeny podle svého vzniku, takže stačí projít
+        # nejstarší z nich
+        for key, bucket in list(self.buckets.items()):
+            if now - bucket['created'] < self.max_delay:
+                break
+            self._flush(key, 'delay')
+
+    def _flush(self, key, reason):
+        """
+        Spočítá jednu přihrádku a uloží výsledky jejích řádků
+
+        :param key: klíč přihrádky (název útvaru, značky): tuple
+        :param reason: důvod výpočtu (pro statistiky): str
+        :return: None
+        """
+        bucket = self.buckets.pop(key)
+        geom_shape_name = key[0]
+        geom_shape = self.geom_shapes[geom_shape_name]
+        indices = bucket['indices']
+        columns = bucket['columns']
+
+        try:
+            values, valid = self.solve(geom_shape, columns)
+            error = None
+        except ValueError as exception:
+            values = columns
+            valid = [False] * len(indices)
+            error = str(exception)
+
+        symbols = list(geom_shape.general_properties)
+        for j, index in enumerate(indices):
+            del self.row_buckets[index]
+            self.results[index] = RoutedResult(
+                geom_shape_name,
+                {symbol: values[symbol][j] if symbol in values else math.nan
+                 for symbol in symbols},
+                valid[j], error)
+
+        self.blocks += 1
+        self.solved_rows += len(indices)
+        self.flush_reasons[reason] += 1
+
+    def _ready_results(self):
+        """
+        Vyjme výsledky řádků, před kterými již nečeká žádný řádek
+
+        :return: výsledky řádků v pořadí jejich příchodu: list
+        """
+        ready = []
+        while self.next_output in self.results:
+            ready.append(self.results.pop(self.next_output))
+            self.next_output += 1
+
+        return ready
+
+
+def parse_line(line):
+    """
+    Převede řádek vstupu na název útvaru a hodnoty zadaných veličin
+
+    :param line: řádek ve tvaru {název útvaru} {značka}={hodnota} ...: str
+    :return: název útvaru a hodnoty veličin ve tvaru {značka: hodnota}:
+    tuple
+    """
+    words = line.split()
+    inputs = dict()
+    for word in words[1:]:
+        symbol, _, value = word.partition('=')
+        inputs[symbol] = float(value)
+
+    return words[0], inputs
+
+
+if __name__ == '__main__':
+    import catalog
+
+    batch_router = BatchRouter(catalog.load_catalog())
+    input_rows = (parse_line(input_line) for input_line in sys.stdin
+                  if input_line.strip())
+
+    for routed in batch_router.route(input_rows):
+        if routed.error is not None:
+            print(f'{routed.geom_shape_name}\tCHYBA: {routed.error}')
+            continue
+        print('\t'.join(
+            [routed.geom_shape_name, 'OK' if routed.valid else 'NEPLATNÝ']
+            + [f'{symbol}={value!r}' for symbol, value
+               in routed.values.items()]))
+    print(batch_router.statistics(), file=sys.stderr)
@@ -2,6 +2,10 @@
 Modul obsahující třídy pro výpočty veličin útvarů
 
 Modul obsahuje třídy:
+- FrozenDict. Slovník, jehož položky nelze po vytvoření měnit.
+- QuantityProperties. Slovník s obecnými vlastnostmi jedné veličiny
+  GEOMETRICKÉHO útvaru, který krátký a delší popis veličiny načítá
+  z textového souboru útvaru až ve chvíli, kdy jsou poprvé potřeba.
 - GeometricShape. Tato slouží k tvorbě instancí konkrétních GEOMETRICKÝCH
   útvarů, jako např. kruh, obdélník, krychle, koule apod. Třída je
   instanciována na základě textového souboru, který obsahuje popisný název
@@ -21,18 +25,308 @@ Modul obsahuje třídy:
   Všechny instance UŽIVATELSKÝCH útvarů stejného typu (např. zmíněný "obdelnik")
   budou sdílet tutéž instanci třídy GeometricShape s obecnými vlastnostmi
   tohoto útvaru.
+  Instance třídy GeometricShape se proto po vytvoření již nemění (kromě
+  mezipaměti plánů výpočtu a líně načítaných popisů veličin) a lze je
+  bezpečně sdílet i mezi vlákny. Veškerý stav výpočtu je uložen
+  v UŽIVATELSKÉM útvaru, resp. v lokálních proměnných funkcí modulu solver.
 """
 
+import collections
 import math
+import threading
+import types
+import optimize
+import solver
+import textfiles
+import tracing
+
+
+# Položky slovníku s vlastnostmi veličiny, které slouží pouze k výpisům
+# uživateli a které lze načítat z textového souboru útvaru až při prvním
+# přístupu k nim (viz QuantityProperties)
+DISPLAY_PROPERTIES = ('short_name', 'description')
+
+# Maximální velikost historie změn hodnot, kterou si UŽIVATELSKÝ útvar
+# pamatuje pro jejich vrácení (viz UserShape.undo); velikost je počet
+# kroků historie a hodnot veličin a záznamů o původu hodnot uložených
+# v těchto krocích (viz _step_size), při jejím překročení se zapomenou
+# nejstarší kroky
+HISTORY_LIMIT = 1000
+
+# Popisy implicitních podmínek konstruovatelnosti, které platí pro hodnoty
+# všech veličin, resp. všech úhlů
+POSITIVE_VALUE_MESSAGE = 'Hodnota musí být větší než nula.'
+ANGLE_VALUE_MESSAGE = 'Hodnota úhlu musí být menší než 180 stupňů.'
+
+# Zámek pro načítání a uvolňování líně načítaných popisů veličin (viz
+# QuantityProperties), které mohou souběžně číst různá vlákna
+_DESCRIPTION_LOCK = threading.Lock()
+
+
+def _closure(known, edges):
+    """
+    Vrátí uzávěr množiny veličin nad hranami hypergrafu vzorců
+
+    Uzávěr obsahuje všechny veličiny, jejichž hodnoty lze postupně
+    spočítat z hodnot veličin dané množiny.
+
+    :param known: bitová maska známých veličin: int
+    :param edges: hrany hypergrafu vzorců ve tvaru (maska veličiny na levé
+    straně, maska veličin na pravé straně): tuple
+    :return: bitová maska veličin uzávěru: int
+    """
+    changed = True
+    while changed:
+        changed = False
+        for target, variables in edges:
+            if not known & target and known & variables == variables:
+                known |= target
+                changed = True
+    return known
+
+
+def _minimal_keys(count, edges):
+    """
+    Vrátí všechny minimální množiny veličin, jejichž uzávěr obsahuje
+    všechny veličiny útvaru
+
+    Místo procházení všech podmnožin veličin se množiny hledají postupně
+    (algoritmus Lucchesiho a Osborna): první množina vznikne odebíráním
+    veličin z množiny všech veličin, dokud to uzávěr dovolí. Každou další
+    množinu lze získat z některé již nalezené množiny tak, že se v ní
+    veličina na levé straně některé hrany nahradí veličinami na pravé
+    straně této hrany a výsledek se opět zmenší. Náhradní množiny, které
+    obsahují některou již nalezenou množinu, se přeskočí. Doba hledání je
+    tak úměrná součinu počtu nalezených množin a počtu hran.
+
+    :param count: počet veličin útvaru: int
+    :param edges: hrany hypergrafu vzorců: tuple
+    :return: bitové masky minimálních množin seřazené podle velikosti
+    a pořadí veličin: list
+    """
+    all_quantities = (1 << count) - 1
+
+    def reduce(known):
+        for i in reversed(range(count)):
+            bit = 1 << i
+            if known & bit \
+                    and _closure(known & ~bit, edges) == all_quantities:
+                known &= ~bit
+        return known
+
+    keys = [reduce(all_quantities)]
+    for key in keys:
+        for target, variables in edges:
+            if not key & target:
+                continue
+            candidate = key & ~target | variables
+            if any(other & candidate == other for other in keys):
+                continue
+            keys.append(reduce(candidate))
+
+    return sorted(keys, key=lambda mask: (
+        bin(mask).count('1'), [i for i in range(count) if mask >> i & 1]))
+
+
+def _step_size(step):
+    """
+    Vrátí velikost kroku historie změn hodnot veličin
+
+    Krok se počítá jako jedna položka, ke které se přičtou všechny hodnoty
+    veličin a záznamy o původu hodnot v něm uložené (viz UserShape.undo).
+
+    :param step: krok historie ve tvaru (druh kroku, data kroku): tuple
+    :return: velikost kroku: int
+    """
+    kind, data = step
+    if isinstance(data, int):
+        return 1
+    if kind == 'assign':
+        return 1 + len(data)
+    entries, records = data
+    return 1 + len(entries) + len(records)
+
+
+class FeasibleRange(collections.namedtuple(
+        'FeasibleRange', 'low high low_inclusive high_inclusive '
+                         'low_description high_description')):
+    """
+    Třída reprezentující povolený rozsah hodnot veličiny
+
+    Kromě mezí rozsahu obsahuje informaci, zda jsou meze jeho součástí,
+    a popisy podmínek konstruovatelnosti, ze kterých meze vyplývají.
+    """
+
+    __slots__ = ()
+
+    def contains(self, value):
+        """
+        Ověří, zda hodnota náleží do povoleného rozsahu
+
+        :param value: hodnota veličiny: float
+        :return: zda hodnota náleží do rozsahu: bool
+        """
+        return (self.low <= value if self.low_inclusive
+                else self.low < value) \
+            and (value <= self.high if self.high_inclusive
+                 else value < self.high)
+
+    def violated_condition(self, value):
+        """
+        Vrátí popis podmínky, kterou hodnota nesplňuje
+
+        :param value: hodnota veličiny: float
+        :return: popis podmínky nebo None, pokud hodnota náleží do
+        rozsahu: str
+        """
+        if not (self.low <= value if self.low_inclusive
+                else self.low < value):
+            return self.low_description
+        if not (value <= self.high if self.high_inclusive
+                else value < self.high):
+            return self.high_description
+        return None
+
+    def is_empty(self):
+        """
+        Ověří, zda do rozsahu nenáleží žádná hodnota
+
+        :return: zda je rozsah prázdný: bool
+        """
+        return not (self.low < self.high or self.low == self.high
+                    and self.low_inclusive and self.high_inclusive)
+
+    def format(self, convert=None):
+        """
+        Vrátí rozsah ve tvaru intervalu, např. '(0, 5.5]', nebo znak '∅',
+        pokud je rozsah prázdný
+
+        :param convert: funkce, kterou se meze převedou před výpisem (např.
+        math.degrees)
+        :return: interval: str
+        """
+        if self.is_empty():
+            return '∅'
+
+        low, high = self.low, self.high
+        if convert is not None:
+            low, high = convert(low), convert(high)
+
+        return f'{"[" if self.low_inclusive else "("}{low:.6g}, ' \
+               f'{high:.6g}{"]" if self.high_inclusive else ")"}'
+
+
+class FrozenDict(dict):
+    """
+    Třída reprezentující slovník, jehož položky nelze po vytvoření měnit
+
+    Slovníky s obecnými vlastnostmi GEOMETRICKÉHO útvaru sdílejí všechny
+    jeho UŽIVATELSKÉ útvary i vlákna hromadného výpočtu, a proto je nelze
+    po vytvoření útvaru měnit (viz GeometricShape._freeze).
+    """
+
+    __slots__ = ()
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f'Slovník {type(self).__name__} nelze měnit.')
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class QuantityProperties(FrozenDict):
+    """
+    Třída reprezentující obecné vlastnosti jedné veličiny GEOMETRICKÉHO
+    útvaru s líně načítanými popisy veličiny
+
+    Kromě popisů veličiny (DISPLAY_PROPERTIES), které se načítají
+    a uvolňují podle potřeby, nelze položky slovníku měnit.
+    """
+
+    # instance nemají vlastní slovník atributů, aby v paměti zabíraly co
+    # nejméně místa
+    __slots__ = ('symbol', 'source')
+
+    def __init__(self, symbol, source, properties=()):
+        """
+        Konstruktor slovníku s vlastnostmi veličiny
+
+        :param symbol: značka veličiny: str
+        :param source: umístění řádku veličiny v textovém souboru útvaru
+        ve tvaru (cesta k souboru, posun v bajtech, délka v bajtech), viz
+        textfiles.quantity_text_index: tuple
+        :param properties: vlastnosti veličiny kromě popisů: dict
+        """
+        super().__init__(properties)
+        self.symbol = symbol
+        self.source = source
+
+    def __reduce__(self):
+        return type(self), (self.symbol, self.source, dict(self))
+
+    def __missing__(self, key):
+        """
+        Načte krátký a delší popis veličiny z textového souboru útvaru
+
+        Metoda se volá při přístupu k položce, která ve slovníku není.
+        Pokud jde o některou z položek DISPLAY_PROPERTIES, načte obě
+        z textového souboru útvaru a uloží je do slovníku. Pokud se soubor
+        mezitím změnil a na uloženém místě řádek veličiny již není, umístění
+        řádku se znovu vyhledá.
+
+        :param key: klíč položky: str
+        :return: hodnota položky: str
+        """
+        if key not in DISPLAY_PROPERTIES:
+            raise KeyError(key)
+
+        with _DESCRIPTION_LOCK:
+            # popisy mezitím mohlo načíst jiné vlákno
+            if dict.__contains__(self, key):
+                return dict.__getitem__(self, key)
+
+            full_path, offset, length = self.source
+            texts = textfiles.read_quantity_texts(full_path, offset, length)
+            if texts is None or texts[0] != self.symbol:
+                self.source = textfiles.quantity_text_index(full_path)[
+                    self.symbol]
+                texts = textfiles.read_quantity_texts(*self.source)
+
+            dict.__setitem__(self, 'short_name', texts[1])
+            dict.__setitem__(self, 'description', texts[2])
+            return dict.__getitem__(self, key)
+
+    def evict(self):
+        """
+        Uvolní z paměti načtené popisy veličiny
+
+        Popisy se při příštím přístupu k nim znovu načtou z textového
+        souboru útvaru.
+
+        :return: None
+        """
+        with _DESCRIPTION_LOCK:
+            for key in DISPLAY_PROPERTIES:
+                dict.pop(self, key, None)
 
 
 class GeometricShape:
     """
     Třída reprezentující rovinný nebo prostorový GEOMETRICKÝ útvar
+
+    Instance je po dokončení konstruktoru zmrazena (viz _freeze), takže
+    přiřazení do jejích atributů vyvolá výjimku AttributeError, slovníky
+    s obecnými vlastnostmi, vzorci a podmínkami nelze měnit a seznamy
+    výsledků analýzy vzorců jsou nahrazeny n-ticemi. Jedinou měněnou částí
+    instance je mezipaměť plánů výpočtu, do které se zapisuje pod zámkem
+    a která je navenek dostupná pouze pro čtení (evaluation_plans).
     """
 
     def __init__(self, geom_shape_name, geom_descriptive_name, quantities,
-                 formulas, conditions):
+                 formulas, conditions, description_index=None):
         """
         Konstruktor GEOMETRICKÉHO útvaru
 
@@ -42,6 +336,10 @@ class GeometricShape:
         :param quantities: veličiny útvaru: list
         :param formulas: vzorce pro výpočet hodnot veličin: list
         :param conditions: podmínky konstruovatelnosti útvaru: list
+        :param description_index: index řádků veličin v textovém souboru
+        útvaru (viz textfiles.quantity_text_index); pokud je zadán, popisy
+        veličin se neuchovávají v paměti, ale načítají se ze souboru až při
+        prvním přístupu k nim: dict
         """
 
         # geometrický název útvaru - slouží v programu jako jeho identifikátor
@@ -57,7 +355,7 @@ class GeometricShape:
         self.general_properties = dict()
 
         # inicializace obecných vlastností geometrických veličin útvaru
-        self._initialize_general_properties(quantities)
+        self._initialize_general_properties(quantities, description_index)
 
         # příprava a vložení vzorců pro výpočet hodnot veličin útvaru do datové
         # struktury general_properties
@@ -68,10 +366,98 @@ class GeometricShape:
         # general_properties
         self._insert_conditions(conditions)
 
+        # slovníky s obecnými vlastnostmi se zmrazí ještě před analýzou
+        # vzorců, aby plány výpočtu i inverse_ways odkazovaly přímo na
+        # neměnné vzorce
+        self._freeze_general_properties()
+
         # celkový počet geometrických veličin útvaru
         self.total_number_of_quantities = len(self.general_properties)
 
-    def _initialize_general_properties(self, quantities):
+        # výsledky statické analýzy vzorců útvaru (viz _analyze_formulas):
+        # veličiny, jejichž hodnotu nelze spočítat z hodnot žádných jiných
+        # veličin, a proto musí být vždy zadány uživatelem
+        self.underivable_quantities = frozenset()
+        # vzorce, které se za žádných okolností nepoužijí k výpočtu
+        self.unused_formulas = []
+        # všechny minimální množiny veličin, z jejichž hodnot lze spočítat
+        # hodnoty všech ostatních veličin útvaru; hledají se až při prvním
+        # použití (viz minimal_determining_sets)
+        self._minimal_determining_sets = None
+        # hrany hypergrafu vzorců ve tvaru (bitová maska veličiny na levé
+        # straně, bitová maska veličin na pravé straně), viz
+        # _analyze_formulas
+        self._formula_edges = ()
+        # předem sestavené plány výpočtu pro jednotlivé množiny známých
+        # veličin (viz get_evaluation_plan) a jejich pohled pouze pro čtení
+        self._plans = dict()
+        self.evaluation_plans = types.MappingProxyType(self._plans)
+        # vzorce, jejichž pravá strana obsahuje danou veličinu, ve tvaru
+        # {značka veličiny: [(značka veličiny na levé straně, vzorec), ...]}
+        # (viz find_inverse_way)
+        self.inverse_ways = {symbol: [] for symbol in self.general_properties}
+        # zámek pro zápis do mezipaměti plánů výpočtu
+        self._plan_lock = threading.Lock()
+
+        self._analyze_formulas()
+        self._freeze()
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError(f'GEOMETRICKÝ útvar {self.geom_shape_name} '
+                                 f'nelze po vytvoření měnit.')
+        super().__setattr__(name, value)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_plan_lock']
+        del state['evaluation_plans']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__['evaluation_plans'] = types.MappingProxyType(
+            self._plans)
+        self.__dict__['_plan_lock'] = threading.Lock()
+        self.__dict__['_frozen'] = True
+
+    def _freeze_general_properties(self):
+        """
+        Nahradí slovníky s obecnými vlastnostmi útvaru, vzorci a podmínkami
+        slovníky FrozenDict a seznamy vzorců a podmínek n-ticemi
+
+        :return: None
+        """
+        def freeze_items(items):
+            return tuple(FrozenDict(item, variables=frozenset(
+                item['variables'])) for item in items)
+
+        general_properties = dict()
+        for symbol, properties in self.general_properties.items():
+            frozen = dict(properties,
+                          countable_by=freeze_items(properties['countable_by']),
+                          conditions=freeze_items(properties['conditions']))
+            if isinstance(properties, QuantityProperties):
+                general_properties[symbol] = QuantityProperties(
+                    properties.symbol, properties.source, frozen)
+            else:
+                general_properties[symbol] = FrozenDict(frozen)
+        self.general_properties = FrozenDict(general_properties)
+
+    def _freeze(self):
+        """
+        Nahradí seznamy výsledků analýzy vzorců n-ticemi a zakáže další
+        přiřazení do atributů instance
+
+        :return: None
+        """
+        self.unused_formulas = tuple(self.unused_formulas)
+        self.inverse_ways = FrozenDict(
+            (symbol, tuple(ways)) for symbol, ways in self.inverse_ways.items())
+        self._frozen = True
+
+    def _initialize_general_properties(self, quantities,
+                                       description_index=None):
         """
         Inicializuje hlavní datovou strukturu (seznam) general_properties.
 
@@ -81,19 +467,32 @@ class GeometricShape:
         pouze prázdné seznamy, jejichž obsah bude připraven a vložen jinými
         metodami.
 
+        Pokud je předán index řádků veličin v textovém souboru útvaru,
+        vnořenými slovníky budou instance třídy QuantityProperties, které
+        popisy veličin načtou až při prvním přístupu k nim.
+
         :param quantities: matematické veličiny útvaru: list
+        :param description_index: index řádků veličin v textovém souboru
+        útvaru: dict
         :return: None
         """
 
         for quantity_symbol, short_name, description, *is_angle in quantities:
             quantity = dict()
 
-            quantity['short_name'] = short_name
-            quantity['description'] = description
+            if description_index is None:
+                quantity['short_name'] = short_name
+                quantity['description'] = description
+
             quantity['is_angle'] = is_angle == ['angle']
             quantity['countable_by'] = []
             quantity['conditions'] = []
 
+            if description_index is not None:
+                quantity = QuantityProperties(
+                    quantity_symbol, description_index[quantity_symbol],
+                    quantity)
+
             self.general_properties[quantity_symbol] = quantity
 
     def _insert_formulas(self, formulas):
@@ -114,6 +513,228 @@ class GeometricShape:
 
             self.general_properties[symbol]['countable_by'].append(item)
 
+    def _analyze_formulas(self):
+        """
+        Provede statickou analýzu vzorců útvaru
+
+        Vzorce útvaru tvoří hypergraf, v němž každý vzorec představuje
+        hranu vedoucí z množiny veličin na jeho pravé straně do veličiny
+        na jeho levé straně. Metoda sestaví hrany tohoto hypergrafu,
+        spočítá nad nimi uzávěry množin veličin a naplní instanční proměnné
+        underivable_quantities, unused_formulas a inverse_ways. Minimální
+        množiny veličin určujících útvar se z hran hypergrafu hledají až
+        při prvním použití (viz minimal_determining_sets).
+
+        Analýza se provádí pouze jednou při vytvoření instance útvaru.
+        Množiny veličin jsou během ní reprezentovány bitovými maskami, kde
+        i-tý bit odpovídá i-té veličině v pořadí oddílu QUANTITIES.
+
+        :return: None
+        """
+        symbols = list(self.general_properties)
+        bits = {symbol: 1 << i for i, symbol in enumerate(symbols)}
+        all_quantities = (1 << len(symbols)) - 1
+
+        edges = []
+        for symbol, properties in self.general_properties.items():
+            shadowing = []
+            for way in properties['countable_by']:
+                variables = way['variables']
+                if symbol in variables:
+                    self.unused_formulas.append((symbol, way['expression']))
+                    continue
+
+                # vzorec se nepoužije, pokud kdykoli, kdy jej lze použít,
+                # lze použít i některý vzorec uvedený před ním
+                if any(previous <= variables for previous in shadowing):
+                    self.unused_formulas.append((symbol, way['expression']))
+                else:
+                    edges.append((bits[symbol],
+                                  sum(bits[v] for v in variables)))
+                shadowing.append(variables)
+
+                # každý vzorec lze navíc numericky invertovat, tzn. spočítat
+                # libovolnou veličinu z jeho pravé strany ze všech ostatních
+                # veličin vzorce (viz find_inverse_way)
+                for variable in variables:
+                    self.inverse_ways[variable].append((symbol, way))
+                    edges.append((bits[variable], bits[symbol] + sum(
+                        bits[v] for v in variables if v != variable)))
+
+        self._formula_edges = tuple(edges)
+        self.underivable_quantities = frozenset(
+            symbol for symbol in symbols
+            if not _closure(all_quantities & ~bits[symbol], edges)
+            & bits[symbol])
+
+    @property
+    def minimal_determining_sets(self):
+        """
+        Vrátí všechny minimální množiny veličin určujících útvar
+
+        Minimální množina obsahuje veličiny, z jejichž hodnot lze spočítat
+        hodnoty všech ostatních veličin útvaru, přičemž po odebrání
+        kterékoli z nich to již nelze. Množiny jsou seřazeny podle velikosti
+        a pak podle pořadí veličin v oddílu QUANTITIES.
+
+        Množiny se hledají až při prvním přístupu k nim a zároveň se pro
+        každou z nich předem sestaví plán výpočtu. Hledání probíhá bez
+        zámku; pokud výsledek mezitím uložilo jiné vlákno, vrátí se uložený
+        výsledek.
+
+        :return: minimální množiny značek veličin: tuple of frozensets
+        """
+        determining_sets = self._minimal_determining_sets
+        if determining_sets is not None:
+            return determining_sets
+
+        symbols = list(self.general_properties)
+        determining_sets = tuple(
+            frozenset(symbol for i, symbol in enumerate(symbols)
+                      if mask >> i & 1)
+            for mask in _minimal_keys(len(symbols), self._formula_edges))
+        for determining_set in determining_sets:
+            self.get_evaluation_plan(determining_set)
+
+        with self._plan_lock:
+            if self._minimal_determining_sets is None:
+                self.__dict__['_minimal_determining_sets'] = determining_sets
+            return self._minimal_determining_sets
+
+    def evict_descriptions(self):
+        """
+        Uvolní z paměti popisy veličin načítané z textového souboru útvaru
+
+        Metoda má účinek pouze u útvarů vytvořených s indexem řádků veličin
+        (viz QuantityProperties), jejichž popisy lze kdykoli znovu načíst.
+
+        :return: None
+        """
+        for properties in self.general_properties.values():
+            if isinstance(properties, QuantityProperties):
+                properties.evict()
+
+    def get_evaluation_plan(self, known_symbols):
+        """
+        Vrátí plán výpočtu hodnot veličin z dané množiny známých veličin
+
+        Plán je n-tice trojic (značka veličiny, vzorec, značka invertované
+        veličiny), kde vzorec je položka seznamu 'countable_by' některé
+        veličiny. Pokud je třetí položka None, hodnota veličiny se spočítá
+        přímo dosazením do vzorce, který patří této veličině. V opačném
+        případě jde o vzorec invertované veličiny, jehož pravá strana
+        obsahuje počítanou veličinu, a její hodnota se najde numericky
+        (viz modul solver).
+
+        Trojice jsou seřazeny v pořadí, v jakém by vzorce postupně použila
+        metoda UserShape.assign_value_and_recalculate, pokud by se hodnoty
+        všech známých veličin přiřadily najednou. Plán tak obsahuje pouze ty
+        veličiny, které lze ze známých veličin spočítat.
+
+        Sestavené plány se ukládají do mezipaměti evaluation_plans, takže
+        se pro každou množinu známých veličin sestaví pouze jednou. Plán se
+        sestavuje bez zámku; pokud ho mezitím uložilo jiné vlákno, vrátí se
+        uložený plán.
+
+        :param known_symbols: značky známých veličin: set of strings
+        :return: plán výpočtu: tuple
+        """
+        known_symbols = frozenset(known_symbols)
+        plan = self.evaluation_plans.get(known_symbols)
+        if plan is not None:
+            return plan
+
+        known = set(known_symbols)
+        steps = []
+        changed = True
+        while changed and len(known) != self.total_number_of_quantities:
+            changed = False
+            for symbol, properties in self.general_properties.items():
+                if symbol in known:
+                    continue
+                for way in properties['countable_by']:
+                    if way['variables'] <= known:
+                        steps.append((symbol, way, None))
+                        known.add(symbol)
+                        changed = True
+                        break
+
+            # přímým dosazením již nelze spočítat nic dalšího - zkusíme
+            # spočítat jedinou hodnotu numericky a pak opět pokračovat
+            # přímým dosazováním
+            if not changed:
+                for symbol in self.general_properties:
+                    if symbol in known:
+                        continue
+                    inverse_way = self.find_inverse_way(symbol, known)
+                    if inverse_way is not None:
+                        target, way = inverse_way
+                        steps.append((symbol, way, target))
+                        known.add(symbol)
+                        changed = True
+                        break
+
+        with self._plan_lock:
+            return self._plans.setdefault(known_symbols, tuple(steps))
+
+    def find_inverse_way(self, quantity_symbol, known_symbols):
+        """
+        Najde vzorec, jehož numerickou inverzí lze spočítat danou veličinu
+
+        Metoda se používá tehdy, když hodnotu veličiny nelze spočítat
+        žádným z jejích vlastních vzorců. Hledá vzorec jiné, již známé
+        veličiny, jehož pravá strana obsahuje danou veličinu a jinak pouze
+        známé veličiny. Z takového vzorce lze hodnotu dané veličiny najít
+        numericky jako kořen rovnice.
+
+        :param quantity_symbol: značka počítané veličiny: str
+        :param known_symbols: značky známých veličin: set of strings
+        :return: dvojice (značka invertované veličiny, vzorec) nebo None:
+        tuple
+        """
+        for target, way in self.inverse_ways[quantity_symbol]:
+            if target in known_symbols \
+                    and way['variables'] - {quantity_symbol} <= known_symbols:
+                return target, way
+
+        return None
+
+    def undetermined_quantities(self, known_symbols):
+        """
+        Vrátí veličiny, jejichž hodnoty nelze ze známých veličin spočítat
+
+        Metoda slouží k ověření vzoru vstupních dat předem, např. před
+        hromadným výpočtem mnoha útvarů se stejnou množinou známých veličin.
+        Prázdný výsledek znamená, že známé veličiny určují celý útvar.
+
+        :param known_symbols: značky známých veličin: set of strings
+        :return: značky veličin, které nelze spočítat: frozenset
+        """
+        known_symbols = frozenset(known_symbols)
+        calculated = {symbol for symbol, way, target
+                      in self.get_evaluation_plan(known_symbols)}
+        return frozenset(self.general_properties) - known_symbols - calculated
+
+    def optimize(self, objective, bounds, maximize=False, equal=None,
+                 at_least=None, at_most=None):
+        """
+        Najde útvar s nejmenší nebo největší hodnotou veličiny
+
+        Metoda je zkratkou pro funkci optimize.optimize, kde je popsán
+        význam parametrů.
+
+        :param objective: značka optimalizované veličiny: str
+        :param bounds: meze proměnných ve tvaru {značka: (dolní mez, horní
+        mez)}: dict
+        :param maximize: zda se hledá největší (jinak nejmenší) hodnota: bool
+        :param equal: požadované hodnoty veličin: dict
+        :param at_least: nejmenší přípustné hodnoty veličin: dict
+        :param at_most: největší přípustné hodnoty veličin: dict
+        :return: výsledek hledání nebo None: OptimizationResult
+        """
+        return optimize.optimize(self, objective, bounds, maximize, equal,
+                                 at_least, at_most)
+
     def _insert_conditions(self, conditions):
         """
         Zpracuje a vloží do general_properties podmínky konstruovatelnosti
@@ -323,6 +944,40 @@ class UserShape:
         # (zadané nebo vypočítané)
         self.quantity_values = dict()
 
+        # slovník s hodnotami, které veličinám přiřadil přímo uživatel (nikoli
+        # vypočítanými), v pořadí jejich přiřazení - slouží k převedení
+        # útvaru na novou definici GEOMETRICKÉHO útvaru při jejím znovunačtení
+        self.assigned_values = dict()
+
+        # záznam o původu hodnot veličin (viz modul tracing); None znamená,
+        # že sledování výpočtů je vypnuto
+        self.trace = None
+        # zda je zapnuto sledování výpočtů (viz enable_tracing)
+        self._tracing = False
+
+        # pořadové číslo průchodu cyklem přepočtu v metodě
+        # assign_value_and_recalculate, které se ukládá do záznamu o původu
+        # hodnot
+        self.propagation_pass = 0
+
+        # značky veličin v pořadí, ve kterém jejich hodnoty byly přiřazeny
+        # nebo vypočítány; hodnoty po libovolném kroku historie jsou dány
+        # počátečním úsekem tohoto seznamu, takže krok historie stačí
+        # popsat délkou seznamu před jeho provedením (viz undo a redo)
+        self.value_log = []
+
+        # kroky historie, které lze vrátit, a vrácené kroky, které lze znovu
+        # provést (viz undo a redo), a jejich celková velikost (viz
+        # HISTORY_LIMIT)
+        self.undo_steps = collections.deque()
+        self.redo_steps = []
+        self.history_size = 0
+
+        # povolené rozsahy hodnot veličin (viz allowed_range), které se
+        # počítají při prvním dotazu a zapomenou se při každé změně hodnot
+        # veličin
+        self.feasible_ranges = dict()
+
         # provede inicializaci slovníku quantity_values tím, že nastaví
         # vnořené položky na výchozí hodnoty
         # metoda se používá i zvnějšku, když se uživatel rozhodne smazat
@@ -355,11 +1010,23 @@ class UserShape:
         zvnějšku, pokud se uživatel rozhodne všechny veličiny svého útvaru
         smazat.
 
-        Metoda též vynuluje počitadlo známých hodnot veličin tohoto útvaru.
+        Metoda též vynuluje počitadlo známých hodnot veličin tohoto útvaru
+        a zapomene hodnoty přiřazené uživatelem, záznamy o původu hodnot
+        i historii změn (pro vymazání hodnot, které lze vrátit, slouží
+        metoda clear_quantity_values).
 
         :return: None
         """
         self.quantity_values = dict()
+        self.assigned_values = dict()
+        self.value_log = []
+        self.undo_steps = collections.deque()
+        self.redo_steps = []
+        self.history_size = 0
+        self.feasible_ranges.clear()
+
+        if self._tracing:
+            self.trace.clear()
 
         for quantity_symbol in self.geom_shape_instance.general_properties:
             quantity = dict()
@@ -371,6 +1038,281 @@ class UserShape:
 
         self.number_of_known_quantities = 0
 
+    def clear_quantity_values(self):
+        """
+        Vymaže všechny hodnoty veličin tak, aby je bylo možné vrátit
+
+        Na rozdíl od metody delete_quantity_values se vymazání zapíše do
+        historie změn jako jeden krok, který lze vrátit metodou undo. Do
+        kroku se uloží i vymazané záznamy o původu hodnot, které se při
+        vrácení kroku obnoví.
+
+        :return: None
+        """
+        entries = self._pop_log_entries(0)
+        records = self.trace.snapshot() if self._tracing else ()
+        history = self.undo_steps, self.redo_steps, self.history_size
+
+        self.delete_quantity_values()
+
+        self.undo_steps, self.redo_steps, self.history_size = history
+        self._clear_redo_steps()
+        self._record_step(self.undo_steps, ('clear', (entries, records)))
+
+    def undo(self):
+        """
+        Vrátí poslední krok historie změn hodnot veličin
+
+        Krokem je jedno přiřazení hodnoty uživatelem včetně všech hodnot,
+        které se z ní dopočítaly, nebo vymazání všech hodnot (viz
+        clear_quantity_values). Vrácení kroku stojí čas úměrný počtu veličin,
+        jejichž hodnoty se krokem změnily. Hodnoty, které se po vazbách
+        rozšířily do jiných útvarů (viz modul links), se nevracejí.
+
+        Krok přiřazení je v historii uložen jako délka seznamu value_log
+        před jeho provedením, krok vymazání jako vymazané hodnoty a záznamy
+        o původu hodnot. Vrácené kroky se ukládají obráceně: přiřazení jako
+        vymazané hodnoty a vymazání jako délka seznamu value_log.
+
+        :return: zda bylo co vrátit: bool
+        """
+        if not self.undo_steps:
+            return False
+
+        kind, data = self._take_step(self.undo_steps)
+        if kind == 'assign':
+            self._record_step(self.redo_steps,
+                              ('assign', self._pop_log_entries(data)))
+        else:
+            entries, records = data
+            self._push_log_entries(entries)
+            if self._tracing:
+                self.trace.restore(records)
+            self._record_step(self.redo_steps,
+                              ('clear', len(self.value_log) - len(entries)))
+        return True
+
+    def redo(self):
+        """
+        Znovu provede poslední vrácený krok historie změn hodnot veličin
+
+        Hodnoty se při tom znovu nepočítají, ale obnoví se hodnoty
+        zapamatované při vrácení kroku.
+
+        :return: zda bylo co znovu provést: bool
+        """
+        if not self.redo_steps:
+            return False
+
+        kind, data = self._take_step(self.redo_steps)
+        if kind == 'assign':
+            self._record_step(self.undo_steps,
+                              ('assign', len(self.value_log)))
+            self._push_log_entries(data)
+        else:
+            entries = self._pop_log_entries(data)
+            records = ()
+            if self._tracing:
+                records = self.trace.snapshot()
+                self.trace.clear()
+            self._record_step(self.undo_steps, ('clear', (entries, records)))
+        return True
+
+    def restore_values(self, assigned_values, values):
+        """
+        Přiřadí veličinám dříve spočítané hodnoty bez jejich výpočtu
+
+        Metoda slouží k obnovení výsledku přiřazení hodnot, který byl již
+        dříve spočítán (viz modul cache). Obnovení se zapíše do historie
+        změn jako jeden krok, který lze vrátit metodou undo.
+
+        :param assigned_values: hodnoty přiřazené uživatelem ve tvaru
+        {značka: hodnota}: dict
+        :param values: hodnoty všech známých veličin včetně přiřazených ve
+        tvaru {značka: hodnota}: dict
+        :return: None
+        """
+        self._clear_redo_steps()
+        self._record_step(self.undo_steps, ('assign', len(self.value_log)))
+
+        self._push_log_entries(
+            [(symbol, values[symbol], symbol in assigned_values)
+             for symbol in self.quantity_values if symbol in values])
+
+    def merge_undo_steps(self, start):
+        """
+        Sloučí kroky historie změn od dané pozice do jediného kroku
+
+        Metoda slouží k tomu, aby přiřazení hodnot více veličinám jedním
+        příkazem bylo možné vrátit jedním krokem, stejně jako obnovení
+        výsledku z mezipaměti (viz restore_values). Sloučit lze pouze kroky
+        přiřazení hodnot. Na pořadí hodnot uvnitř kroku nezáleží, a proto
+        se hodnoty sloučeného kroku v seznamu value_log seřadí podle pořadí
+        veličin útvaru, ve kterém je obnovuje i metoda restore_values.
+
+        :param start: délka seznamu value_log před prvním slučovaným krokem:
+        int
+        :return: None
+        """
+        undo_steps = self.undo_steps
+        while len(undo_steps) > 1 and undo_steps[-1][0] == 'assign' \
+                and undo_steps[-1][1] > start \
+                and undo_steps[-2][0] == 'assign' \
+                and undo_steps[-2][1] >= start:
+            self._take_step(undo_steps)
+
+        if undo_steps and undo_steps[-1] == ('assign', start):
+            order = {symbol: i for i, symbol in enumerate(self.quantity_values)}
+            self.value_log[start:] = sorted(self.value_log[start:],
+                                            key=order.__getitem__)
+
+    def _record_step(self, steps, step):
+        """
+        Přidá krok do historie změn a zapomene nejstarší kroky, pokud
+        velikost historie překročí HISTORY_LIMIT
+
+        Zapomínají se nejprve nejstarší kroky, které lze vrátit, a poté
+        nejvzdálenější vrácené kroky. Právě přidaný krok se nezapomene,
+        i kdyby sám přesahoval HISTORY_LIMIT.
+
+        :param steps: kroky, které lze vrátit, nebo vrácené kroky: list
+        :param step: krok historie ve tvaru (druh kroku, data kroku): tuple
+        :return: None
+        """
+        steps.append(step)
+        self.history_size += _step_size(step)
+
+        while self.history_size > HISTORY_LIMIT \
+                and len(self.undo_steps) + len(self.redo_steps) > 1:
+            if self.undo_steps and (self.undo_steps[0] is not step):
+                oldest = self.undo_steps.popleft()
+            else:
+                oldest = self.redo_steps.pop(0)
+            self.history_size -= _step_size(oldest)
+
+    def _take_step(self, steps):
+        """
+        Odebere poslední krok z historie změn
+
+        :param steps: kroky, které lze vrátit, nebo vrácené kroky: list
+        :return: odebraný krok: tuple
+        """
+        step = steps.pop()
+        self.history_size -= _step_size(step)
+        return step
+
+    def _clear_redo_steps(self):
+        """
+        Zapomene vrácené kroky, které po nové změně již nelze znovu provést
+
+        :return: None
+        """
+        self.history_size -= sum(map(_step_size, self.redo_steps))
+        self.redo_steps = []
+
+    def _pop_log_entries(self, start):
+        """
+        Vymaže hodnoty veličin zapsaných v seznamu value_log od dané pozice
+
+        :param start: pozice v seznamu value_log: int
+        :return: vymazané hodnoty ve tvaru (značka, hodnota, zda byla
+        přiřazena uživatelem): list
+        """
+        entries = []
+        for quantity_symbol in self.value_log[start:]:
+            quantity = self.quantity_values[quantity_symbol]
+            entries.append((quantity_symbol, quantity['value'],
+                            self.assigned_values.pop(quantity_symbol, None)
+                            is not None))
+            quantity['value'] = None
+            quantity['has_value'] = False
+
+        del self.value_log[start:]
+        self.number_of_known_quantities -= len(entries)
+        self.feasible_ranges.clear()
+        return entries
+
+    def _push_log_entries(self, entries):
+        """
+        Obnoví hodnoty veličin vymazané metodou _pop_log_entries
+
+        :param entries: vymazané hodnoty ve tvaru (značka, hodnota, zda
+        byla přiřazena uživatelem): list
+        :return: None
+        """
+        for quantity_symbol, value, is_assigned in entries:
+            self.quantity_values[quantity_symbol]['value'] = value
+            self.quantity_values[quantity_symbol]['has_value'] = True
+            if is_assigned:
+                self.assigned_values[quantity_symbol] = value
+            self.value_log.append(quantity_symbol)
+
+        self.number_of_known_quantities += len(entries)
+        self.feasible_ranges.clear()
+
+    def migrate_to_geometric_shape(self, geom_shape_instance):
+        """
+        Převede UŽIVATELSKÝ útvar na novou definici GEOMETRICKÉHO útvaru
+
+        Metoda se používá v situaci, kdy byl textový soubor GEOMETRICKÉHO
+        útvaru za běhu programu změněn a znovu načten. UŽIVATELSKÝ útvar
+        začne odkazovat na novou instanci GEOMETRICKÉHO útvaru, všechny
+        hodnoty jeho veličin se vymažou a hodnoty původně přiřazené
+        uživatelem se v původním pořadí znovu přiřadí, čímž se podle nových
+        vzorců dopočítají i hodnoty ostatních veličin.
+
+        Hodnoty veličin, které nová definice útvaru neobsahuje, které již
+        byly vypočítány z dříve přiřazených hodnot, nebo které nesplňují
+        nové podmínky konstruovatelnosti, se nepřiřadí.
+
+        :param geom_shape_instance: odkaz na novou instanci příslušného
+        GEOMETRICKÉHO útvaru: GeometricShape
+        :return: značky veličin, jejichž hodnoty se nepodařilo přiřadit: list
+        """
+        assigned_values = self.assigned_values
+
+        self.geom_shape_instance = geom_shape_instance
+        self.geom_shape_name = geom_shape_instance.geom_shape_name
+        self.geom_descriptive_name = geom_shape_instance.geom_descriptive_name
+        self.total_number_of_quantities \
+            = geom_shape_instance.total_number_of_quantities
+        self.delete_quantity_values()
+
+        dropped_symbols = []
+        for quantity_symbol, value in assigned_values.items():
+            if self.quantity_exists(quantity_symbol) \
+                    and not self.quantity_has_value(quantity_symbol) \
+                    and self.value_meets_conditions(quantity_symbol, value):
+                self.assign_value_and_recalculate(quantity_symbol, value)
+            else:
+                dropped_symbols.append(quantity_symbol)
+
+        return dropped_symbols
+
+    def enable_tracing(self, capacity=tracing.TRACE_CAPACITY):
+        """
+        Zapne sledování původu vypočítaných hodnot veličin
+
+        Metoda vytvoří záznam o původu hodnot (viz modul tracing), do
+        kterého se pak zaznamená každé přiřazení a výpočet hodnoty veličiny.
+        Pokud je sledování vypnuto, výpočet hodnot zpomalí pouze ověření
+        jediného příznaku.
+
+        :param capacity: maximální počet uchovávaných záznamů: int
+        :return: None
+        """
+        self.trace = tracing.DerivationTrace(capacity)
+        self._tracing = True
+
+    def disable_tracing(self):
+        """
+        Vypne sledování původu vypočítaných hodnot veličin
+
+        :return: None
+        """
+        self.trace = None
+        self._tracing = False
+
     def quantity_exists(self, quantity_symbol):
         """
         Ověří, zda UŽIVATELSKÝ útvar obsahuje danou veličinu
@@ -415,13 +1357,12 @@ class UserShape:
         :return: zda je přiřazovaná hodnota v souladu s podmínkami: bool
         """
         if value <= 0.0:
-            self.last_condition_message = 'Hodnota musí být větší než nula.'
+            self.last_condition_message = POSITIVE_VALUE_MESSAGE
             return False
 
         is_angle = self.get_property(quantity_symbol, 'is_angle')
         if is_angle and value >= math.pi:
-            self.last_condition_message \
-                = 'Hodnota úhlu musí být menší než 180 stupňů.'
+            self.last_condition_message = ANGLE_VALUE_MESSAGE
             return False
 
         conditions = self.get_property(quantity_symbol, 'conditions')
@@ -431,35 +1372,87 @@ class UserShape:
                                           'podmínky nejsou definovány.'
             return True
 
-        return self._check_explicit_conditions(value, conditions)
+        violated_condition = self.allowed_range(
+            quantity_symbol).violated_condition(value)
+        if violated_condition is not None:
+            self.last_condition_message = violated_condition
+            return False
+
+        self.last_condition_message = 'Implicitní i explicitní podmínky pro ' \
+                                      'zadanou hodnotu jsou splněny.'
+        return True
 
-    def _check_explicit_conditions(self, value, conditions):
+    def values_meet_conditions(self, quantity_symbol, values):
         """
-        Ověří, zda přiřazovaná hodnota splňuje explicitní podmínky
+        Ověří, které z kandidátních hodnot splňují podmínky
+        konstruovatelnosti
 
-        Metoda je volána z metody value_meets_conditions a ověřuje, zda
-        hodnota, kterou se pokoušíme přiřadit určité veličině, splňuje
-        právě ty podmínky, které vyplývají z jiných - již přiřazených nebo
-        vypočítaných - hodnot jiných veličin útvaru. Tyto podmínky zde
-        označujeme jako explicitní.
+        Metoda slouží k hromadnému ověření mnoha hodnot najednou, např.
+        k výběru hodnot, které lze veličině přiřadit. Každá hodnota se pouze
+        porovná s povoleným rozsahem hodnot veličiny (viz allowed_range).
 
-        :param value: přiřazovaná hodnota: float
-        :param conditions: explicitní podmínky konstruovatelnosti útvaru: list
-        :return: zda je přiřazovaná hodnota v souladu s explicitními podmínkami:
-        bool
-        """
-        for condition in conditions:
-            if self._quantities_have_values(condition['variables']):
-                expression = condition['expression']
-                substituted_expression = self._substitute_expression(expression)
-                inequality = str(value) + ' ' + substituted_expression
-                if not eval(inequality):
-                    self.last_condition_message = condition['description']
-                    return False
+        :param quantity_symbol: značka veličiny útvaru: str
+        :param values: kandidátní hodnoty: list
+        :return: zda jednotlivé hodnoty podmínky splňují: list of bools
+        """
+        return list(map(self.allowed_range(quantity_symbol).contains, values))
 
-        self.last_condition_message = 'Implicitní i explicitní podmínky pro ' \
-                                      'zadanou hodnotu jsou splněny.'
-        return True
+    def allowed_range(self, quantity_symbol):
+        """
+        Vrátí povolený rozsah hodnot veličiny
+
+        Rozsah je dán implicitními podmínkami (hodnota musí být kladná
+        a úhel menší než pí) zúženými explicitními podmínkami veličiny,
+        jejichž pravé strany obsahují pouze veličiny se známými hodnotami.
+        Podmínky jsou přeloženy na funkce vracející meze hodnot (viz
+        solver.compile_condition). Pokud mez některé podmínky nelze
+        z hodnot veličin spočítat (např. odmocnina ze záporného čísla),
+        podmínku nesplňuje žádná hodnota a rozsah je prázdný. Rozsah se
+        spočítá při prvním dotazu a uloží se do slovníku feasible_ranges,
+        dokud se hodnoty veličin útvaru nezmění.
+
+        :param quantity_symbol: značka veličiny útvaru: str
+        :return: povolený rozsah hodnot veličiny: FeasibleRange
+        """
+        feasible_range = self.feasible_ranges.get(quantity_symbol)
+        if feasible_range is not None:
+            return feasible_range
+
+        low, low_inclusive, low_description \
+            = 0.0, False, POSITIVE_VALUE_MESSAGE
+        high, high_inclusive, high_description = math.inf, False, ''
+        if self.get_property(quantity_symbol, 'is_angle'):
+            high, high_description = math.pi, ANGLE_VALUE_MESSAGE
+
+        for condition in self.get_property(quantity_symbol, 'conditions'):
+            if not self._quantities_have_values(condition['variables']):
+                continue
+            operator, arguments, function = solver.compile_condition(
+                condition['expression'])
+            try:
+                bound = function(
+                    *[self.quantity_values[a]['value'] for a in arguments])
+            except solver.EVALUATION_ERRORS:
+                low, low_inclusive = math.inf, False
+                low_description = condition['description']
+                break
+
+            inclusive = operator in ('<=', '>=')
+            # při shodě mezí je užší mez, která do rozsahu nepatří
+            if operator in ('<', '<=') and (bound < high or bound == high
+                                            and not inclusive):
+                high, high_inclusive = bound, inclusive
+                high_description = condition['description']
+            elif operator in ('>', '>=') and (bound > low or bound == low
+                                              and not inclusive):
+                low, low_inclusive = bound, inclusive
+                low_description = condition['description']
+
+        feasible_range = FeasibleRange(low, high, low_inclusive,
+                                       high_inclusive, low_description,
+                                       high_description)
+        self.feasible_ranges[quantity_symbol] = feasible_range
+        return feasible_range
 
     def assign_value_and_recalculate(self, quantity_symbol, value):
         """
@@ -480,11 +1473,22 @@ class UserShape:
         :return: None
         """
 
+        # nový krok historie začíná na konci seznamu value_log; vrácené
+        # kroky již nelze znovu provést
+        self._clear_redo_steps()
+        self._record_step(self.undo_steps, ('assign', len(self.value_log)))
+
         # přiřadíme hodnotu příslušné veličině a označíme ji jako známou
         self.quantity_values[quantity_symbol]['value'] = value
         self.quantity_values[quantity_symbol]['has_value'] = True
         self.number_of_known_quantities += 1
+        self.assigned_values[quantity_symbol] = value
+        self.value_log.append(quantity_symbol)
 
+        if self._tracing:
+            self.trace.record(quantity_symbol, value, tracing.ASSIGNED)
+
+        self.propagation_pass = 0
         new_calculated_values = -1
         # cyklus počítající nové hodnoty na základě právě přiřazené uživatelem
         # nebo vypočítaných právě v průběhu cyklu
@@ -495,11 +1499,24 @@ class UserShape:
                 self.number_of_known_quantities \
                 != self.total_number_of_quantities:
             new_calculated_values = 0
+            self.propagation_pass += 1
             for quantity_symbol, properties in self.quantity_values.items():
                 if not properties['has_value']:
                     if self._try_to_calculate_value(quantity_symbol):
                         new_calculated_values += 1
 
+            # pokud již nelze spočítat žádnou hodnotu dosazením do vzorců,
+            # pokusíme se jednu hodnotu najít numericky a poté opět
+            # pokračovat dosazováním
+            if new_calculated_values == 0 \
+                    and self.number_of_known_quantities \
+                    != self.total_number_of_quantities \
+                    and self._try_to_solve_numerically():
+                new_calculated_values = 1
+
+        # povolené rozsahy hodnot se změnou známých hodnot mohly změnit
+        self.feasible_ranges.clear()
+
     def get_property(self, quantity_symbol, property_name):
         """
         Vrátí hodnotu vnořené položky slovníku general_properties
@@ -555,6 +1572,59 @@ class UserShape:
 
         return False
 
+    def _try_to_solve_numerically(self):
+        """
+        Pokusí se numericky spočítat hodnotu některé neznámé veličiny
+
+        Metoda se volá tehdy, když hodnotu žádné neznámé veličiny nelze
+        spočítat dosazením do jejích vzorců. Najde první neznámou veličinu,
+        kterou lze spočítat numerickou inverzí vzorce jiné, již známé
+        veličiny (viz GeometricShape.find_inverse_way), a její hodnotu
+        najde jako kořen příslušné rovnice v mezích daných podmínkami
+        konstruovatelnosti (viz solver.find_roots).
+
+        :return: zda se podařilo spočítat hodnotu některé veličiny: bool
+        """
+        known_values = {symbol: [properties['value']] for symbol, properties
+                        in self.quantity_values.items()
+                        if properties['has_value']}
+
+        for quantity_symbol, properties in self.quantity_values.items():
+            if properties['has_value']:
+                continue
+
+            inverse_way = self.geom_shape_instance.find_inverse_way(
+                quantity_symbol, known_values.keys())
+            if inverse_way is None:
+                continue
+
+            target, way = inverse_way
+            arguments, function = solver.compile_expression(way['expression'])
+            lows, highs = solver.value_bounds(
+                self.geom_shape_instance, quantity_symbol, known_values, 1)
+            root = solver.find_roots(
+                function, arguments.index(quantity_symbol),
+                [known_values.get(a) for a in arguments],
+                known_values[target], lows, highs)[0]
+
+            if not math.isnan(root):
+                self.quantity_values[quantity_symbol]['value'] = root
+                self.quantity_values[quantity_symbol]['has_value'] = True
+                self.number_of_known_quantities += 1
+                self.value_log.append(quantity_symbol)
+
+                if self._tracing:
+                    self.trace.record(
+                        quantity_symbol, root, tracing.NUMERIC,
+                        f'{{{target}}} = {way["expression"]}',
+                        [(target, known_values[target][0])]
+                        + [(a, known_values[a][0]) for a in arguments
+                           if a != quantity_symbol],
+                        self.propagation_pass)
+                return True
+
+        return False
+
     def _calculate_value(self, quantity_symbol, input_expression):
         """
         Vypočítá hodnotu veličiny na základě předaného výrazu
@@ -565,8 +1635,13 @@ class UserShape:
         Výpočet se provede na základě předaného matematického výrazu
         input_expression, získaného z hlavního slovníku GEOMETRICKÉHO
         útvaru general_properties, jež je instanční proměnnou třídy
-        GeometricShape. Do tohoto výrazu se dosadí hodnoty příslušných
-        veličin a poté se vyhodnotí.
+        GeometricShape. Výraz se přeloží na funkci, která se zavolá
+        s hodnotami příslušných veličin.
+
+        Pokud je zapnuto sledování výpočtů (viz enable_tracing), uloží se do
+        záznamu o původu hodnot kromě vypočítané hodnoty i použitý vzorec,
+        hodnoty do něj dosazených veličin a pořadové číslo průchodu cyklem
+        přepočtu.
 
         :param quantity_symbol: značka veličiny útvaru: str
         :param input_expression: výraz pro výpočet hodnoty této veličiny:
@@ -574,15 +1649,21 @@ class UserShape:
         :return: None
         """
 
-        # symboly veličin ve výrazu nahradíme jejich hodnotami
-        substituted_expression = self._substitute_expression(input_expression)
-
-        # takto substituovaný výraz vyhodnotíme a získanou hodnotu přiřadíme
-        self.quantity_values[quantity_symbol]['value'] \
-            = eval(substituted_expression)
+        # výraz přeložený na funkci (viz solver.compile_expression) zavoláme
+        # s hodnotami příslušných veličin a získanou hodnotu přiřadíme
+        arguments, function = solver.compile_expression(input_expression)
+        values = [self.quantity_values[a]['value'] for a in arguments]
+        value = function(*values)
+        self.quantity_values[quantity_symbol]['value'] = value
         self.quantity_values[quantity_symbol]['has_value'] = True
 
         self.number_of_known_quantities += 1
+        self.value_log.append(quantity_symbol)
+
+        if self._tracing:
+            self.trace.record(quantity_symbol, value, tracing.FORMULA,
+                              input_expression, zip(arguments, values),
+                              self.propagation_pass)
 
     def _quantities_have_values(self, variables):
         """
@@ -615,39 +1696,3 @@ class UserShape:
                 return False
 
         return True
-
-    def _substitute_expression(self, expression):
-        """
-        Nahradí značky veličin hodnotami veličin útvaru
-
-        Metoda přijme string s matematickým výrazem, v němž jsou značky
-        veličin útvaru ohraničeny složenými závorkami, a vytvoří nový string,
-        kde budou tyto značky (včetně jejich ohraničujících složených závorek)
-        nahrazeny hodnotami odpovídajících veličin útvaru, který vrátí.
-
-        :param expression: matematický výraz se značkami veličin ohraničených
-        složenými závorkami: string
-        :return: matematický výraz s hodnotami příslušných veličin místo jejich
-        značek a složených závorek: string
-        """
-        substituted_expression = ''
-        substitute = False
-        substituted_variable = ''
-        for char in expression:
-            if char == '{':
-                # aktivuje režim substituce
-                substitute = True
-            elif char == '}':
-                # deaktivuje režim substituce a do substituovaného výrazu
-                # dosadí hodnotu příslušné veličiny
-                substitute = False
-                substituted_expression \
-                    += str(self.quantity_values[substituted_variable]['value'])
-                substituted_variable = ''
-            elif substitute:
-                # je-li aktivní režim substituce, přidá znak do názvu proměnné
-                substituted_variable += char
-            else:
-                substituted_expression += char
-
-        return substituted_expression
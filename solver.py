@@ -0,0 +1,570 @@
+"""
+Modul pro hromadné a numerické výpočty hodnot veličin útvarů
+
+Modul obsahuje funkce, které s GEOMETRICKÝM útvarem (instancí třídy
+GeometricShape) pracují jinak než třída UserShape:
+- Hromadný výpočet (solve_batch) spočítá hodnoty veličin mnoha útvarů
+  téhož typu najednou. Hodnoty veličin nejsou uloženy po jednotlivých
+  útvarech, ale po sloupcích - pro každou veličinu jeden seznam hodnot,
+  kde i-tá položka každého seznamu patří i-tému útvaru (řádku). Každý
+  krok plánu výpočtu (viz GeometricShape.get_evaluation_plan) se provede
+  nad celým sloupcem jediným voláním funkce map nad přeloženým vzorcem,
+  takže se vzorce nevyhodnocují řádek po řádku.
+- Numerické hledání kořenů (find_roots) se použije, pokud hodnotu veličiny
+  nelze spočítat žádným jejím vzorcem, ale lze ji spočítat numerickou
+  inverzí vzorce jiné veličiny. Kořen se hledá kombinací Newtonovy metody
+  a metody půlení intervalu v mezích, které vyplývají z implicitních
+  podmínek (kladné hodnoty, úhly menší než pí) a z explicitních podmínek
+  z oddílu CONDITIONS. I hledání kořenů probíhá po sloupcích.
+- Vícevláknový hromadný výpočet (solve_batch_threaded) rozdělí řádky na
+  dávky, které se spočítají souběžně ve vláknech. Funkce modulu si veškerý
+  stav výpočtu uchovávají v lokálních proměnných a GEOMETRICKÝ útvar
+  pouze čtou, takže je lze volat z více vláken současně. Zrychlení je
+  výrazné pouze v CPythonu bez globálního zámku interpretu (GIL).
+
+Úhly se ve všech funkcích tohoto modulu zadávají i vracejí v obloukové
+míře (radiánech), stejně jako v instancích třídy UserShape.
+"""
+
+import concurrent.futures
+import functools
+import math
+
+
+# Počet vzorků, ve kterých se v intervalu hledá změna znaménka funkce
+ROOT_SAMPLES = 64
+
+# Maximální počet iterací při zpřesňování kořene
+ROOT_MAX_ITERATIONS = 100
+
+# Relativní přesnost, se kterou se hledá kořen
+ROOT_TOLERANCE = 1e-14
+
+# Výchozí počet řádků jedné dávky při vícevláknovém výpočtu (viz
+# solve_batch_threaded)
+THREAD_CHUNK_ROWS = 8192
+
+# Výchozí největší přípustná relativní odchylka zadané hodnoty veličiny od
+# hodnoty spočítané jejím vzorcem z jiných zadaných hodnot (viz
+# check_consistency)
+CONSISTENCY_TOLERANCE = 1e-9
+
+# Výjimky, které mohou nastat při vyhodnocení vzorce (např. odmocnina
+# ze záporného čísla nebo dělení nulou)
+EVALUATION_ERRORS = (ValueError, ZeroDivisionError, OverflowError,
+                     TypeError)
+
+
+def translate_expression(expression):
+    """
+    Převede výraz se značkami veličin ve složených závorkách na zdrojový
+    kód funkce jazyka Python
+
+    Např. pro výraz '{b} / math.tan({alfa})' vrátí dvojici
+    (('alfa', 'b'), 'lambda alfa, b: b / math.tan(alfa)').
+    Argumenty funkce jsou seřazeny abecedně.
+
+    :param expression: výraz se značkami veličin ohraničenými složenými
+    závorkami: str
+    :return: značky veličin v pořadí argumentů a zdrojový kód funkce:
+    tuple
+    """
+    arguments = []
+    source = ''
+    variable = None
+    for char in expression:
+        if char == '{':
+            variable = ''
+        elif char == '}':
+            arguments.append(variable)
+            source += variable
+            variable = None
+        elif variable is not None:
+            variable += char
+        else:
+            source += char
+
+    arguments = tuple(sorted(set(arguments)))
+    return arguments, f'lambda {", ".join(arguments)}: {source}'
+
+
+@functools.lru_cache(maxsize=None)
+def compile_expression(expression):
+    """
+    Přeloží výraz se značkami veličin ve složených závorkách na funkci
+
+    Např. pro výraz '{b} / math.tan({alfa})' vrátí dvojici
+    (('alfa', 'b'), funkce), kde funkce je ekvivalentní
+    lambda alfa, b: b / math.tan(alfa) (viz translate_expression).
+    Přeložené výrazy se uchovávají v mezipaměti, takže se každý výraz
+    přeloží pouze jednou.
+
+    :param expression: výraz se značkami veličin ohraničenými složenými
+    závorkami: str
+    :return: značky veličin v pořadí argumentů a přeložená funkce: tuple
+    """
+    arguments, source = translate_expression(expression)
+    return arguments, eval(source, {'math': math})
+
+
+def split_condition(expression):
+    """
+    Rozdělí zpracovanou podmínku na relační operátor a pravou stranu
+
+    Např. pro podmínku '< {o} / 2' vrátí dvojici ('<', '{o} / 2').
+
+    :param expression: pravá strana podmínky i s relačním operátorem: str
+    :return: relační operátor a výraz na pravé straně podmínky: tuple
+    """
+    operator, right_side = expression.split(' ', 1)
+    return operator, right_side.strip()
+
+
+@functools.lru_cache(maxsize=None)
+def compile_condition(expression):
+    """
+    Přeloží podmínku konstruovatelnosti na funkci, která vrací mez hodnot
+
+    Např. pro podmínku '< {o} / 2' vrátí trojici ('<', ['o'], funkce),
+    kde funkce zavolaná s hodnotou veličiny o vrátí horní mez hodnot
+    veličiny, ke které podmínka náleží.
+
+    :param expression: pravá strana podmínky i s relačním operátorem: str
+    :return: relační operátor, seznam značek argumentů funkce a funkce:
+    tuple
+    """
+    operator, right_side = split_condition(expression)
+    arguments, function = compile_expression(right_side)
+    return operator, arguments, function
+
+
+def map_safe(function, columns):
+    """
+    Vyhodnotí funkci nad sloupci hodnot
+
+    Funkce se nejprve vyhodnotí nad celými sloupci najednou. Pokud se
+    vyhodnocení u některého řádku nezdaří (např. odmocnina ze záporného
+    čísla), vyhodnotí se funkce znovu po řádcích a výsledkem neúspěšných
+    řádků bude hodnota NaN.
+
+    :param function: vyhodnocovaná funkce
+    :param columns: sloupce hodnot argumentů funkce: list of lists
+    :return: sloupec výsledků: list
+    """
+    try:
+        return list(map(function, *columns))
+    except EVALUATION_ERRORS:
+        pass
+
+    results = []
+    for row in zip(*columns):
+        try:
+            results.append(function(*row))
+        except EVALUATION_ERRORS:
+            results.append(math.nan)
+
+    return results
+
+
+def value_bounds(geom_shape, quantity_symbol, values, rows):
+    """
+    Vrátí meze hodnot veličiny pro jednotlivé řádky
+
+    Dolní mez je nula, horní mez je pí v případě úhlu, jinak nekonečno.
+    Meze se dále zúží explicitními podmínkami veličiny, jejichž pravé
+    strany obsahují pouze veličiny se známými hodnotami.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param quantity_symbol: značka veličiny: str
+    :param values: sloupce hodnot známých veličin: dict
+    :param rows: počet řádků: int
+    :return: sloupce dolních a horních mezí: tuple
+    """
+    properties = geom_shape.general_properties[quantity_symbol]
+    lows = [0.0] * rows
+    highs = [math.pi if properties['is_angle'] else math.inf] * rows
+
+    for condition in properties['conditions']:
+        if not condition['variables'] <= values.keys():
+            continue
+        operator, arguments, function = compile_condition(
+            condition['expression'])
+        bounds = map_safe(function, [values[a] for a in arguments])
+        if operator in ('<', '<='):
+            highs = [min(high, bound) for high, bound in zip(highs, bounds)]
+        elif operator in ('>', '>='):
+            lows = [max(low, bound) for low, bound in zip(lows, bounds)]
+
+    return lows, highs
+
+
+def find_roots(function, position, columns, targets, lows, highs):
+    """
+    Numericky najde kořeny rovnic function(..., x, ...) = target
+
+    Pro každý řádek se hledá hodnota x v otevřeném intervalu (low, high),
+    pro kterou má funkce hodnotu target. Funkce se volá s argumenty ze
+    sloupců columns, ve kterých se argument na pozici position nahradí
+    hledanou hodnotou x.
+
+    Nejprve se v intervalu vzorkováním najde první úsek, na jehož krajích
+    má rozdíl function - target opačná znaménka (u neomezeného intervalu
+    se vzorkuje v logaritmickém měřítku kolem řádu známých hodnot). Tento
+    úsek se poté zužuje Newtonovou metodou s derivací odhadnutou
+    diferencí; pokud by Newtonův krok z úseku vybočil, použije se půlení
+    intervalu. Všechny řádky se zpracovávají současně po sloupcích.
+
+    :param function: funkce vzorce
+    :param position: pozice hledaného argumentu funkce: int
+    :param columns: sloupce hodnot argumentů funkce (sloupec na pozici
+    position se nepoužije): list of lists
+    :param targets: sloupec požadovaných hodnot funkce: list
+    :param lows: sloupec dolních mezí: list
+    :param highs: sloupec horních mezí: list
+    :return: sloupec kořenů (NaN pro řádky, kde se kořen nenašel): list
+    """
+    rows = len(targets)
+
+    def residuals(indices, points):
+        # rozdíly function - target pouze pro vybrané řádky
+        arguments = [points if j == position else [column[i] for i in indices]
+                     for j, column in enumerate(columns)]
+        return [value - targets[i] for i, value
+                in zip(indices, map_safe(function, arguments))]
+
+    # vzorky v intervalu každého řádku
+    scales = [max([abs(column[i]) for j, column in enumerate(columns)
+                   if j != position] + [abs(targets[i]), 1e-300])
+              for i in range(rows)]
+    samples = []
+    for low, high, scale in zip(lows, highs, scales):
+        if math.isfinite(high):
+            step = (high - low) / ROOT_SAMPLES
+            points = [low + step * k for k in range(1, ROOT_SAMPLES)]
+            points = [low + step * 1e-6] + points + [high - step * 1e-6]
+        else:
+            start = max(low, scale * 1e-12)
+            points = [start * 10 ** (k / 3) for k in range(3 * 24 + 1)]
+        samples.append(points)
+
+    # nalezení prvního úseku se změnou znaménka
+    brackets = [None] * rows
+    previous = [None] * rows
+    for k in range(max(len(points) for points in samples)):
+        indices = [i for i in range(rows)
+                   if brackets[i] is None and k < len(samples[i])]
+        if not indices:
+            break
+        points = [samples[i][k] for i in indices]
+        values = residuals(indices, points)
+        for i, point, value in zip(indices, points, values):
+            if math.isnan(value):
+                continue
+            if value == 0.0:
+                brackets[i] = (point, point, 0.0)
+            elif previous[i] is not None \
+                    and (previous[i][1] < 0.0) != (value < 0.0):
+                brackets[i] = (previous[i][0], point, previous[i][1])
+            previous[i] = (point, value)
+
+    roots = [math.nan] * rows
+    active = []
+    state = dict()
+    for i, bracket in enumerate(brackets):
+        if bracket is None:
+            continue
+        low, high, low_value = bracket
+        if low == high:
+            roots[i] = low
+        else:
+            state[i] = [low, high, low_value, (low + high) / 2]
+            active.append(i)
+
+    # zpřesňování kořenů v nalezených úsecích
+    for iteration in range(ROOT_MAX_ITERATIONS):
+        if not active:
+            break
+        points = [state[i][3] for i in active]
+        steps = [abs(point) * 1e-8 or 1e-300 for point in points]
+        values = residuals(active, points)
+        shifted = residuals(active, [p + h for p, h in zip(points, steps)])
+
+        still_active = []
+        for i, point, value, value_h, h in zip(active, points, values,
+                                                shifted, steps):
+            low, high, low_value, _ = state[i]
+            if value == 0.0 or math.isnan(value):
+                roots[i] = point
+                continue
+            if (value < 0.0) == (low_value < 0.0):
+                low, low_value = point, value
+            else:
+                high = point
+
+            derivative = (value_h - value) / h
+            candidate = point - value / derivative \
+                if derivative and math.isfinite(derivative) else math.nan
+            if not low < candidate < high:
+                candidate = (low + high) / 2
+
+            if abs(candidate - point) <= ROOT_TOLERANCE * abs(candidate) \
+                    or high - low <= ROOT_TOLERANCE * abs(high):
+                roots[i] = candidate
+            else:
+                state[i] = [low, high, low_value, candidate]
+                still_active.append(i)
+        active = still_active
+
+    for i in active:
+        roots[i] = state[i][3]
+
+    return roots
+
+
+def solve_batch(geom_shape, columns, check_conditions=True, sinks=(),
+                deduplicate=False):
+    """
+    Hromadně spočítá hodnoty veličin mnoha útvarů téhož typu
+
+    Všechny řádky musí mít hodnoty stejných veličin (tzn. stejný vzor
+    vstupních dat), aby je bylo možné spočítat podle jediného plánu
+    výpočtu. Pokud tyto veličiny neurčují hodnoty všech ostatních
+    veličin útvaru, funkce vyvolá výjimku ValueError ještě před výpočtem.
+
+    Řádek je platný, pokud jsou všechny hodnoty kladné, úhly menší než
+    pí a vstupní hodnoty splňují explicitní podmínky konstruovatelnosti
+    vzhledem k ostatním hodnotám útvaru.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param columns: slovník, jehož klíči jsou značky zadaných veličin
+    a hodnotami sloupce (seznamy) jejich hodnot: dict
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :param sinks: agregáty, do kterých se započítají platné řádky (viz
+    modul aggregates): list
+    :param deduplicate: zda se mají stejné řádky spočítat pouze jednou:
+    bool
+    :return: sloupce hodnot všech veličin a sloupec s informací, zda je
+    daný řádek platný: tuple
+    """
+    if deduplicate:
+        # každý řádek nahradíme pořadím prvního stejného řádku
+        unique_rows = dict()
+        indices = [unique_rows.setdefault(row, len(unique_rows))
+                   for row in zip(*columns.values())]
+        if len(unique_rows) < len(indices):
+            unique_columns = dict(zip(columns, map(list, zip(*unique_rows))))
+            values, valid = solve_batch(geom_shape, unique_columns,
+                                        check_conditions)
+            values = {symbol: [column[i] for i in indices]
+                      for symbol, column in values.items()}
+            valid = [valid[i] for i in indices]
+            for sink in sinks:
+                sink.update(values, valid)
+            return values, valid
+
+    undetermined = geom_shape.undetermined_quantities(columns.keys())
+    if undetermined:
+        raise ValueError(f'Ze zadaných veličin nelze spočítat hodnoty '
+                         f'veličin {", ".join(sorted(undetermined))} '
+                         f'útvaru {geom_shape.geom_shape_name}.')
+
+    values = {symbol: list(column) for symbol, column in columns.items()}
+    rows = len(next(iter(values.values()), []))
+
+    for symbol, way, target in geom_shape.get_evaluation_plan(columns.keys()):
+        arguments, function = compile_expression(way['expression'])
+        if target is None:
+            values[symbol] = map_safe(function,
+                                      [values[a] for a in arguments])
+        else:
+            lows, highs = value_bounds(geom_shape, symbol, values, rows)
+            values[symbol] = find_roots(
+                function, arguments.index(symbol),
+                [values.get(a) for a in arguments], values[target],
+                lows, highs)
+
+    valid = [True] * rows
+    if check_conditions:
+        valid = check_batch_conditions(geom_shape, values, columns.keys(),
+                                       valid)
+    for sink in sinks:
+        sink.update(values, valid)
+
+    return values, valid
+
+
+def solve_batch_threaded(geom_shape, columns, threads=None,
+                         chunk_rows=THREAD_CHUNK_ROWS, check_conditions=True,
+                         sinks=(), executor=None):
+    """
+    Hromadně spočítá hodnoty veličin po dávkách ve více vláknech
+
+    Každá dávka se spočítá funkcí solve_batch. Výsledky dávek se spojí
+    v původním pořadí řádků a do agregátů se započítají ve volajícím
+    vlákně, takže výsledek nezávisí na počtu vláken.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param columns: sloupce hodnot zadaných veličin: dict
+    :param threads: počet vláken (None znamená výchozí počet podle modulu
+    concurrent.futures): int
+    :param chunk_rows: počet řádků jedné dávky: int
+    :param check_conditions: zda se mají kontrolovat podmínky
+    konstruovatelnosti: bool
+    :param sinks: agregáty, do kterých se započítají platné řádky (viz
+    modul aggregates): list
+    :param executor: existující fond vláken, který se použije místo
+    vytvoření nového (parametr threads se pak ignoruje): ThreadPoolExecutor
+    :return: sloupce hodnot všech veličin a sloupec s informací, zda je
+    daný řádek platný: tuple
+    """
+    rows = len(next(iter(columns.values()), []))
+    if rows <= chunk_rows:
+        return solve_batch(geom_shape, columns, check_conditions, sinks)
+
+    undetermined = geom_shape.undetermined_quantities(columns.keys())
+    if undetermined:
+        raise ValueError(f'Ze zadaných veličin nelze spočítat hodnoty '
+                         f'veličin {", ".join(sorted(undetermined))} '
+                         f'útvaru {geom_shape.geom_shape_name}.')
+
+    pool = executor or concurrent.futures.ThreadPoolExecutor(threads)
+    try:
+        futures = [pool.submit(solve_batch, geom_shape,
+                               {symbol: column[start:start + chunk_rows]
+                                for symbol, column in columns.items()},
+                               check_conditions)
+                   for start in range(0, rows, chunk_rows)]
+
+        values = {symbol: [] for symbol in geom_shape.general_properties}
+        valid = []
+        for future in futures:
+            chunk_values, chunk_valid = future.result()
+            for sink in sinks:
+                sink.update(chunk_values, chunk_valid)
+            for symbol, column in chunk_values.items():
+                values[symbol].extend(column)
+            valid.extend(chunk_valid)
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+
+    return values, valid
+
+
+def check_batch_conditions(geom_shape, values, input_symbols, valid):
+    """
+    Zkontroluje podmínky konstruovatelnosti pro všechny řádky
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param values: sloupce hodnot veličin: dict
+    :param input_symbols: značky zadaných veličin, jejichž explicitní
+    podmínky se kontrolují: set of strings
+    :param valid: sloupec s dosavadní platností řádků: list
+    :return: sloupec s platností řádků: list
+    """
+    for symbol, column in values.items():
+        properties = geom_shape.general_properties[symbol]
+        high = math.pi if properties['is_angle'] else math.inf
+        valid = [ok and 0.0 < value < high
+                 for ok, value in zip(valid, column)]
+
+        if symbol not in input_symbols:
+            continue
+
+        for condition in properties['conditions']:
+            if not condition['variables'] <= values.keys():
+                continue
+            operator, right_side = split_condition(condition['expression'])
+            arguments, function = compile_expression(
+                f'{{{symbol}}} {operator} ({right_side})')
+            results = map_safe(function, [values[a] for a in arguments])
+            valid = [ok and result is True
+                     for ok, result in zip(valid, results)]
+
+    return valid
+
+
+def relative_residual(predicted, actual):
+    """
+    Vrátí relativní odchylku zadané hodnoty od hodnoty spočítané vzorcem
+
+    :param predicted: hodnota spočítaná vzorcem (NaN, pokud výpočet
+    selhal): float
+    :param actual: zadaná hodnota: float
+    :return: relativní odchylka (nekonečno, pokud výpočet selhal): float
+    """
+    residual = abs(predicted - actual) / abs(actual) if actual \
+        else abs(predicted - actual)
+    return math.inf if math.isnan(residual) else residual
+
+
+def consistency_formulas(geom_shape, symbols):
+    """
+    Vrátí vzorce, kterými lze zadané hodnoty ověřit z jiných zadaných
+    hodnot
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param symbols: značky zadaných veličin: set of strings
+    :return: dvojice (značka veličiny, způsob výpočtu z položky
+    countable_by): list
+    """
+    return [(symbol, way) for symbol in symbols
+            for way in geom_shape.general_properties[symbol]['countable_by']
+            if way['variables'] <= symbols]
+
+
+def check_consistency(geom_shape, columns, tolerance=CONSISTENCY_TOLERANCE):
+    """
+    Ověří vzájemný soulad zadaných hodnot veličin mnoha útvarů
+
+    Pokud je zadáno více hodnot, než kolik je třeba k výpočtu ostatních
+    (např. a, b, u a S obdélníku), vyhodnotí se každý vzorec zadané
+    veličiny, jehož všechny veličiny jsou zadány, a spočítaná hodnota se
+    porovná se zadanou. Vzorce, které mají více řešení, vracejí pouze
+    jedno z nich (např. vzorec pro stranu a obdélníku z u a S vrací delší
+    stranu), proto se za odchylku zadané hodnoty považuje nejmenší
+    odchylka od jejích vzorců a za odchylku řádku největší odchylka jeho
+    zadaných hodnot. Všechny řádky se zpracovávají současně po sloupcích.
+
+    :param geom_shape: instance GEOMETRICKÉHO útvaru: GeometricShape
+    :param columns: sloupce zadaných hodnot veličin: dict
+    :param tolerance: největší přípustná relativní odchylka: float
+    :return: sloupec odchylek řádků, sloupec s informací, zda je odchylka
+    přípustná, a sloupec se vzorci ve tvaru '{značka} = {výraz}', od
+    kterých se zadaná hodnota s největší odchylkou odchyluje nejméně
+    (None, pokud žádný vzorec nelze vyhodnotit): tuple
+    """
+    rows = len(next(iter(columns.values()), []))
+    residuals = [0.0] * rows
+    formulas = [None] * rows
+
+    ways_by_symbol = dict()
+    for symbol, way in consistency_formulas(geom_shape, columns.keys()):
+        ways_by_symbol.setdefault(symbol, []).append(way)
+
+    for symbol, ways in ways_by_symbol.items():
+        symbol_residuals = [math.inf] * rows
+        symbol_formulas = [None] * rows
+        for way in ways:
+            arguments, function = compile_expression(way['expression'])
+            predicted = map_safe(function, [columns[a] for a in arguments])
+            way_residuals = list(map(relative_residual, predicted,
+                                     columns[symbol]))
+
+            formula = f'{symbol} = {way["expression"]}'
+            symbol_formulas = [
+                formula if new < old or best is None else best
+                for new, old, best
+                in zip(way_residuals, symbol_residuals, symbol_formulas)]
+            symbol_residuals = list(map(min, symbol_residuals,
+                                        way_residuals))
+
+        formulas = [new_formula if new > old or worst is None else worst
+                    for new, old, new_formula, worst
+                    in zip(symbol_residuals, residuals, symbol_formulas,
+                           formulas)]
+        residuals = list(map(max, residuals, symbol_residuals))
+
+    return residuals, [residual <= tolerance for residual in residuals], \
+        formulas
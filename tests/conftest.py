@@ -0,0 +1,19 @@
+"""
+Společná příprava testů
+
+Testy se spouštějí z kořenového adresáře projektu příkazem:
+
+python -m pytest tests
+
+Moduly aplikace leží přímo v kořenovém adresáři, a proto se tento adresář
+vloží na začátek cesty pro import modulů.
+"""
+
+import os
+import sys
+
+
+# Kořenový adresář projektu
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
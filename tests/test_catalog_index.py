@@ -0,0 +1,55 @@
+"""
+Testy indexu výčtu GEOMETRICKÝCH útvarů
+"""
+
+import unittest
+from catalog_index import CatalogIndex, serialize_index
+
+
+class SearchTest(unittest.TestCase):
+    """
+    Testy vyhledávání útvarů podle textu
+    """
+
+    def setUp(self):
+        self.index = CatalogIndex(serialize_index([
+            ('kvadr', 'kvádr', 'shapefiles/'),
+            ('valec', 'rotační válec', 'shapefiles/'),
+            ('krychle', 'krychle', 'shapefiles/'),
+            ('obdelnik', 'obdélník', 'shapefiles/'),
+        ]))
+
+    def names(self, query):
+        entries, total = self.index.page(query, page_size=len(self.index))
+        self.assertEqual(len(entries), total)
+        return sorted(entry.name for entry in entries)
+
+    def test_one_character(self):
+        self.assertEqual(self.names('a'), ['kvadr', 'valec'])
+        self.assertEqual(self.names('Ý'), ['krychle'])
+        self.assertEqual(self.names('z'), [])
+
+    def test_two_characters(self):
+        self.assertEqual(self.names('le'), ['krychle', 'valec'])
+        self.assertEqual(self.names('ád'), ['kvadr'])
+        self.assertEqual(self.names('ak'), [])
+
+    def test_longer_text(self):
+        self.assertEqual(self.names('válec'), ['valec'])
+        self.assertEqual(self.names('ychl'), ['krychle'])
+        self.assertEqual(self.names('kvadrat'), [])
+
+    def test_short_query_matches_every_entry_containing_it(self):
+        index = CatalogIndex(serialize_index(
+            (f'tvar{number}', f'útvar číslo {number}', 'shapefiles/')
+            for number in range(5000)))
+        entries, total = index.page('a')
+        self.assertEqual(total, 5000)
+        self.assertEqual(len(entries), 20)
+        entries, total = index.page('99')
+        self.assertEqual(total, sum('99' in str(number)
+                                    for number in range(5000)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Testy neinteraktivního režimu aplikace
+"""
+
+import unittest
+import main
+
+
+class CachedAssignmentTest(unittest.TestCase):
+    """
+    Testy historie změn při přiřazení hodnot s mezipamětí výsledků
+    """
+
+    def setUp(self):
+        main.initialize_script_mode()
+        main.user_shapes.clear()
+
+    def tearDown(self):
+        main.result_cache.close()
+        main.user_shapes.clear()
+
+    def history(self, user_shape_name, assignments):
+        """
+        Přiřadí hodnoty novému útvaru, vrátí a znovu provede přiřazení
+
+        :param user_shape_name: jméno útvaru: str
+        :param assignments: přiřazení hodnot ve tvaru příkazu skriptu: str
+        :return: výsledek příkazu a stavy útvaru po přiřazení, vrácení
+        a znovuprovedení ve tvaru (value_log, hodnoty veličin): tuple
+        """
+        main.execute_script_command(f'create kvadr {user_shape_name}')
+        user_shape = main.user_shapes[user_shape_name]
+
+        def state():
+            return list(user_shape.value_log), {
+                symbol: quantity['value'] for symbol, quantity
+                in user_shape.quantity_values.items()
+                if quantity['has_value']}
+
+        result = main.execute_script_command(
+            f'{user_shape_name}: {assignments}')
+        states = [state()]
+        self.assertTrue(user_shape.undo())
+        states.append(state())
+        self.assertFalse(user_shape.undo())
+        self.assertTrue(user_shape.redo())
+        states.append(state())
+        self.assertFalse(user_shape.redo())
+        return result, states
+
+    def hits(self):
+        return main.result_cache.statistics()['hits']
+
+    def test_cached_and_uncached_history_match(self):
+        uncached = self.history('tvar1', 'a=3 b=4 c=12')
+        self.assertEqual(self.hits(), 0)
+        cached = self.history('tvar2', 'a=3 b=4 c=12')
+        self.assertEqual(self.hits(), 1)
+
+        self.assertEqual(cached, uncached)
+        after_assign, after_undo, after_redo = cached[1]
+        self.assertEqual(after_assign[0][:3], ['a', 'b', 'c'])
+        self.assertEqual(after_undo, ([], {}))
+        self.assertEqual(after_redo, after_assign)
+
+    def test_partial_assignment_is_one_step(self):
+        # hodnota veličiny uab je po přiřazení a a b již spočítána, takže
+        # přiřazení selže a útvaru zůstanou pouze hodnoty a, b, uab a Sab
+        result, failed = self.history('tvar1', 'a=3 b=4 uab=5')
+        self.assertIsNone(result)
+        self.history('tvar2', 'a=3 b=4')
+        result, cached = self.history('tvar3', 'a=3 b=4')
+        self.assertEqual(self.hits(), 1)
+
+        self.assertEqual(failed, cached)
+        self.assertEqual(failed[0][0], ['a', 'b', 'uab', 'Sab'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,269 @@
+"""
+Testy tříd modulu shape
+"""
+
+import copy
+import os
+import pickle
+import unittest
+from unittest import mock
+import shape
+import solver
+import textfiles
+import tracing
+from shape import GeometricShape, UserShape
+
+
+# Adresář s textovými soubory GEOMETRICKÝCH útvarů
+SHAPEFILES = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'shapefiles', '')
+
+
+def load_shape(geom_shape_name, description_index=None):
+    """
+    Vytvoří instanci GEOMETRICKÉHO útvaru z jeho textového souboru
+
+    :param geom_shape_name: geometrický název útvaru: str
+    :param description_index: index řádků veličin v textovém souboru
+    útvaru: dict
+    :return: instance GEOMETRICKÉHO útvaru: GeometricShape
+    """
+    return GeometricShape(geom_shape_name, *textfiles.
+                          shape_init_list_from_text_file(SHAPEFILES,
+                                                         geom_shape_name),
+                          description_index)
+
+
+class MinimalDeterminingSetsTest(unittest.TestCase):
+    """
+    Testy hledání minimálních množin veličin určujících útvar
+    """
+
+    def test_sets_are_found_on_first_use(self):
+        geom_shape = load_shape('kvadr')
+        self.assertIsNone(geom_shape._minimal_determining_sets)
+        determining_sets = geom_shape.minimal_determining_sets
+        self.assertIs(geom_shape.minimal_determining_sets, determining_sets)
+        self.assertIn(frozenset('abc'), determining_sets)
+
+    def test_sets_are_minimal_and_complete(self):
+        geom_shape = load_shape('obdelnik')
+        determining_sets = geom_shape.minimal_determining_sets
+        symbols = frozenset(geom_shape.general_properties)
+        for determining_set in determining_sets:
+            self.assertFalse(
+                geom_shape.undetermined_quantities(determining_set))
+            for symbol in determining_set:
+                self.assertTrue(geom_shape.undetermined_quantities(
+                    determining_set - {symbol}))
+        # každá určující dvojice veličin je některou z minimálních množin
+        for first in symbols:
+            for second in symbols - {first}:
+                pair = frozenset((first, second))
+                if not geom_shape.undetermined_quantities(pair):
+                    self.assertIn(pair, determining_sets)
+
+    def test_long_chain_of_formulas(self):
+        count = 60
+        quantities = [(f'x{i}', f'x{i}', f'x{i}') for i in range(count)]
+        formulas = [f'x{i + 1} = x{i} * 2 + x{i + 2}'
+                    for i in range(count - 2)]
+        geom_shape = GeometricShape('retezec', 'řetězec', quantities,
+                                    formulas, [])
+        determining_sets = geom_shape.minimal_determining_sets
+        self.assertIn(frozenset(('x0', 'x1')), determining_sets)
+        self.assertTrue(all(len(determining_set) == 2
+                            for determining_set in determining_sets))
+
+
+class FrozenGeometricShapeTest(unittest.TestCase):
+    """
+    Testy neměnnosti GEOMETRICKÉHO útvaru
+    """
+
+    def setUp(self):
+        self.geom_shape = load_shape('kvadr')
+
+    def assert_way_frozen(self, way):
+        self.assertRaises(TypeError, way.__setitem__, 'expression', '0')
+        self.assertIsInstance(way['variables'], frozenset)
+
+    def test_plan_ways_are_frozen(self):
+        for plan in self.geom_shape.evaluation_plans.values():
+            for symbol, way, target in plan:
+                self.assert_way_frozen(way)
+
+    def test_inverse_ways_are_frozen(self):
+        inverse_ways = self.geom_shape.inverse_ways
+        self.assertRaises(TypeError, inverse_ways.__setitem__, 'a', ())
+        for ways in inverse_ways.values():
+            for target, way in ways:
+                self.assert_way_frozen(way)
+
+    def test_plans_share_ways_with_general_properties(self):
+        ways = {id(way)
+                for properties in self.geom_shape.general_properties.values()
+                for way in properties['countable_by']}
+        for plan in self.geom_shape.evaluation_plans.values():
+            for symbol, way, target in plan:
+                self.assertIn(id(way), ways)
+        for inverse_ways in self.geom_shape.inverse_ways.values():
+            for target, way in inverse_ways:
+                self.assertIn(id(way), ways)
+
+    def test_evaluation_plans_are_read_only(self):
+        with self.assertRaises(TypeError):
+            self.geom_shape.evaluation_plans[frozenset()] = ()
+
+    def test_copies_stay_frozen(self):
+        for geom_shape in (pickle.loads(pickle.dumps(self.geom_shape)),
+                           copy.deepcopy(self.geom_shape)):
+            known = next(iter(geom_shape.minimal_determining_sets))
+            symbol, way, target = geom_shape.get_evaluation_plan(known)[0]
+            self.assert_way_frozen(way)
+            with self.assertRaises(TypeError):
+                geom_shape.evaluation_plans[frozenset()] = ()
+
+    def test_lazy_descriptions(self):
+        description_index = textfiles.quantity_text_index(
+            SHAPEFILES + 'kvadr.txt')
+        geom_shape = load_shape('kvadr', description_index)
+        properties = geom_shape.general_properties['a']
+        self.assertNotIn('short_name', properties)
+        short_name = properties['short_name']
+        self.assertEqual(
+            short_name, self.geom_shape.general_properties['a']['short_name'])
+        geom_shape.evict_descriptions()
+        self.assertNotIn('short_name', properties)
+        self.assertRaises(TypeError, properties.__setitem__, 'is_angle', True)
+
+
+class AllowedRangeTest(unittest.TestCase):
+    """
+    Testy povoleného rozsahu hodnot veličiny
+    """
+
+    def setUp(self):
+        geom_shape = GeometricShape(
+            'test', 'test', [('a', 'a', 'a'), ('b', 'b', 'b')], [],
+            [('a < math.sqrt(b - 10)', 'Podmínka s odmocninou.')])
+        self.user_shape = UserShape('tvar', geom_shape)
+
+    def test_bound_from_known_values(self):
+        self.user_shape.assign_value_and_recalculate('b', 14.0)
+        allowed_range = self.user_shape.allowed_range('a')
+        self.assertEqual(allowed_range.format(), '(0, 2)')
+        self.assertTrue(self.user_shape.value_meets_conditions('a', 1.0))
+        self.assertFalse(self.user_shape.value_meets_conditions('a', 3.0))
+
+    def test_bound_that_cannot_be_evaluated(self):
+        self.user_shape.assign_value_and_recalculate('b', 5.0)
+        allowed_range = self.user_shape.allowed_range('a')
+        self.assertTrue(allowed_range.is_empty())
+        self.assertEqual(allowed_range.format(), '∅')
+        self.assertFalse(self.user_shape.value_meets_conditions('a', 1.0))
+        self.assertEqual(self.user_shape.last_condition_message,
+                         'Podmínka s odmocninou.')
+        self.assertEqual(
+            self.user_shape.values_meet_conditions('a', [0.5, 1.0, 1e9]),
+            [False, False, False])
+
+
+class TracingTest(unittest.TestCase):
+    """
+    Testy sledování původu vypočítaných hodnot veličin
+    """
+
+    def setUp(self):
+        self.user_shape = UserShape('tvar', load_shape('kvadr'))
+        self.user_shape.enable_tracing()
+
+    def assign(self):
+        for symbol, value in (('a', 3.0), ('b', 4.0), ('c', 12.0)):
+            self.user_shape.assign_value_and_recalculate(symbol, value)
+
+    def test_formula_records(self):
+        self.assign()
+        records = {record.symbol: record for record in self.user_shape.trace}
+        self.assertEqual(records['a'].kind, tracing.ASSIGNED)
+        record = records['Sab']
+        self.assertEqual(record.kind, tracing.FORMULA)
+        self.assertEqual(record.value, 12.0)
+        self.assertEqual(dict(record.inputs), {'a': 3.0, 'b': 4.0})
+
+    def test_each_formula_is_compiled_once(self):
+        with mock.patch.object(solver, 'compile_expression',
+                               wraps=solver.compile_expression) as compile:
+            self.assign()
+        formulas = sum(record.kind == tracing.FORMULA
+                       for record in self.user_shape.trace)
+        self.assertEqual(compile.call_count, formulas)
+
+    def test_traced_shape_can_be_copied(self):
+        self.assign()
+        self.assertNotIn('_calculate_value', vars(self.user_shape))
+        for user_shape in (pickle.loads(pickle.dumps(self.user_shape)),
+                           copy.deepcopy(self.user_shape)):
+            self.assertEqual(list(user_shape.trace),
+                             list(self.user_shape.trace))
+
+    def test_disable_tracing(self):
+        self.user_shape.disable_tracing()
+        self.assign()
+        self.assertIsNone(self.user_shape.trace)
+
+
+class HistoryTest(unittest.TestCase):
+    """
+    Testy historie změn hodnot veličin
+    """
+
+    def setUp(self):
+        self.user_shape = UserShape('tvar', load_shape('kvadr'))
+
+    def assign(self, a=3.0):
+        for symbol, value in (('a', a), ('b', 4.0), ('c', 12.0)):
+            self.user_shape.assign_value_and_recalculate(symbol, value)
+
+    def history_size(self):
+        return sum(map(shape._step_size, list(self.user_shape.undo_steps)
+                       + self.user_shape.redo_steps))
+
+    def test_history_is_limited_by_logged_values(self):
+        with mock.patch.object(shape, 'HISTORY_LIMIT', 50):
+            for a in range(1, 20):
+                self.assign(float(a))
+                self.user_shape.clear_quantity_values()
+                self.assertLessEqual(self.user_shape.history_size, 50)
+                self.assertEqual(self.user_shape.history_size,
+                                 self.history_size())
+
+            # krok vymazání všech 12 hodnot kvádru má velikost 13, takže se
+            # do historie vejdou nejvýše tři cykly přiřazení a vymazání
+            undone = 0
+            while self.user_shape.undo():
+                undone += 1
+                self.assertLessEqual(self.user_shape.history_size, 50)
+                self.assertEqual(self.user_shape.history_size,
+                                 self.history_size())
+            self.assertLessEqual(undone, 12)
+
+    def test_undo_of_clear_restores_trace(self):
+        self.user_shape.enable_tracing()
+        self.assign()
+        records = list(self.user_shape.trace)
+        self.assertTrue(records)
+
+        self.user_shape.clear_quantity_values()
+        self.assertEqual(list(self.user_shape.trace), [])
+        self.user_shape.undo()
+        self.assertEqual(list(self.user_shape.trace), records)
+
+        self.user_shape.redo()
+        self.assertEqual(list(self.user_shape.trace), [])
+        self.user_shape.undo()
+        self.assertEqual(list(self.user_shape.trace), records)
+
+
+if __name__ == '__main__':
+    unittest.main()
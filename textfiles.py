@@ -7,6 +7,9 @@ souborů s obecně platnými informacemi o konkrétních GEOMETRICKÝCH
 vstupních hodnot zadaných uživatelem.
 """
 
+import hashlib
+import os
+
 
 def shape_init_list_from_text_file(path, filename):
     """
@@ -77,6 +80,54 @@ def shape_init_list_from_text_file(path, filename):
     return geom_descriptive_name, quantities, formulas, conditions
 
 
+def family_init_list_from_text_file(path, filename):
+    """
+    Provede konverzi textového souboru s informacemi o PARAMETRICKÉ RODINĚ
+    GEOMETRICKÝCH útvarů.
+
+    Soubor má stejnou strukturu jako textový soubor GEOMETRICKÉHO útvaru
+    (viz shape_init_list_from_text_file), navíc však obsahuje oddíl
+    PARAMETERS s jediným řádkem popisujícím parametr rodiny.
+
+    :param path: relativní cesta k inicializačnímu souboru rodiny bez názvu
+    tohoto souboru: str
+    :param filename: název textového inicializačního souboru rodiny bez
+    přípony: str
+    :return: seznam s vlastnostmi parametru (značka, krátký popis, delší
+    popis, nejmenší hodnota) následovaný položkami n-tice vrácené funkcí
+    shape_init_list_from_text_file: tuple
+    """
+    lines = load_text_file(path + filename + '.txt')
+    clean_lines = get_clean_lines(lines)
+
+    parameter = split_items(get_section(clean_lines, 'PARAMETERS'))[0]
+
+    return (parameter,) + shape_init_list_from_text_file(path, filename)
+
+
+def shape_list_from_text_file(full_path):
+    """
+    Provede konverzi textového souboru s výčtem GEOMETRICKÝCH útvarů.
+
+    Každý řádek souboru (kromě komentářů a prázdných řádků) obsahuje název
+    GEOMETRICKÉHO útvaru, jeho popisný název a relativní cestu k jeho
+    textovému souboru oddělené znakem '|'.
+
+    :param full_path: relativní cesta k souboru včetně jeho názvu a přípony: str
+    :return: seznam trojic (název útvaru, popisný název, cesta): list
+    """
+    lines = load_text_file(full_path)
+    clean_lines = get_clean_lines(lines)
+
+    shapes = []
+    for clean_line in clean_lines:
+        shape_name, full_name, path = [
+            item.strip() for item in clean_line.split('|')]
+        shapes.append((shape_name, full_name, path))
+
+    return shapes
+
+
 def load_text_file(full_path):
     """
     Načte obsah textového souboru a vrátí ho jako seznam řádků.
@@ -92,6 +143,94 @@ def load_text_file(full_path):
         print('Chyba při načítání inicializačního souboru {path}.')
 
 
+def file_signature(full_path, previous_signature=None):
+    """
+    Vrátí signaturu textového souboru pro detekci jeho změn.
+
+    Signatura je n-tice (čas poslední změny v ns, velikost v bajtech,
+    SHA-256 hash obsahu). Pokud je předána předchozí signatura a čas
+    poslední změny i velikost souboru se nezměnily, funkce vrátí přímo
+    předchozí signaturu bez čtení a hashování obsahu souboru. Pokud se
+    změnil čas poslední změny, ale obsah zůstal stejný, hash bude shodný
+    a soubor tak není třeba znovu zpracovávat.
+
+    :param full_path: relativní cesta k souboru včetně jeho názvu a přípony: str
+    :param previous_signature: dříve zjištěná signatura souboru: tuple
+    :return: signatura souboru nebo None, pokud soubor neexistuje: tuple
+    """
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return None
+
+    if previous_signature is not None \
+            and previous_signature[:2] == (stat.st_mtime_ns, stat.st_size):
+        return previous_signature
+
+    try:
+        with open(full_path, 'rb') as file:
+            content_hash = hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size, content_hash
+
+
+def quantity_text_index(full_path):
+    """
+    Vytvoří index řádků oddílu QUANTITIES textového souboru útvaru.
+
+    Index umožňuje později načíst krátký a delší popis jednotlivých veličin
+    přímo z textového souboru (viz read_quantity_texts), aniž by bylo nutné
+    celý soubor znovu číst a zpracovávat.
+
+    :param full_path: relativní cesta k souboru včetně jeho názvu a přípony: str
+    :return: slovník {značka veličiny: (cesta k souboru, posun řádku
+    v bajtech, délka řádku v bajtech)}: dict
+    """
+    with open(full_path, 'rb') as file:
+        content = file.read()
+
+    index = dict()
+    section = ''
+    offset = 0
+    for raw_line in content.splitlines(keepends=True):
+        line = raw_line.split(b'#', 1)[0].strip()
+        if line.startswith(b'Section: '):
+            section = line[len(b'Section: '):].decode('utf8')
+        elif line and section == 'QUANTITIES':
+            symbol = line.split(b'|', 1)[0].strip().decode('utf8')
+            index[symbol] = (full_path, offset, len(raw_line))
+        offset += len(raw_line)
+
+    return index
+
+
+def read_quantity_texts(full_path, offset, length):
+    """
+    Načte krátký a delší popis veličiny z řádku textového souboru útvaru.
+
+    :param full_path: relativní cesta k souboru včetně jeho názvu a přípony: str
+    :param offset: posun řádku veličiny v bajtech: int
+    :param length: délka řádku veličiny v bajtech: int
+    :return: značka, krátký popis a delší popis veličiny nebo None, pokud
+    na daném místě souboru řádek s veličinou není: tuple
+    """
+    try:
+        with open(full_path, 'rb') as file:
+            file.seek(offset)
+            raw_line = file.read(length)
+        line = raw_line.decode('utf8')
+    except (OSError, UnicodeDecodeError):
+        return None
+
+    items = split_items(get_clean_lines([line]))
+    if not items or len(items[0]) < 3:
+        return None
+
+    return tuple(items[0][:3])
+
+
 def get_clean_lines(lines):
     """
     Vrátí "očištěný" seznam řádků textu.
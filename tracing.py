@@ -0,0 +1,162 @@
+"""
+Modul pro sledování původu vypočítaných hodnot veličin
+
+Pokud je u UŽIVATELSKÉHO útvaru zapnuto sledování výpočtů (viz
+UserShape.enable_tracing), zaznamená se u každé vypočítané hodnoty veličiny
+vzorec, kterým byla spočítána, hodnoty veličin dosazených do tohoto vzorce
+a pořadové číslo průchodu cyklem přepočtu (viz
+UserShape.assign_value_and_recalculate), ve kterém k výpočtu došlo.
+
+Záznamy se uchovávají v kruhovém zásobníku s pevnou kapacitou, takže
+nejstarší záznamy jsou po jejím překročení zapomenuty. Záznamy lze
+exportovat ve formátu JSON nebo ve formátu DOT programu Graphviz, ve kterém
+tvoří graf odvození hodnot.
+"""
+
+import collections
+import itertools
+import json
+
+
+# Výchozí počet záznamů uchovávaných u jednoho UŽIVATELSKÉHO útvaru
+TRACE_CAPACITY = 256
+
+# Druhy záznamů - hodnota přiřazená uživatelem, hodnota vypočítaná
+# dosazením do vzorce a hodnota nalezená numerickou inverzí vzorce
+ASSIGNED = 'assigned'
+FORMULA = 'formula'
+NUMERIC = 'numeric'
+
+# Jeden záznam o původu hodnoty veličiny
+TraceRecord = collections.namedtuple(
+    'TraceRecord', 'symbol value kind expression inputs propagation_pass')
+
+
+class DerivationTrace:
+    """
+    Třída uchovávající záznamy o původu hodnot veličin jednoho útvaru
+    """
+
+    def __init__(self, capacity=TRACE_CAPACITY):
+        """
+        Konstruktor záznamu o původu hodnot
+
+        :param capacity: maximální počet uchovávaných záznamů: int
+        """
+        self.records = collections.deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def record(self, symbol, value, kind, expression='', inputs=(),
+               propagation_pass=0):
+        """
+        Přidá nový záznam o původu hodnoty veličiny
+
+        :param symbol: značka veličiny: str
+        :param value: hodnota veličiny: float
+        :param kind: druh záznamu (ASSIGNED, FORMULA nebo NUMERIC): str
+        :param expression: vzorec, kterým byla hodnota spočítána: str
+        :param inputs: dvojice (značka, hodnota) veličin dosazených do
+        vzorce: tuple
+        :param propagation_pass: pořadové číslo průchodu cyklem přepočtu:
+        int
+        :return: None
+        """
+        self.records.append(TraceRecord(symbol, value, kind, expression,
+                                        tuple(inputs), propagation_pass))
+
+    def clear(self):
+        """
+        Zapomene všechny záznamy
+
+        :return: None
+        """
+        self.records.clear()
+
+    def snapshot(self):
+        """
+        Vrátí kopii všech uchovávaných záznamů
+
+        :return: záznamy od nejstaršího: tuple
+        """
+        return tuple(self.records)
+
+    def restore(self, records):
+        """
+        Vloží dříve uložené záznamy (viz snapshot) před uchovávané záznamy
+
+        Pokud se všechny záznamy do kapacity nevejdou, zapomenou se
+        nejstarší z nich.
+
+        :param records: záznamy od nejstaršího: tuple
+        :return: None
+        """
+        self.records = collections.deque(
+            itertools.chain(records, self.records), self.records.maxlen)
+
+    def to_json(self):
+        """
+        Vrátí záznamy ve formátu JSON
+
+        :return: seznam záznamů ve formátu JSON: str
+        """
+        return json.dumps([{
+            'symbol': record.symbol,
+            'value': record.value,
+            'kind': record.kind,
+            'expression': record.expression,
+            'inputs': dict(record.inputs),
+            'pass': record.propagation_pass,
+        } for record in self.records], ensure_ascii=False, indent=2)
+
+    def to_dot(self, graph_name='odvozeni'):
+        """
+        Vrátí graf odvození hodnot ve formátu DOT programu Graphviz
+
+        Uzly grafu tvoří hodnoty veličin, hrany vedou od veličin dosazených
+        do vzorce k veličině, jejíž hodnota byla vzorcem spočítána, a jsou
+        popsány pořadovým číslem průchodu cyklem přepočtu.
+
+        :param graph_name: název grafu: str
+        :return: graf ve formátu DOT: str
+        """
+        lines = [f'digraph "{graph_name}" {{', '    rankdir=LR;']
+        for record in self.records:
+            shape = 'box' if record.kind == ASSIGNED else 'ellipse'
+            lines.append(f'    "{record.symbol}" [shape={shape}, '
+                         f'label="{record.symbol} = {record.value:.6g}"];')
+            for symbol, _ in record.inputs:
+                style = ', style=dashed' if record.kind == NUMERIC else ''
+                lines.append(f'    "{symbol}" -> "{record.symbol}" '
+                             f'[label="{record.propagation_pass}"{style}];')
+        lines.append('}')
+
+        return '\n'.join(lines) + '\n'
+
+    def format_records(self):
+        """
+        Vrátí záznamy ve formě řádků textu pro výpis uživateli
+
+        :return: řádky s popisem záznamů: list
+        """
+        lines = []
+        for record in self.records:
+            if record.kind == ASSIGNED:
+                lines.append(f'{record.symbol} = {record.value:.6g} '
+                             f'(zadáno)')
+                continue
+
+            formula = record.expression.replace('{', '').replace('}', '')
+            inputs = ', '.join(f'{symbol} = {value:.6g}'
+                               for symbol, value in record.inputs)
+            method = 'numericky ze vzorce' if record.kind == NUMERIC \
+                else 'vzorcem'
+            lines.append(f'{record.symbol} = {record.value:.6g} '
+                         f'({record.propagation_pass}. průchod, {method} '
+                         f'{formula}; {inputs})')
+
+        return lines